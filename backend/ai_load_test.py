@@ -0,0 +1,226 @@
+"""
+AI 엔드포인트 부하 테스트
+Run with: python ai_load_test.py --candidates 200 --requests 5 --admin-email admin@example.com --admin-password <password>
+
+N명의 가상 응시자가 가입/로그인/시험 시작 후 /api/ai/generate (또는 /generate/stream)를
+호출하고, 처리량/상태 코드/지연 시간 분위수와 서버 키 풀의 대기 시간을 출력합니다.
+키 풀 상태는 관리자 전용이므로 --admin-email/--admin-password를 주었을 때만 출력합니다.
+실제 API 키 없이 실행하려면 서버를 AI_STUB_ENABLED=true로 띄우세요 (AI_STUB_* 설정 참고).
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+PROMPTS = [
+    "Self-Attention이 RNN보다 긴 문맥을 잘 다루는 이유를 설명해줘",
+    "프롬프트 엔지니어링에서 few-shot 예시를 고르는 기준은?",
+    "환각(hallucination)을 줄이기 위한 방법 세 가지를 알려줘",
+    "이 주장에 대한 근거를 찾으려면 어떤 자료를 확인해야 할까?",
+    "RAG 파이프라인에서 청크 크기를 정하는 방법을 설명해줘",
+]
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def fmt_ms(seconds: Optional[float]) -> str:
+    return f"{seconds * 1000:8.1f}ms" if seconds is not None else "       -"
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.latencies: List[float] = []
+        self.first_tokens: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.setup_failures = 0
+
+    async def setup_candidate(self, client: httpx.AsyncClient, index: int) -> Optional[Dict[str, Any]]:
+        """가상 응시자 가입(이미 있으면 생략) → 로그인 → 시험 시작"""
+        email = f"{self.args.user_prefix}{index:05d}@example.com"
+        password = "loadtest-password"
+        await client.post("/api/auth/register", json={
+            "email": email,
+            "exam_number": f"{self.args.user_prefix.upper()}{index:05d}",
+            "password": password
+        })
+        response = await client.post("/api/auth/login", json={"email": email, "password": password})
+        if response.status_code != 200:
+            return None
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = await client.post("/api/exams/start", json={}, headers=headers)
+        if response.status_code not in (200, 201):
+            return None
+        return {"headers": headers, "exam_id": response.json()["id"]}
+
+    async def ai_request(self, client: httpx.AsyncClient, candidate: Dict[str, Any], question_id: int):
+        body = {
+            "exam_id": candidate["exam_id"],
+            "question_id": question_id,
+            "prompt": random.choice(PROMPTS),
+            "provider": self.args.provider,
+            "conversation": self.args.conversation
+        }
+        started = time.perf_counter()
+        try:
+            if self.args.stream:
+                async with client.stream("POST", "/api/ai/generate/stream", json=body,
+                                         headers=candidate["headers"]) as response:
+                    status_code = response.status_code
+                    first_token = None
+                    async for line in response.aiter_lines():
+                        if line.startswith("event: token") and first_token is None:
+                            first_token = time.perf_counter() - started
+                        elif line.startswith("event: error"):
+                            status_code = "stream_error"
+                    if first_token is not None and status_code == 200:
+                        self.first_tokens.append(first_token)
+            else:
+                response = await client.post("/api/ai/generate", json=body, headers=candidate["headers"])
+                status_code = response.status_code
+        except httpx.HTTPError as e:
+            self.errors[type(e).__name__] += 1
+            return
+        elapsed = time.perf_counter() - started
+        self.statuses[status_code] += 1
+        if status_code == 200:
+            self.latencies.append(elapsed)
+
+    async def run_candidate(self, client: httpx.AsyncClient, index: int, question_ids: List[int]):
+        candidate = await self.setup_candidate(client, index)
+        if candidate is None:
+            self.setup_failures += 1
+            return
+        # 응시자마다 시작 시점을 분산
+        await asyncio.sleep(random.uniform(0, self.args.ramp_up))
+        for i in range(self.args.requests):
+            await self.ai_request(client, candidate, question_ids[i % len(question_ids)])
+            if self.args.think_time > 0:
+                await asyncio.sleep(random.expovariate(1 / self.args.think_time))
+
+    async def fetch_question_ids(self, client: httpx.AsyncClient) -> List[int]:
+        """첫 번째 가상 응시자로 로그인해 문항 목록 조회 (실패하면 잘못된 문항으로 측정하지 않도록 중단)"""
+        candidate = await self.setup_candidate(client, 0)
+        if candidate is None:
+            raise SystemExit("Failed to log in to fetch /api/questions - pass --question-ids explicitly")
+        response = await client.get("/api/questions", headers=candidate["headers"])
+        if response.status_code != 200:
+            raise SystemExit(f"GET /api/questions failed with {response.status_code}: {response.text}")
+        question_ids = [q["id"] for q in response.json()]
+        if not question_ids:
+            raise SystemExit("No questions found - create questions or pass --question-ids")
+        return question_ids
+
+    async def fetch_pool_status(self, client: httpx.AsyncClient) -> Optional[Dict[str, Any]]:
+        """관리자 계정으로 서버 키 풀 상태 조회 (--admin-email 없으면 생략)"""
+        if not self.args.admin_email:
+            return None
+        response = await client.post("/api/auth/login", json={
+            "email": self.args.admin_email,
+            "password": self.args.admin_password
+        })
+        if response.status_code != 200:
+            print(f"Admin login failed with {response.status_code} - skipping key pool status")
+            return None
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = await client.get("/api/ai/key-pool/status", headers=headers)
+        if response.status_code != 200:
+            print(f"GET /api/ai/key-pool/status failed with {response.status_code} - skipping key pool status")
+            return None
+        return response.json()
+
+    async def run(self):
+        limits = httpx.Limits(max_connections=self.args.candidates, max_keepalive_connections=self.args.candidates)
+        async with httpx.AsyncClient(base_url=self.args.base_url, timeout=self.args.timeout, limits=limits) as client:
+            question_ids = self.args.question_ids or await self.fetch_question_ids(client)
+
+            started = time.perf_counter()
+            await asyncio.gather(*[
+                self.run_candidate(client, i, question_ids) for i in range(self.args.candidates)
+            ])
+            duration = time.perf_counter() - started
+
+            pool_status = await self.fetch_pool_status(client)
+
+        self.report(duration, pool_status)
+
+    def report(self, duration: float, pool_status: Optional[Dict[str, Any]]):
+        total = sum(self.statuses.values())
+        print("=" * 60)
+        print(f"AI Load Test - {self.args.candidates} candidates x {self.args.requests} requests"
+              f" ({'stream' if self.args.stream else 'blocking'})")
+        print("=" * 60)
+        print(f"Duration:        {duration:.1f}s")
+        print(f"Requests:        {total} ({total / duration:.1f} req/s)")
+        print(f"Succeeded:       {len(self.latencies)} ({len(self.latencies) / duration:.1f} req/s)")
+        print(f"Status codes:    {dict(self.statuses)}")
+        if self.errors:
+            print(f"Client errors:   {dict(self.errors)}")
+        if self.setup_failures:
+            print(f"Setup failures:  {self.setup_failures}")
+        print()
+        print("Latency (200 only)       p50        p90        p99        max")
+        print(f"  total         {fmt_ms(percentile(self.latencies, 0.5))} {fmt_ms(percentile(self.latencies, 0.9))}"
+              f" {fmt_ms(percentile(self.latencies, 0.99))} {fmt_ms(max(self.latencies) if self.latencies else None)}")
+        if self.first_tokens:
+            print(f"  first token   {fmt_ms(percentile(self.first_tokens, 0.5))} {fmt_ms(percentile(self.first_tokens, 0.9))}"
+                  f" {fmt_ms(percentile(self.first_tokens, 0.99))} {fmt_ms(max(self.first_tokens))}")
+
+        if pool_status and "queue" in pool_status:
+            queue = pool_status["queue"]
+            print()
+            print("Server key pool")
+            print(f"  queue wait    avg {queue['avg_wait_ms']}ms, max {queue['max_wait_ms']}ms,"
+                  f" rejected {queue['total_rejected']}, throttle {queue['total_throttle_wait_ms']}ms")
+            window = pool_status.get("latency", {}).get("windows", {}).get("5m", {})
+            if window:
+                print(f"  pool latency  p50 {window['p50_ms']}ms, p90 {window['p90_ms']}ms, p99 {window['p99_ms']}ms,"
+                      f" errors {window['errors']}")
+            executor = pool_status.get("executor", {})
+            if executor:
+                print(f"  executor      max_active {executor['max_active']}/{executor['max_workers']},"
+                      f" max_pending {executor['max_pending']}, avg_wait {executor['avg_wait_ms']}ms")
+            for key in pool_status.get("keys_status", []):
+                key_window = key.get("latency", {}).get("windows", {}).get("5m", {})
+                print(f"  key {key['key_index']:<3}       state {key.get('state', '-')},"
+                      f" p50 {key_window.get('p50_ms')}ms, p99 {key_window.get('p99_ms')}ms,"
+                      f" errors {key_window.get('errors')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI endpoint load test")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--candidates", type=int, default=50, help="동시 가상 응시자 수")
+    parser.add_argument("--requests", type=int, default=5, help="응시자별 AI 요청 수")
+    parser.add_argument("--question-ids", type=int, nargs="*", default=None, help="비우면 /api/questions에서 조회")
+    parser.add_argument("--provider", default=None, help="openai, anthropic, gemini (기본: 서버 기본값)")
+    parser.add_argument("--stream", action="store_true", help="/api/ai/generate/stream 사용")
+    parser.add_argument("--conversation", action="store_true", help="서버측 대화 기록 사용")
+    parser.add_argument("--think-time", type=float, default=2.0, help="요청 사이 평균 대기 시간 (초, 지수 분포)")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="응시자 시작 시점 분산 구간 (초)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--user-prefix", default="loadtest")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--admin-email", default=None, help="키 풀 상태 조회용 관리자 계정 (비우면 생략)")
+    parser.add_argument("--admin-password", default=None)
+    args = parser.parse_args()
+    if args.admin_email and not args.admin_password:
+        parser.error("--admin-password is required with --admin-email")
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    asyncio.run(LoadTest(args).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Move AI prompt/response text into content-addressed blobs
+
+Revision ID: add_ai_blobs
+Revises: add_ai_usage_conversation_index
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+import gzip
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_ai_blobs'
+down_revision = 'add_ai_usage_conversation_index'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _compress(content):
+    raw = content.encode('utf-8')
+    data = gzip.compress(raw, compresslevel=6, mtime=0)
+    if len(data) >= len(raw):
+        return 'raw', raw, len(raw)
+    return 'gzip', data, len(raw)
+
+
+def _decompress(encoding, data):
+    if encoding == 'gzip':
+        return gzip.decompress(data).decode('utf-8')
+    if encoding == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return bytes(data).decode('utf-8')
+
+
+def upgrade():
+    op.create_table(
+        'kpc_ai_blobs',
+        sa.Column('hash', sa.String(length=64), nullable=False),
+        sa.Column('encoding', sa.String(length=8), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('hash')
+    )
+    op.add_column('kpc_ai_usage', sa.Column('prompt_hash', sa.String(length=64), nullable=True))
+    op.add_column('kpc_ai_usage', sa.Column('response_hash', sa.String(length=64), nullable=True))
+    op.create_foreign_key('fk_kpc_ai_usage_prompt_hash', 'kpc_ai_usage', 'kpc_ai_blobs', ['prompt_hash'], ['hash'])
+    op.create_foreign_key('fk_kpc_ai_usage_response_hash', 'kpc_ai_usage', 'kpc_ai_blobs', ['response_hash'], ['hash'])
+    op.alter_column('kpc_ai_usage', 'prompt', existing_type=sa.Text(), nullable=True)
+    op.alter_column('kpc_ai_usage', 'response', existing_type=sa.Text(), nullable=True)
+
+    # 기존 본문을 블롭으로 옮김 (id 순으로 BATCH_SIZE개씩)
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(sa.text("""
+            SELECT id, prompt, response FROM kpc_ai_usage
+             WHERE id > :last_id AND prompt IS NOT NULL
+             ORDER BY id LIMIT :limit
+        """), {"last_id": last_id, "limit": BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+
+        blobs = {}
+        updates = []
+        for row in rows:
+            hashes = []
+            for content in (row.prompt, row.response or ""):
+                content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+                if content_hash not in blobs:
+                    encoding, data, size = _compress(content)
+                    blobs[content_hash] = {"hash": content_hash, "encoding": encoding, "size": size, "data": data}
+                hashes.append(content_hash)
+            updates.append({"id": row.id, "prompt_hash": hashes[0], "response_hash": hashes[1]})
+
+        conn.execute(sa.text("""
+            INSERT INTO kpc_ai_blobs (hash, encoding, size, data)
+            VALUES (:hash, :encoding, :size, :data)
+            ON CONFLICT (hash) DO NOTHING
+        """), list(blobs.values()))
+        conn.execute(sa.text("""
+            UPDATE kpc_ai_usage
+               SET prompt_hash = :prompt_hash, response_hash = :response_hash, prompt = NULL, response = NULL
+             WHERE id = :id
+        """), updates)
+        last_id = rows[-1].id
+
+
+def downgrade():
+    # 블롭 본문을 사용 기록으로 되돌림
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(sa.text("""
+            SELECT u.id, p.encoding AS p_encoding, p.data AS p_data, r.encoding AS r_encoding, r.data AS r_data
+              FROM kpc_ai_usage u
+              JOIN kpc_ai_blobs p ON p.hash = u.prompt_hash
+              JOIN kpc_ai_blobs r ON r.hash = u.response_hash
+             WHERE u.id > :last_id AND u.prompt IS NULL
+             ORDER BY u.id LIMIT :limit
+        """), {"last_id": last_id, "limit": BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        conn.execute(sa.text("UPDATE kpc_ai_usage SET prompt = :prompt, response = :response WHERE id = :id"), [
+            {"id": row.id, "prompt": _decompress(row.p_encoding, row.p_data), "response": _decompress(row.r_encoding, row.r_data)}
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+    op.alter_column('kpc_ai_usage', 'response', existing_type=sa.Text(), nullable=False)
+    op.alter_column('kpc_ai_usage', 'prompt', existing_type=sa.Text(), nullable=False)
+    op.drop_constraint('fk_kpc_ai_usage_response_hash', 'kpc_ai_usage', type_='foreignkey')
+    op.drop_constraint('fk_kpc_ai_usage_prompt_hash', 'kpc_ai_usage', type_='foreignkey')
+    op.drop_column('kpc_ai_usage', 'response_hash')
+    op.drop_column('kpc_ai_usage', 'prompt_hash')
+    op.drop_table('kpc_ai_blobs')
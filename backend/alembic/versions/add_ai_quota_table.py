@@ -0,0 +1,39 @@
+"""Add kpc_ai_quota counter table
+
+Revision ID: add_ai_quota_table
+Revises: add_exam_timer_columns
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_ai_quota_table'
+down_revision = 'add_exam_timer_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'kpc_ai_quota',
+        sa.Column('exam_id', sa.Integer(), sa.ForeignKey('kpc_exams.id'), nullable=False),
+        sa.Column('question_id', sa.Integer(), sa.ForeignKey('kpc_questions.id'), nullable=False),
+        sa.Column('used', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('exam_id', 'question_id'),
+    )
+    
+    # 기존 사용 기록으로 카운터 초기화
+    op.execute("""
+        INSERT INTO kpc_ai_quota (exam_id, question_id, used)
+        SELECT exam_id, question_id, COUNT(*)
+          FROM kpc_ai_usage
+         GROUP BY exam_id, question_id
+    """)
+
+
+def downgrade():
+    op.drop_table('kpc_ai_quota')
@@ -0,0 +1,50 @@
+"""Split AI token counts and add token budget counters
+
+Revision ID: add_ai_token_accounting
+Revises: add_ai_usage_cached_flag
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_ai_token_accounting'
+down_revision = 'add_ai_usage_cached_flag'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('kpc_ai_usage', sa.Column('input_tokens', sa.Integer(), nullable=True))
+    op.add_column('kpc_ai_usage', sa.Column('output_tokens', sa.Integer(), nullable=True))
+
+    op.add_column('kpc_exams', sa.Column('cohort', sa.String(), nullable=True))
+    op.create_index('ix_kpc_exams_cohort', 'kpc_exams', ['cohort'])
+
+    op.create_table(
+        'kpc_ai_token_usage',
+        sa.Column('scope', sa.String(), nullable=False),
+        sa.Column('scope_key', sa.String(), nullable=False),
+        sa.Column('used_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('scope', 'scope_key')
+    )
+
+    # 기존 사용 기록으로 시험별 누적 사용량 초기화 (기존 시험은 회차 정보가 없음)
+    op.execute("""
+        INSERT INTO kpc_ai_token_usage (scope, scope_key, used_tokens)
+        SELECT 'exam', CAST(exam_id AS VARCHAR), COALESCE(SUM(tokens_used), 0)
+          FROM kpc_ai_usage
+         WHERE cached = false
+         GROUP BY exam_id
+    """)
+
+
+def downgrade():
+    op.drop_table('kpc_ai_token_usage')
+    op.drop_index('ix_kpc_exams_cohort', table_name='kpc_exams')
+    op.drop_column('kpc_exams', 'cohort')
+    op.drop_column('kpc_ai_usage', 'output_tokens')
+    op.drop_column('kpc_ai_usage', 'input_tokens')
@@ -0,0 +1,24 @@
+"""Add cached flag to kpc_ai_usage
+
+Revision ID: add_ai_usage_cached_flag
+Revises: add_ai_quota_table
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_ai_usage_cached_flag'
+down_revision = 'add_ai_quota_table'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('kpc_ai_usage', sa.Column('cached', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade():
+    op.drop_column('kpc_ai_usage', 'cached')
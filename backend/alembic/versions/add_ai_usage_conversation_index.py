@@ -0,0 +1,28 @@
+"""Index AI usage rows by conversation
+
+Revision ID: add_ai_usage_conversation_index
+Revises: add_ai_token_accounting
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_ai_usage_conversation_index'
+down_revision = 'add_ai_token_accounting'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 서버측 대화 기록 복원: (시험, 문항, 도구)별 턴 수 및 최근 턴 조회
+    op.create_index(
+        'ix_kpc_ai_usage_conversation',
+        'kpc_ai_usage',
+        ['exam_id', 'question_id', 'tool_type', 'id']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_kpc_ai_usage_conversation', table_name='kpc_ai_usage')
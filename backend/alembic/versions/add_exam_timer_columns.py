@@ -0,0 +1,30 @@
+"""Add server-side exam timer columns to kpc_exams
+
+Revision ID: add_exam_timer_columns
+Revises: rename_tables_kpc
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_exam_timer_columns'
+down_revision = 'rename_tables_kpc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('kpc_exams', sa.Column('duration_seconds', sa.Integer(), nullable=True))
+    op.add_column('kpc_exams', sa.Column('extension_seconds', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('kpc_exams', sa.Column('paused_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('kpc_exams', sa.Column('paused_seconds', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('kpc_exams', 'paused_seconds')
+    op.drop_column('kpc_exams', 'paused_at')
+    op.drop_column('kpc_exams', 'extension_seconds')
+    op.drop_column('kpc_exams', 'duration_seconds')
@@ -1,10 +1,11 @@
 from fastapi import APIRouter
-from app.api.endpoints import auth, exams, questions, answers, ai, admin
+from app.api.endpoints import auth, exams, questions, answers, ai, admin, channel
 
 api_router = APIRouter()
 
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(exams.router, prefix="/exams", tags=["exams"])
+api_router.include_router(channel.router, prefix="/exams", tags=["channel"])
 api_router.include_router(questions.router, prefix="/questions", tags=["questions"])
 api_router.include_router(answers.router, prefix="/answers", tags=["answers"])
 api_router.include_router(ai.router, prefix="/ai", tags=["ai"])
@@ -11,9 +11,12 @@ from app.models.user import User
 from app.models.exam import Exam
 from app.models.answer import Answer
 from app.models.question import Question, QuestionContent
-from app.schemas.exam import ExamResponse
+from app.schemas.exam import ExamResponse, ExamTimerExtend
+from app.services.exam_timer import utcnow, as_utc, deadline
+from app.services.deadline_scheduler import deadline_scheduler
+from app.services.exam_channel import exam_channel
 from app.api.endpoints.auth import get_current_user
-from app.services.ai_service import ai_service
+from app.services.ai_service import ai_service, KeyPoolSaturatedError
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -84,6 +87,104 @@ async def get_all_exams_admin(
     return exams
 
 
+def _get_exam_or_404(db: Session, exam_id: int) -> Exam:
+    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    if not exam:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exam not found"
+        )
+    return exam
+
+
+@router.post("/exams/{exam_id}/pause", response_model=ExamResponse)
+async def pause_exam(
+    exam_id: int,
+    admin: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """시험 타이머 일시정지"""
+    exam = _get_exam_or_404(db, exam_id)
+    if exam.status != "in_progress":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only exams in progress can be paused"
+        )
+    if exam.paused_at is None:
+        exam.paused_at = utcnow()
+        db.commit()
+        db.refresh(exam)
+        exam_channel.update_exam(exam)
+    return exam
+
+
+@router.post("/exams/{exam_id}/resume", response_model=ExamResponse)
+async def resume_exam(
+    exam_id: int,
+    admin: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """일시정지된 시험 타이머 재개"""
+    exam = _get_exam_or_404(db, exam_id)
+    if exam.paused_at is not None:
+        paused_for = int((utcnow() - as_utc(exam.paused_at)).total_seconds())
+        exam.paused_seconds = (exam.paused_seconds or 0) + max(0, paused_for)
+        exam.paused_at = None
+        db.commit()
+        db.refresh(exam)
+        deadline_scheduler.schedule(deadline(exam))
+        exam_channel.update_exam(exam)
+    return exam
+
+
+@router.post("/exams/{exam_id}/extend", response_model=ExamResponse)
+async def extend_exam(
+    exam_id: int,
+    extend_data: ExamTimerExtend,
+    admin: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """시험 시간 연장"""
+    exam = _get_exam_or_404(db, exam_id)
+    exam.extension_seconds = (exam.extension_seconds or 0) + extend_data.seconds
+    db.commit()
+    db.refresh(exam)
+    deadline_scheduler.schedule(deadline(exam))
+    exam_channel.update_exam(exam)
+    return exam
+
+
+@router.get("/exams/deadlines/status")
+async def get_deadline_scheduler_status(
+    admin: User = Depends(require_admin)
+):
+    """마감 자동 제출 스케줄러 상태"""
+    return deadline_scheduler.get_status()
+
+
+class BroadcastRequest(BaseModel):
+    message: str
+    exam_ids: Optional[List[int]] = None  # 없으면 연결된 모든 시험
+
+
+@router.post("/exams/broadcast")
+async def broadcast_to_exams(
+    request: BroadcastRequest,
+    admin: User = Depends(require_admin)
+):
+    """시험 세션 채널로 공지 전송 (예: "5분 남았습니다")"""
+    delivered = exam_channel.broadcast(request.message, request.exam_ids)
+    return {"delivered": delivered}
+
+
+@router.get("/exams/channel/status")
+async def get_exam_channel_status(
+    admin: User = Depends(require_admin)
+):
+    """시험 세션 채널 연결 수 및 통계"""
+    return exam_channel.get_status()
+
+
 class GradeRequest(BaseModel):
     score: int
 
@@ -285,11 +386,18 @@ async def auto_generate_question(
         logger.info(f"🤖 Auto-generating question: type={request.question_type}, competency={request.competency}")
         
         # Generate question using Gemini
-        result = await ai_service.generate_question(
-            question_type=request.question_type,
-            competency=request.competency,
-            topic=request.topic if request.topic else None
-        )
+        try:
+            result = await ai_service.generate_question(
+                question_type=request.question_type,
+                competency=request.competency,
+                topic=request.topic if request.topic else None
+            )
+        except KeyPoolSaturatedError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)}
+            )
         
         question_data = result["question_data"]
         
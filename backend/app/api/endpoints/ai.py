@@ -1,15 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import Dict, Any, List
+from typing import Dict, Any, List, AsyncIterator, Awaitable, Callable, Optional, Tuple, Union
+from contextlib import contextmanager
+import json
+import logging
+import time
 
-from app.core.database import get_db
+from app.core.database import get_db, SessionLocal
 from app.core.config import settings
 from app.models.exam import Exam
 from app.models.answer import AIUsage
+from app.models.question import Question
 from app.models.user import User
-from app.services.ai_service import ai_service
+from app.services.ai_service import ai_service, KeyPoolSaturatedError
+from app.services.ai_quota import ai_quota
+from app.services.ai_token_budget import ai_token_budget
+from app.services.ai_usage_writer import ai_usage_writer
+from app.services.ai_cache import ai_response_cache, CachePolicy
+from app.services.ai_similarity import prompt_similarity_index
+from app.services.ai_conversation import conversation_store, SessionKey
 from app.api.endpoints.auth import get_current_user
+from app.api.endpoints.admin import require_admin
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -20,12 +35,15 @@ class AIRequest(BaseModel):
     prompt: str
     provider: str = None  # Optional: openai, anthropic, gemini
     context: Dict[str, Any] = {}
+    # true면 서버에 저장된 이전 턴을 함께 보냄 (prompt에는 새 질문만)
+    conversation: bool = False
 
 
 class AIResponse(BaseModel):
     response: str
     tokens_used: int
     remaining_uses: int
+    cached: bool = False
 
 
 class FactCheckRequest(BaseModel):
@@ -35,234 +53,403 @@ class FactCheckRequest(BaseModel):
     sources: List[str] = []
 
 
-@router.post("/chatgpt", response_model=AIResponse)
-async def chat_gpt(
-    request: AIRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    # Verify exam belongs to user
-    exam = db.query(Exam).filter(Exam.id == request.exam_id).first()
+class StageTimer:
+    """AI 요청 파이프라인 단계별 소요 시간 (Server-Timing 헤더로 노출)"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+    
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = (time.perf_counter() - start) * 1000
+    
+    def header(self) -> str:
+        timings = dict(self.timings, total=(time.perf_counter() - self.started) * 1000)
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in timings.items())
+
+
+def authorize_ai_request(db: Session, current_user: User, exam_id: int):
+    """시험 소유권 확인"""
+    exam = db.query(Exam.user_id).filter(Exam.id == exam_id).first()
     if not exam or exam.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to use AI for this exam"
         )
-    
-    # Check usage limit
-    usage_count = db.query(AIUsage).filter(
-        AIUsage.exam_id == request.exam_id,
-        AIUsage.question_id == request.question_id
-    ).count()
-    
-    if usage_count >= settings.AI_USAGE_LIMIT_PER_QUESTION:
+
+
+async def reserve_ai_quota(db: Session, current_user: User, request: Union[AIRequest, FactCheckRequest]) -> int:
+    """
+    소유권 확인과 문항별 사용 슬롯 예약을 한 번에 처리
+
+    Returns:
+        예약 후 사용 횟수
+    """
+    used = await ai_quota.reserve(db, current_user.id, request.exam_id, request.question_id)
+    if used is None:
+        # 실패 원인 구분 (권한 없음 / 한도 초과) - 거절된 요청에서만 실행
+        authorize_ai_request(db, current_user, request.exam_id)
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail=f"AI usage limit reached for this question ({settings.AI_USAGE_LIMIT_PER_QUESTION} uses)"
         )
+    return used
+
+
+def check_token_budget(db: Session, request: Union[AIRequest, FactCheckRequest]):
+    """시험/회차 토큰 예산 확인 (프로바이더 호출 전)"""
+    scope = ai_token_budget.exhausted_scope(db, request.exam_id)
+    if scope is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"AI token budget exhausted for this {scope}"
+        )
+
+
+async def refund_ai_quota(request: Union[AIRequest, FactCheckRequest]):
+    """프로바이더 실패 시 예약 슬롯 반환 (스트리밍 종료 시점에도 쓰이므로 별도 세션 사용)"""
+    db = SessionLocal()
+    try:
+        await ai_quota.refund(db, request.exam_id, request.question_id)
+    finally:
+        db.close()
+
+
+def attach_conversation(db: Session, request: AIRequest, tool_type: str) -> Optional[SessionKey]:
+    """
+    대화 모드면 (시험, 문항, 도구)의 이전 턴을 context["history"]에 넣고 세션 키 반환
+
+    프로바이더 호출은 request.context를 참조하므로 같은 dict를 직접 수정합니다.
+    """
+    if not request.conversation:
+        return None
+    key = (request.exam_id, request.question_id, tool_type)
+    request.context["history"] = conversation_store.history(db, key)
+    return key
+
+
+def lookup_cache(db: Session, request: AIRequest, tool_type: str) -> Tuple[Optional[Tuple], Optional[CachePolicy], Optional[Dict[str, Any]]]:
+    """
+    문항에 응답 캐시가 켜져 있으면 (캐시 키, 설정, 캐시된 응답) 반환
+
+    캐시가 꺼져 있거나 이전 대화가 포함된 요청이면 (None, None, None), 미적중이면 응답만 None입니다.
+    """
+    if request.context.get("history"):
+        # 같은 질문이라도 앞선 대화에 따라 답이 달라지므로 캐시하지 않음
+        return None, None, None
+    policy = ai_response_cache.get_policy(db, request.question_id)
+    if not policy.enabled:
+        return None, None, None
+    cache_key = ai_response_cache.make_key(request.question_id, tool_type, request.prompt)
+    return cache_key, policy, ai_response_cache.lookup(cache_key, policy)
+
+
+async def run_ai_request(
+    request: AIRequest,
+    tool_type: str,
+    provider_call: Callable[[], Awaitable[Dict[str, Any]]],
+    current_user: User,
+    db: Session,
+    response: Response
+) -> Dict[str, Any]:
+    """
+    AI 요청 공통 파이프라인: 권한 확인/슬롯 예약 → 프로바이더 호출 → 사용 기록
+    """
+    timer = StageTimer()
     
     try:
-        # Call ChatGPT
-        result = await ai_service.chat_gpt(request.prompt, request.context)
+        with timer.stage("reserve"):
+            check_token_budget(db, request)
+            used = await reserve_ai_quota(db, current_user, request)
         
-        # Log usage
-        ai_usage = AIUsage(
-            exam_id=request.exam_id,
-            question_id=request.question_id,
-            tool_type="chatgpt",
-            prompt=request.prompt,
-            response=result["response"],
-            tokens_used=result["tokens_used"]
-        )
-        db.add(ai_usage)
-        db.commit()
+        try:
+            with timer.stage("history"):
+                conversation_key = attach_conversation(db, request, tool_type)
+            
+            with timer.stage("cache"):
+                cache_key, cache_policy, result = lookup_cache(db, request, tool_type)
+            cached = result is not None
+            
+            if not cached:
+                try:
+                    with timer.stage("provider"):
+                        result = await provider_call()
+                except KeyPoolSaturatedError as e:
+                    # 대기 큐가 가득 참 - 오래 기다리게 하지 않고 즉시 재시도 시점 안내
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail=str(e),
+                        headers={"Retry-After": str(e.retry_after)}
+                    )
+                except Exception as e:
+                    raise HTTPException(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=f"AI service error: {str(e)}"
+                    )
+                if cache_key:
+                    ai_response_cache.store(cache_key, result, cache_policy)
+        except Exception:
+            # 응답을 받기 전 실패 (대화 기록/캐시 조회 포함) - 예약 슬롯 반환
+            await refund_ai_quota(request)
+            raise
         
-        remaining_uses = settings.AI_USAGE_LIMIT_PER_QUESTION - (usage_count + 1)
-        
-        return {
-            "response": result["response"],
-            "tokens_used": result["tokens_used"],
-            "remaining_uses": remaining_uses
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"AI service error: {str(e)}"
-        )
+        with timer.stage("record"):
+            # 지연 일괄 저장 (한도는 이미 카운터로 예약됨)
+            _log_usage(
+                request, tool_type, result["response"], result["tokens_used"], cached,
+                result.get("input_tokens"), result.get("output_tokens")
+            )
+        if conversation_key:
+            conversation_store.append(conversation_key, request.prompt, result["response"])
+    finally:
+        response.headers["Server-Timing"] = timer.header()
+        logger.info(f"[AI] {tool_type} exam_id={request.exam_id} question_id={request.question_id} {timer.header()}")
+    
+    return {
+        "response": result["response"],
+        "tokens_used": result["tokens_used"],
+        "remaining_uses": settings.AI_USAGE_LIMIT_PER_QUESTION - used,
+        "cached": cached
+    }
+
+
+@router.post("/chatgpt", response_model=AIResponse)
+async def chat_gpt(
+    request: AIRequest,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return await run_ai_request(
+        request, "chatgpt", lambda: ai_service.generate(request.prompt, "openai", request.context),
+        current_user, db, response
+    )
 
 
 @router.post("/claude", response_model=AIResponse)
 async def claude(
     request: AIRequest,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Verify exam belongs to user
-    exam = db.query(Exam).filter(Exam.id == request.exam_id).first()
-    if not exam or exam.user_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to use AI for this exam"
-        )
-    
-    # Check usage limit
-    usage_count = db.query(AIUsage).filter(
-        AIUsage.exam_id == request.exam_id,
-        AIUsage.question_id == request.question_id
-    ).count()
-    
-    if usage_count >= settings.AI_USAGE_LIMIT_PER_QUESTION:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"AI usage limit reached for this question ({settings.AI_USAGE_LIMIT_PER_QUESTION} uses)"
-        )
-    
-    try:
-        # Call Claude
-        result = await ai_service.claude(request.prompt, request.context)
-        
-        # Log usage
-        ai_usage = AIUsage(
-            exam_id=request.exam_id,
-            question_id=request.question_id,
-            tool_type="claude",
-            prompt=request.prompt,
-            response=result["response"],
-            tokens_used=result["tokens_used"]
-        )
-        db.add(ai_usage)
-        db.commit()
-        
-        remaining_uses = settings.AI_USAGE_LIMIT_PER_QUESTION - (usage_count + 1)
-        
-        return {
-            "response": result["response"],
-            "tokens_used": result["tokens_used"],
-            "remaining_uses": remaining_uses
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"AI service error: {str(e)}"
-        )
+    return await run_ai_request(
+        request, "claude", lambda: ai_service.generate(request.prompt, "anthropic", request.context),
+        current_user, db, response
+    )
 
 
 @router.post("/gemini", response_model=AIResponse)
 async def gemini(
     request: AIRequest,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Verify exam belongs to user
-    exam = db.query(Exam).filter(Exam.id == request.exam_id).first()
-    if not exam or exam.user_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to use AI for this exam"
-        )
-    
-    # Check usage limit
-    usage_count = db.query(AIUsage).filter(
-        AIUsage.exam_id == request.exam_id,
-        AIUsage.question_id == request.question_id
-    ).count()
-    
-    if usage_count >= settings.AI_USAGE_LIMIT_PER_QUESTION:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"AI usage limit reached for this question ({settings.AI_USAGE_LIMIT_PER_QUESTION} uses)"
-        )
-    
-    try:
-        # Call Gemini
-        result = await ai_service.gemini(request.prompt, request.context)
-        
-        # Log usage
-        ai_usage = AIUsage(
-            exam_id=request.exam_id,
-            question_id=request.question_id,
-            tool_type="gemini",
-            prompt=request.prompt,
-            response=result["response"],
-            tokens_used=result["tokens_used"]
-        )
-        db.add(ai_usage)
-        db.commit()
-        
-        remaining_uses = settings.AI_USAGE_LIMIT_PER_QUESTION - (usage_count + 1)
-        
-        return {
-            "response": result["response"],
-            "tokens_used": result["tokens_used"],
-            "remaining_uses": remaining_uses
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"AI service error: {str(e)}"
-        )
+    return await run_ai_request(
+        request, "gemini", lambda: ai_service.generate(request.prompt, "gemini", request.context),
+        current_user, db, response
+    )
 
 
 @router.post("/generate", response_model=AIResponse)
 async def generate(
     request: AIRequest,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Generate response using the default AI provider or specified provider
     """
-    # Verify exam belongs to user
-    exam = db.query(Exam).filter(Exam.id == request.exam_id).first()
-    if not exam or exam.user_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to use AI for this exam"
-        )
-    
-    # Check usage limit
-    usage_count = db.query(AIUsage).filter(
-        AIUsage.exam_id == request.exam_id,
-        AIUsage.question_id == request.question_id
-    ).count()
+    return await run_ai_request(
+        request, request.provider or settings.DEFAULT_AI_PROVIDER,
+        lambda: ai_service.generate(request.prompt, request.provider, request.context),
+        current_user, db, response
+    )
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _log_usage(request: AIRequest, tool_type: str, response: str, tokens_used: int, cached: bool = False,
+               input_tokens: Optional[int] = None, output_tokens: Optional[int] = None):
+    """사용 기록을 지연 저장 큐에 추가 (요청 세션과 무관하므로 스트리밍 종료 시점에도 사용)"""
+    ai_usage_writer.record(
+        exam_id=request.exam_id,
+        question_id=request.question_id,
+        tool_type=tool_type,
+        prompt=request.prompt,
+        response=response,
+        tokens_used=tokens_used,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        cached=cached
+    )
+
+
+async def _cached_stream(result: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    yield {"type": "token", "text": result["response"]}
+    yield dict(result, type="done")
+
+
+async def run_ai_stream(
+    request: AIRequest,
+    tool_type: str,
+    stream_factory: Callable[[], AsyncIterator[Dict[str, Any]]],
+    current_user: User,
+    db: Session
+) -> StreamingResponse:
+    """
+    스트리밍용 AI 요청 파이프라인 - 프로바이더 토큰을 SSE로 전달
+
+    - 정상 종료: 전체 응답과 실제 토큰 수로 AIUsage 기록 후 done 이벤트 전송
+    - 클라이언트 연결 종료: 이미 생성된 부분 응답도 사용 횟수에 포함하여 기록
+    - 프로바이더 오류: 일반 엔드포인트와 같이 사용 횟수에 포함하지 않음
+    """
+    timer = StageTimer()
+    try:
+        stream = stream_factory()
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
-    if usage_count >= settings.AI_USAGE_LIMIT_PER_QUESTION:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"AI usage limit reached for this question ({settings.AI_USAGE_LIMIT_PER_QUESTION} uses)"
-        )
+    with timer.stage("reserve"):
+        check_token_budget(db, request)
+        used = await reserve_ai_quota(db, current_user, request)
     
     try:
-        # Use specified provider or default
-        result = await ai_service.generate(request.prompt, request.provider, request.context)
-        
-        # Determine tool_type
-        tool_type = request.provider or settings.DEFAULT_AI_PROVIDER
+        with timer.stage("history"):
+            # 스트림 생성 시 넘긴 context dict에 이전 턴이 채워짐 (본문은 아직 실행 전)
+            conversation_key = attach_conversation(db, request, tool_type)
         
-        # Log usage
-        ai_usage = AIUsage(
-            exam_id=request.exam_id,
-            question_id=request.question_id,
-            tool_type=tool_type,
-            prompt=request.prompt,
-            response=result["response"],
-            tokens_used=result["tokens_used"]
-        )
-        db.add(ai_usage)
-        db.commit()
-        
-        remaining_uses = settings.AI_USAGE_LIMIT_PER_QUESTION - (usage_count + 1)
-        
-        return {
-            "response": result["response"],
-            "tokens_used": result["tokens_used"],
-            "remaining_uses": remaining_uses
+        with timer.stage("cache"):
+            cache_key, cache_policy, cached_result = lookup_cache(db, request, tool_type)
+    except Exception:
+        # 스트림 시작 전 실패 - 예약 슬롯 반환
+        await stream.aclose()
+        await refund_ai_quota(request)
+        raise
+    if cached_result is not None:
+        # 캐시 적중 - 프로바이더 스트림 대신 저장된 응답을 그대로 전달
+        await stream.aclose()
+        stream = _cached_stream(cached_result)
+    cached = cached_result is not None
+    
+    async def event_stream():
+        parts: List[str] = []
+        logged = False
+        failed = False
+        first_token_at = None
+        try:
+            async for event in stream:
+                if event["type"] == "token":
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        timer.timings["first_token"] = (first_token_at - timer.started) * 1000
+                    parts.append(event["text"])
+                    yield _sse("token", {"text": event["text"]})
+                    continue
+                
+                if cache_key and not cached:
+                    ai_response_cache.store(cache_key, event, cache_policy)
+                with timer.stage("record"):
+                    _log_usage(
+                        request, tool_type, event["response"], event["tokens_used"], cached,
+                        event.get("input_tokens"), event.get("output_tokens")
+                    )
+                if conversation_key:
+                    conversation_store.append(conversation_key, request.prompt, event["response"])
+                logged = True
+                yield _sse("done", {
+                    "response": event["response"],
+                    "tokens_used": event["tokens_used"],
+                    "remaining_uses": settings.AI_USAGE_LIMIT_PER_QUESTION - used,
+                    "cached": cached
+                })
+        except KeyPoolSaturatedError as e:
+            failed = True
+            yield _sse("error", {"detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            failed = True
+            yield _sse("error", {"detail": f"AI service error: {str(e)}"})
+        finally:
+            # 연결이 끊기면 제너레이터가 닫히며 프로바이더 스트림도 정리됨
+            await stream.aclose()
+            if not logged and not failed and parts:
+                partial = "".join(parts)
+                _log_usage(request, tool_type, partial, ai_service._estimate_tokens(request.prompt, partial))
+                if conversation_key:
+                    conversation_store.append(conversation_key, request.prompt, partial)
+            elif failed or not logged:
+                # 오류 또는 토큰이 나오기 전 연결 종료 - 예약 슬롯 반환
+                await refund_ai_quota(request)
+            logger.info(f"[AI] {tool_type} stream exam_id={request.exam_id} question_id={request.question_id} {timer.header()}")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "Server-Timing": timer.header()
         }
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"AI service error: {str(e)}"
-        )
+    )
+
+
+@router.post("/chatgpt/stream")
+async def chat_gpt_stream(
+    request: AIRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return await run_ai_stream(
+        request, "chatgpt", lambda: ai_service.generate_stream(request.prompt, "openai", request.context),
+        current_user, db
+    )
+
+
+@router.post("/claude/stream")
+async def claude_stream(
+    request: AIRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return await run_ai_stream(
+        request, "claude", lambda: ai_service.generate_stream(request.prompt, "anthropic", request.context),
+        current_user, db
+    )
+
+
+@router.post("/gemini/stream")
+async def gemini_stream(
+    request: AIRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return await run_ai_stream(
+        request, "gemini", lambda: ai_service.generate_stream(request.prompt, "gemini", request.context),
+        current_user, db
+    )
+
+
+@router.post("/generate/stream")
+async def generate_stream(
+    request: AIRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stream response using the default AI provider or specified provider"""
+    return await run_ai_stream(
+        request, request.provider or settings.DEFAULT_AI_PROVIDER,
+        lambda: ai_service.generate_stream(request.prompt, request.provider, request.context),
+        current_user, db
+    )
 
 
 @router.post("/verify", response_model=Dict[str, Any])
@@ -271,35 +458,37 @@ async def verify_fact(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Verify exam belongs to user
-    exam = db.query(Exam).filter(Exam.id == request.exam_id).first()
-    if not exam or exam.user_id != current_user.id:
+    # 없는 문항이면 사용 기록이 외래 키 위반으로 저장되지 않으므로 미리 거절
+    if not db.query(Question.id).filter(Question.id == request.question_id).first():
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to use AI for this exam"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Question not found"
         )
+    # 사실 확인도 유료 프로바이더 호출이므로 토큰 예산과 문항별 사용 한도에 포함
+    # (kpc_ai_quota 초기값도 fact_check 기록을 포함해 계산됨)
+    check_token_budget(db, request)
+    await reserve_ai_quota(db, current_user, request)
     
     try:
         result = await ai_service.fact_check(request.claim, request.sources)
-        
-        # Log usage
-        ai_usage = AIUsage(
-            exam_id=request.exam_id,
-            question_id=request.question_id,
-            tool_type="fact_check",
-            prompt=f"Fact check: {request.claim}",
-            response=result["verification"],
-            tokens_used=result["tokens_used"]
-        )
-        db.add(ai_usage)
-        db.commit()
-        
-        return result
     except Exception as e:
+        await refund_ai_quota(request)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Fact checking error: {str(e)}"
         )
+    
+    # Log usage (토큰 예산에도 누적)
+    ai_usage_writer.record(
+        exam_id=request.exam_id,
+        question_id=request.question_id,
+        tool_type="fact_check",
+        prompt=f"Fact check: {request.claim}",
+        response=result["verification"],
+        tokens_used=result["tokens_used"]
+    )
+    
+    return result
 
 
 @router.get("/usage/{exam_id}")
@@ -316,7 +505,10 @@ async def get_ai_usage(
             detail="Not authorized to view AI usage for this exam"
         )
     
-    usage_records = db.query(AIUsage).filter(AIUsage.exam_id == exam_id).all()
+    # 메타데이터만 조회 (본문은 kpc_ai_blobs에 있음)
+    usage_records = db.query(
+        AIUsage.question_id, AIUsage.tool_type, AIUsage.timestamp, AIUsage.tokens_used
+    ).filter(AIUsage.exam_id == exam_id).all()
     
     # Group by question
     usage_by_question = {}
@@ -332,10 +524,41 @@ async def get_ai_usage(
     return usage_by_question
 
 
+@router.get("/cache/status")
+async def get_cache_status(admin: User = Depends(require_admin)):
+    """AI 응답 캐시 및 유사 프롬프트 인덱스 상태 확인 (관리자용)"""
+    return {
+        "exact": ai_response_cache.get_status(),
+        "near_duplicate": prompt_similarity_index.get_status(),
+        "single_flight": ai_service.single_flight.get_status(),
+        "conversation": conversation_store.get_status()
+    }
+
+
+@router.get("/usage-writer/status")
+async def get_usage_writer_status(admin: User = Depends(require_admin)):
+    """AI 사용 기록 지연 저장 큐 상태 (관리자용)"""
+    return ai_usage_writer.get_status()
+
+
+@router.get("/hedging/status")
+async def get_hedging_status(admin: User = Depends(require_admin)):
+    """헤지 요청 통계 (관리자용)"""
+    return dict(ai_service.hedging.get_status(), enabled=settings.AI_HEDGE_ENABLED)
+
+
+@router.get("/latency/status")
+async def get_latency_status(admin: User = Depends(require_admin)):
+    """프로바이더별 지연 시간 분위수/오류 분류 (관리자용, 키별 값은 /key-pool/status)"""
+    return ai_service.provider_latency.get_status()
+
+
 @router.get("/key-pool/status")
-async def get_key_pool_status():
+async def get_key_pool_status(admin: User = Depends(require_admin)):
     """Gemini API 키 풀 상태 확인 (관리자용)"""
     if ai_service.gemini_key_pool:
+        # Redis 공유 상태는 조회 시점에 스냅샷 갱신
+        await ai_service.gemini_key_pool.state.refresh()
         return ai_service.gemini_key_pool.get_status()
     else:
         return {
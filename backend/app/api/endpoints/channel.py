@@ -0,0 +1,125 @@
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
+import json
+import logging
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.exam import Exam
+from app.api.endpoints.auth import get_user_from_token
+from app.services.exam_channel import exam_channel
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _authorize_session(token: str, exam_id: int) -> Optional[tuple]:
+    """연결 시 한 번만 인증/소유권 확인 (이후 메시지는 DB 인증 없이 처리)"""
+    db = SessionLocal()
+    try:
+        user = get_user_from_token(token, db)
+        if user is None:
+            return None
+        exam = db.query(Exam).filter(Exam.id == exam_id).first()
+        if not exam or exam.user_id != user.id:
+            return None
+        return user, exam
+    finally:
+        db.close()
+
+
+@router.websocket("/{exam_id}/ws")
+async def exam_session_ws(websocket: WebSocket, exam_id: int, token: str = Query(...)):
+    """
+    시험 세션 WebSocket 채널
+
+    클라이언트 → 서버: save_answer, ping/timer
+    서버 → 클라이언트: timer, save_ack, save_error, broadcast, exam_submitted
+    """
+    authorized = _authorize_session(token, exam_id)
+    if authorized is None:
+        await websocket.close(code=1008)
+        return
+
+    user, exam = authorized
+    await websocket.accept()
+    conn = exam_channel.connect(exam, user.id, "websocket")
+
+    async def pump():
+        while True:
+            message = await conn.next_message()
+            if message is None:
+                # 송신 큐가 넘친 느린 클라이언트는 재연결하도록 종료
+                await websocket.close(code=1013 if conn.close_reason == "slow_consumer" else 1000)
+                return
+            await websocket.send_json(message)
+
+    sender = asyncio.create_task(pump())
+    try:
+        while not sender.done():
+            receiver = asyncio.create_task(websocket.receive_text())
+            done, _ = await asyncio.wait({receiver, sender}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver not in done:
+                receiver.cancel()
+                break
+            try:
+                message = json.loads(receiver.result())
+            except ValueError:
+                conn.send({"type": "error", "detail": "Invalid JSON"})
+                continue
+            if not isinstance(message, dict):
+                conn.send({"type": "error", "detail": "Message must be an object"})
+                continue
+            await exam_channel.handle_client_message(conn, message)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"[Channel] websocket error: {e}", exc_info=True)
+    finally:
+        sender.cancel()
+        exam_channel.disconnect(conn)
+
+
+@router.get("/{exam_id}/events")
+async def exam_session_events(request: Request, exam_id: int, token: str = Query(...)):
+    """
+    시험 세션 SSE 채널 (WebSocket을 사용할 수 없는 환경용)
+
+    서버 → 클라이언트 메시지만 전달하며, 답안 저장은 기존 POST /answers를 사용합니다.
+    """
+    authorized = _authorize_session(token, exam_id)
+    if authorized is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this exam"
+        )
+
+    user, exam = authorized
+    conn = exam_channel.connect(exam, user.id, "sse")
+
+    async def event_stream():
+        try:
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    message = await asyncio.wait_for(
+                        conn.next_message(), timeout=settings.EXAM_CHANNEL_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield f"event: {message['type']}\ndata: {json.dumps(message, ensure_ascii=False)}\n\n"
+        finally:
+            exam_channel.disconnect(conn)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -4,11 +4,15 @@ from datetime import datetime
 from typing import List, Dict, Any
 
 from app.core.database import get_db
+from app.core.config import settings
 from app.models.exam import Exam, ExamStatus
 from app.models.user import User
 from app.models.answer import Answer
 from app.models.question import Question
-from app.schemas.exam import ExamResponse, ExamStart, ExamTimerUpdate
+from app.schemas.exam import ExamResponse, ExamStart, ExamTimerUpdate, ExamTimerSync
+from app.services.exam_timer import remaining_seconds, utcnow, deadline
+from app.services.deadline_scheduler import deadline_scheduler
+from app.services.exam_channel import exam_channel
 from app.api.endpoints.auth import get_current_user
 
 router = APIRouter()
@@ -32,8 +36,11 @@ async def start_exam(
         # If not started, update it to in progress
         existing_exam.status = ExamStatus.IN_PROGRESS
         existing_exam.start_time = datetime.utcnow()
+        existing_exam.duration_seconds = settings.EXAM_DURATION_SECONDS
+        existing_exam.cohort = settings.EXAM_COHORT
         db.commit()
         db.refresh(existing_exam)
+        deadline_scheduler.schedule(deadline(existing_exam))
         return existing_exam
     
     # Create new exam
@@ -41,12 +48,17 @@ async def start_exam(
         user_id=current_user.id,
         status=ExamStatus.IN_PROGRESS,
         start_time=datetime.utcnow(),
-        timer_remaining=7200  # 120 minutes
+        duration_seconds=settings.EXAM_DURATION_SECONDS,
+        timer_remaining=settings.EXAM_DURATION_SECONDS,
+        extension_seconds=0,
+        paused_seconds=0,
+        cohort=settings.EXAM_COHORT
     )
     
     db.add(new_exam)
     db.commit()
     db.refresh(new_exam)
+    deadline_scheduler.schedule(deadline(new_exam))
     
     return new_exam
 
@@ -160,13 +172,19 @@ async def get_exam(
     return exam
 
 
-@router.patch("/{exam_id}/timer", response_model=ExamResponse)
+@router.patch("/{exam_id}/timer", response_model=ExamTimerSync)
 async def update_timer(
     exam_id: int,
     timer_data: ExamTimerUpdate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """
+    클라이언트 타이머 드리프트 확인
+
+    남은 시간은 서버가 start_time 기준으로 계산하므로 여기서는 아무것도 기록하지 않고,
+    클라이언트 값과 서버 값의 차이만 반환합니다.
+    """
     exam = db.query(Exam).filter(Exam.id == exam_id).first()
     
     if not exam:
@@ -181,11 +199,19 @@ async def update_timer(
             detail="Not authorized to update this exam"
         )
     
-    exam.timer_remaining = timer_data.timer_remaining
-    db.commit()
-    db.refresh(exam)
+    now = utcnow()
+    server_remaining = remaining_seconds(exam, now)
+    drift = timer_data.timer_remaining - server_remaining
     
-    return exam
+    return {
+        "exam_id": exam.id,
+        "timer_remaining": server_remaining,
+        "client_timer_remaining": timer_data.timer_remaining,
+        "drift_seconds": drift,
+        "in_sync": abs(drift) <= settings.EXAM_TIMER_DRIFT_TOLERANCE_SECONDS,
+        "is_paused": exam.is_paused,
+        "server_time": now
+    }
 
 
 @router.post("/{exam_id}/submit", response_model=ExamResponse)
@@ -218,6 +244,7 @@ async def submit_exam(
     exam.end_time = datetime.utcnow()
     db.commit()
     db.refresh(exam)
+    exam_channel.update_exam(exam)
     
     return exam
 
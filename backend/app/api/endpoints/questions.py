@@ -7,6 +7,7 @@ from app.models.question import Question, QuestionContent
 from app.models.user import User
 from app.schemas.question import QuestionResponse, QuestionCreate
 from app.api.endpoints.auth import get_current_user
+from app.services.ai_cache import ai_response_cache
 
 router = APIRouter()
 
@@ -185,6 +186,8 @@ async def update_question(
     try:
         db.commit()
         db.refresh(question)
+        # 문항이 바뀌면 캐시된 AI 응답과 캐시 설정도 무효화
+        ai_response_cache.invalidate_question(question.id)
         print(f"Successfully committed. Final content: {question.content}")
     except Exception as e:
         db.rollback()
@@ -39,11 +39,100 @@ class Settings(BaseSettings):
     # Default AI Provider
     DEFAULT_AI_PROVIDER: str = "gemini"  # Options: openai, anthropic, gemini
     
+    # AI Provider Timeouts
+    AI_REQUEST_TIMEOUT_SECONDS: float = 60.0
+    AI_MAX_RETRIES: int = 1
+    
+    # Exam Timer (seconds)
+    EXAM_DURATION_SECONDS: int = 7200  # 120 minutes
+    # 클라이언트 타이머와 서버 타이머 차이 허용 범위
+    EXAM_TIMER_DRIFT_TOLERANCE_SECONDS: int = 5
+    # 마감 시험 자동 제출 스케줄러
+    EXAM_DEADLINE_SCHEDULER_ENABLED: bool = True
+    EXAM_DEADLINE_RESYNC_SECONDS: int = 60  # DB에서 마감 시각을 다시 읽는 주기
+    EXAM_DEADLINE_GRACE_SECONDS: int = 10  # 클라이언트 자동 제출을 위한 여유 시간
+    
+    # Exam Session Channel (WebSocket/SSE)
+    EXAM_CHANNEL_QUEUE_SIZE: int = 100  # 연결별 송신 큐 크기
+    EXAM_CHANNEL_TICK_SECONDS: int = 15  # 서버 타이머 틱 주기
+    EXAM_CHANNEL_KEEPALIVE_SECONDS: int = 20  # SSE keepalive 주기
+    
     # AI Usage Limits
     AI_USAGE_LIMIT_PER_QUESTION: int = 10
+    # 토큰 예산 (0이면 제한 없음) - 호출 전 누적 사용량으로 확인
+    AI_TOKEN_BUDGET_PER_EXAM: int = 0
+    AI_TOKEN_BUDGET_PER_COHORT: int = 0
+    # 이번 시험 회차 식별자 (시작 시 시험에 기록되며 회차별 토큰 예산 단위)
+    EXAM_COHORT: str = "default"
+    # 한도 카운터 저장소: database, redis, auto (REDIS_URL이 있으면 redis)
+    # database는 소유권 확인 + 예약이 한 문장이고, redis도 소유권 확인/테이블 반영에 DB를 쓰므로 기본은 database
+    AI_QUOTA_BACKEND: str = "database"
+    AI_QUOTA_REDIS_TTL_SECONDS: int = 86400
+    
+    # AI 사용 기록 지연 일괄 저장 (요청 경로에서는 큐에만 추가)
+    AI_USAGE_FLUSH_INTERVAL_SECONDS: float = 0.25
+    AI_USAGE_BATCH_SIZE: int = 500
+    AI_USAGE_QUEUE_MAX_SIZE: int = 10000  # 초과 시 요청 경로에서 바로 저장 (스레드 풀)
+    AI_USAGE_DEAD_LETTER_MAX_SIZE: int = 10000  # 재시도 후에도 저장하지 못해 보관하는 기록 수 한도
+    # 프롬프트/응답 본문 압축: auto (zstandard가 있으면 zstd, 없으면 gzip), zstd, gzip, raw
+    AI_BLOB_COMPRESSION: str = "auto"
+    
+    # AI Response Cache (문항별 ai_options["response_cache"]로 활성화)
+    AI_CACHE_MAX_ENTRIES: int = 5000
+    AI_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    AI_CACHE_DEFAULT_TTL_SECONDS: int = 3600
+    # 유사 프롬프트 재사용 (ai_options["response_cache"]["near_duplicate"]로 활성화)
+    AI_SIMILARITY_THRESHOLD: float = 0.85  # 문자 3-gram Jaccard 유사도
+    AI_SIMILARITY_MAX_PER_QUESTION: int = 500
+    AI_SIMILARITY_SAMPLE_RATE: float = 0.05  # 오탐 검토용 적중 샘플링 비율
+    
+    # 서버측 대화 기록 (요청의 conversation=true일 때 (시험, 문항, 도구)별 이전 턴 포함)
+    AI_CONVERSATION_MAX_SESSIONS: int = 10000
+    AI_CONVERSATION_MAX_TURNS: int = 20
+    AI_CONVERSATION_MAX_CONTEXT_TOKENS: int = 4000
+    AI_CONVERSATION_SUMMARY_CHARS: int = 500  # 잘린 턴의 질문 요약 최대 길이
+    
+    # 동일한 동시 요청을 프로바이더 호출 하나로 합침
+    AI_SINGLE_FLIGHT_ENABLED: bool = True
+    
+    # 지연 기반 헤지 요청 (주 프로바이더가 p95 안에 응답하지 않으면 예비 요청 시작)
+    AI_HEDGE_ENABLED: bool = False
+    AI_HEDGE_QUANTILE: float = 0.95
+    AI_HEDGE_MIN_DELAY_SECONDS: float = 1.0
+    # 예비 프로바이더 (콤마 구분, 비어 있으면 Gemini의 다른 키로만 헤지)
+    AI_HEDGE_BACKUP_PROVIDERS: str = ""
+    # 주 요청 대비 헤지 비율 상한 (최대 1.0 = 비용 2배)
+    AI_HEDGE_BUDGET_RATIO: float = 0.1
+    AI_HEDGE_BUDGET_BURST: float = 10.0
     
     # Rate Limiting (requests per minute per key)
     GEMINI_RATE_LIMIT_PER_KEY: int = 15
+    # 키별 분당 토큰 한도 (0이면 요청 수 한도만 적용)
+    GEMINI_TOKENS_PER_MINUTE_PER_KEY: int = 0
+    # 키 풀 한도/브레이커 상태 저장소: "auto" (REDIS_URL이 있으면 Redis), "redis", "local"
+    GEMINI_POOL_STATE_BACKEND: str = "auto"
+    # 키별 서킷 브레이커 (연속 429/5xx 시 쿨다운 동안 키 제외)
+    GEMINI_BREAKER_FAILURE_THRESHOLD: int = 3
+    GEMINI_BREAKER_COOLDOWN_SECONDS: float = 5.0
+    GEMINI_BREAKER_MAX_COOLDOWN_SECONDS: float = 120.0
+    # 재시도 지수 백오프 (full jitter)
+    GEMINI_RETRY_BACKOFF_SECONDS: float = 0.5
+    GEMINI_RETRY_MAX_BACKOFF_SECONDS: float = 8.0
+    # 일괄 처리 동시 제출 수 (0이면 키 풀 워커 수) 및 항목별 재시도 횟수
+    GEMINI_BATCH_CONCURRENCY: int = 0
+    GEMINI_BATCH_MAX_RETRIES: int = 2
+    # 키 풀 대기 큐 최대 길이 (초과 시 503 + Retry-After)
+    GEMINI_QUEUE_MAX_SIZE: int = 500
+    
+    # 로컬 스텁 AI 프로바이더 (true면 Gemini 대신 사용 - 네트워크 없이 부하 테스트용)
+    AI_STUB_ENABLED: bool = False
+    AI_STUB_KEYS: int = 3
+    # 지연 시간 분포: fixed:s, uniform:a,b, lognormal:median,sigma, exponential:mean (초)
+    AI_STUB_LATENCY: str = "lognormal:0.8,0.5"
+    AI_STUB_429_RATE: float = 0.0  # 무작위 429 비율
+    AI_STUB_429_RATE_BY_KEY: str = ""  # 키별 429 비율 (예: "0:0.3,2:0.05")
+    AI_STUB_RPM_PER_KEY: int = 0  # 키별 분당 요청 한도 (초과 시 429, 0이면 없음)
+    AI_STUB_STREAM_CHUNKS: int = 8
     
     # Redis (Optional)
     REDIS_URL: str = ""
@@ -0,0 +1,26 @@
+from typing import Optional
+from app.core.config import settings
+
+# Safely import redis (optional dependency)
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    REDIS_AVAILABLE = False
+
+_client = None
+
+
+def redis_enabled() -> bool:
+    return bool(settings.REDIS_URL) and REDIS_AVAILABLE
+
+
+def get_redis() -> Optional["aioredis.Redis"]:
+    """REDIS_URL이 설정된 경우 공유 Redis 클라이언트 반환 (없으면 None)"""
+    global _client
+    if not redis_enabled():
+        return None
+    if _client is None:
+        _client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
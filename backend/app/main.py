@@ -2,6 +2,10 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api.api import api_router
+from app.services.deadline_scheduler import deadline_scheduler
+from app.services.exam_channel import exam_channel
+from app.services.ai_service import ai_service
+from app.services.ai_usage_writer import ai_usage_writer
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -23,6 +27,25 @@ app.add_middleware(
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+@app.on_event("startup")
+async def startup():
+    if settings.EXAM_DEADLINE_SCHEDULER_ENABLED:
+        await deadline_scheduler.start()
+    await exam_channel.start()
+    await ai_usage_writer.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await deadline_scheduler.stop()
+    await exam_channel.stop()
+    if ai_service.gemini_key_pool:
+        await ai_service.gemini_key_pool.stop_workers()
+    ai_service.provider_executor.shutdown()
+    # 프로바이더 호출이 모두 끝난 뒤 남은 사용 기록 저장
+    await ai_usage_writer.stop()
+
+
 @app.get("/")
 async def root():
     return {"message": "AI Assessment Platform API", "version": settings.VERSION}
@@ -1,8 +1,8 @@
 from app.models.user import User, AdminUser
 from app.models.exam import Exam
 from app.models.question import Question, QuestionContent
-from app.models.answer import Answer, AIUsage
+from app.models.answer import Answer, AIUsage, AIQuota, AITokenUsage, AIBlob
 
-__all__ = ["User", "AdminUser", "Exam", "Question", "QuestionContent", "Answer", "AIUsage"]
+__all__ = ["User", "AdminUser", "Exam", "Question", "QuestionContent", "Answer", "AIUsage", "AIQuota", "AITokenUsage", "AIBlob"]
 
 
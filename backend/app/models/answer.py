@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey, PrimaryKeyConstraint, Boolean, BigInteger, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -27,12 +27,62 @@ class AIUsage(Base):
     exam_id = Column(Integer, ForeignKey("kpc_exams.id"), nullable=False)
     question_id = Column(Integer, ForeignKey("kpc_questions.id"), nullable=False)
     tool_type = Column(String, nullable=False)  # 'chatgpt' or 'claude'
-    prompt = Column(Text, nullable=False)
-    response = Column(Text, nullable=False)
+    # 본문은 kpc_ai_blobs에 압축 저장하고 해시만 기록 (prompt/response는 이전 기록 호환용)
+    prompt_hash = Column(String(64), ForeignKey("kpc_ai_blobs.hash"), nullable=True)
+    response_hash = Column(String(64), ForeignKey("kpc_ai_blobs.hash"), nullable=True)
+    prompt = Column(Text, nullable=True)
+    response = Column(Text, nullable=True)
     tokens_used = Column(Integer, nullable=True)
+    input_tokens = Column(Integer, nullable=True)  # 프로바이더 usage 메타데이터 기준 (없으면 NULL)
+    output_tokens = Column(Integer, nullable=True)
+    cached = Column(Boolean, default=False, nullable=False)  # 응답 캐시에서 제공된 경우
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
     exam = relationship("Exam", back_populates="ai_usage")
 
+    __table_args__ = (
+        # 대화 기록 복원 (시험, 문항, 도구별 최근 턴)
+        Index("ix_kpc_ai_usage_conversation", "exam_id", "question_id", "tool_type", "id"),
+    )
 
+
+
+
+class AIQuota(Base):
+    """문항별 AI 사용 횟수 카운터 (한도 확인/예약을 한 번의 UPDATE로 처리)"""
+    __tablename__ = "kpc_ai_quota"
+
+    exam_id = Column(Integer, ForeignKey("kpc_exams.id"), nullable=False)
+    question_id = Column(Integer, ForeignKey("kpc_questions.id"), nullable=False)
+    used = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        PrimaryKeyConstraint("exam_id", "question_id"),
+    )
+
+
+class AITokenUsage(Base):
+    """시험/회차별 누적 토큰 사용량 (토큰 예산 확인용 카운터)"""
+    __tablename__ = "kpc_ai_token_usage"
+
+    scope = Column(String, nullable=False)  # 'exam' 또는 'cohort'
+    scope_key = Column(String, nullable=False)  # 시험 ID 또는 회차
+    used_tokens = Column(BigInteger, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        PrimaryKeyConstraint("scope", "scope_key"),
+    )
+
+
+class AIBlob(Base):
+    """AI 프롬프트/응답 본문 (SHA-256 주소 기반, 같은 본문은 한 번만 저장)"""
+    __tablename__ = "kpc_ai_blobs"
+
+    hash = Column(String(64), primary_key=True)  # UTF-8 본문의 SHA-256 (hex)
+    encoding = Column(String(8), nullable=False)  # 'zstd', 'gzip', 'raw'
+    size = Column(Integer, nullable=False)  # 압축 전 바이트 수
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
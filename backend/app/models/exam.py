@@ -20,7 +20,12 @@ class Exam(Base):
     status = Column(Enum(ExamStatus, name='kpc_exam_status', create_type=False, values_callable=lambda x: [e.value for e in x]), default=ExamStatus.NOT_STARTED, nullable=False)
     start_time = Column(DateTime(timezone=True), nullable=True)
     end_time = Column(DateTime(timezone=True), nullable=True)
-    timer_remaining = Column(Integer, default=7200)  # 120 minutes in seconds
+    timer_remaining = Column(Integer, default=7200)  # 120 minutes in seconds (legacy, 서버 계산값 사용)
+    duration_seconds = Column(Integer, nullable=True)  # 배정 시간 (없으면 EXAM_DURATION_SECONDS)
+    extension_seconds = Column(Integer, default=0, nullable=False)  # 관리자 연장 시간
+    paused_at = Column(DateTime(timezone=True), nullable=True)  # 일시정지 시작 시각
+    paused_seconds = Column(Integer, default=0, nullable=False)  # 누적 일시정지 시간
+    cohort = Column(String, nullable=True, index=True)  # 시험 회차 (회차별 토큰 예산 단위)
     score = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -30,4 +35,14 @@ class Exam(Base):
     answers = relationship("Answer", back_populates="exam", foreign_keys="[Answer.exam_id]")
     ai_usage = relationship("AIUsage", back_populates="exam", foreign_keys="[AIUsage.exam_id]")
 
+    @property
+    def remaining_seconds(self) -> int:
+        """start_time과 배정 시간으로 계산한 서버 기준 남은 시간"""
+        from app.services.exam_timer import remaining_seconds
+        return remaining_seconds(self)
+
+    @property
+    def is_paused(self) -> bool:
+        return self.paused_at is not None
+
 
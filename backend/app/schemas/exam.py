@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, AliasChoices
 from datetime import datetime
 from typing import Optional
 
@@ -21,7 +21,10 @@ class ExamResponse(BaseModel):
     status: str
     start_time: Optional[datetime]
     end_time: Optional[datetime]
-    timer_remaining: int
+    # 서버에서 start_time 기준으로 계산한 남은 시간
+    timer_remaining: int = Field(validation_alias=AliasChoices("remaining_seconds", "timer_remaining"))
+    extension_seconds: int = 0
+    is_paused: bool = False
     score: Optional[int]
     created_at: datetime
 
@@ -33,3 +36,18 @@ class ExamTimerUpdate(BaseModel):
     timer_remaining: int
 
 
+
+
+class ExamTimerSync(BaseModel):
+    """타이머 드리프트 확인 결과 (DB에 기록하지 않음)"""
+    exam_id: int
+    timer_remaining: int
+    client_timer_remaining: int
+    drift_seconds: int
+    in_sync: bool
+    is_paused: bool
+    server_time: datetime
+
+
+class ExamTimerExtend(BaseModel):
+    seconds: int = Field(gt=0)
@@ -0,0 +1,58 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class BatchCheckpoint:
+    """
+    일괄 처리 체크포인트 (JSON Lines)
+
+    완료된 항목마다 (index, 프롬프트 해시, 결과)를 한 줄씩 추가하며, 같은 파일로 다시 실행하면
+    프롬프트가 같은 완료 항목은 호출하지 않고 저장된 결과를 사용합니다.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self, prompts: List[str]) -> Dict[int, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        completed: Dict[int, Dict[str, Any]] = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 중단 시 마지막 줄이 잘렸을 수 있음
+                    logger.warning(f"[Batch] skipping malformed checkpoint line {line_number} in {self.path}")
+                    continue
+                index = record.get("index")
+                if not isinstance(index, int) or not 0 <= index < len(prompts):
+                    continue
+                if record.get("prompt_hash") != prompt_hash(prompts[index]):
+                    # 프롬프트 목록이 바뀐 항목은 다시 처리
+                    continue
+                completed[index] = record["result"]
+        return completed
+
+    def _append_sync(self, line: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+
+    async def append(self, index: int, prompt: str, result: Dict[str, Any]):
+        line = json.dumps({
+            "index": index,
+            "prompt_hash": prompt_hash(prompt),
+            "result": result,
+        }, ensure_ascii=False, default=str) + "\n"
+        await asyncio.to_thread(self._append_sync, line)
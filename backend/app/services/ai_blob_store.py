@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+# Safely import zstandard (optional dependency)
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 이미 있는 내용은 그대로 두므로 여러 워커가 같은 내용을 동시에 저장해도 안전
+_INSERT_SQL = text("""
+    INSERT INTO kpc_ai_blobs (hash, encoding, size, data)
+    VALUES (:hash, :encoding, :size, :data)
+    ON CONFLICT (hash) DO NOTHING
+""")
+
+_SELECT_SQL = text("SELECT hash, encoding, data FROM kpc_ai_blobs WHERE hash = ANY(:hashes)")
+
+
+def blob_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def decompress(encoding: str, data: bytes) -> str:
+    if encoding == "gzip":
+        return gzip.decompress(data).decode("utf-8")
+    if encoding == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstandard package not available for zstd blob")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    return bytes(data).decode("utf-8")
+
+
+class AIBlobStore:
+    """
+    AI 프롬프트/응답 본문 저장소 (kpc_ai_blobs)
+
+    본문의 SHA-256을 키로 압축하여 한 번만 저장하고, 사용 기록에는 해시만 남깁니다.
+    압축해도 작아지지 않는 짧은 본문은 그대로(raw) 저장합니다.
+    """
+
+    def __init__(self, compression: str = "auto", level: int = 6, known_hashes: int = 50000):
+        if compression == "auto":
+            compression = "zstd" if ZSTD_AVAILABLE else "gzip"
+        elif compression == "zstd" and not ZSTD_AVAILABLE:
+            logger.warning("[Blob] zstandard not installed, falling back to gzip")
+            compression = "gzip"
+        self.compression = compression
+        self.level = level
+        self.max_known = known_hashes
+        self.lock = threading.Lock()
+        # 저장이 확정된 해시 (같은 본문을 매번 INSERT하지 않기 위함)
+        self._known: "OrderedDict[str, None]" = OrderedDict()
+
+        # 통계
+        self.stored = 0
+        self.deduplicated = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def compress(self, content: str) -> Tuple[str, bytes]:
+        raw = content.encode("utf-8")
+        if self.compression == "zstd":
+            data = zstandard.ZstdCompressor(level=self.level).compress(raw)
+        elif self.compression == "gzip":
+            data = gzip.compress(raw, compresslevel=self.level, mtime=0)
+        else:
+            return "raw", raw
+        if len(data) >= len(raw):
+            return "raw", raw
+        return self.compression, data
+
+    def _is_known(self, content_hash: str) -> bool:
+        with self.lock:
+            if content_hash in self._known:
+                self._known.move_to_end(content_hash)
+                return True
+            return False
+
+    def remember(self, hashes: Iterable[str]):
+        """저장 트랜잭션이 커밋된 뒤 호출 (롤백된 해시를 저장된 것으로 취급하지 않도록)"""
+        with self.lock:
+            for content_hash in hashes:
+                self._known[content_hash] = None
+                self._known.move_to_end(content_hash)
+            while len(self._known) > self.max_known:
+                self._known.popitem(last=False)
+
+    def store_many(self, db: Session, contents: Iterable[str]) -> Tuple[Dict[str, str], List[str]]:
+        """
+        본문 저장 (호출자의 트랜잭션에 포함, 커밋은 호출자가 수행)
+
+        Returns:
+            (본문 → 해시, 이번에 INSERT한 해시 - 커밋 후 remember()에 전달)
+        """
+        hashes: Dict[str, str] = {}
+        params: List[Dict[str, Any]] = []
+        for content in contents:
+            if content in hashes:
+                self.deduplicated += 1
+                continue
+            content_hash = hashes[content] = blob_hash(content)
+            if self._is_known(content_hash):
+                self.deduplicated += 1
+                continue
+            encoding, data = self.compress(content)
+            params.append({"hash": content_hash, "encoding": encoding, "size": len(content.encode("utf-8")), "data": data})
+            self.raw_bytes += params[-1]["size"]
+            self.stored_bytes += len(data)
+        if params:
+            db.execute(_INSERT_SQL, params)
+            self.stored += len(params)
+        return hashes, [p["hash"] for p in params]
+
+    def load_many(self, db: Session, hashes: Iterable[Optional[str]]) -> Dict[str, str]:
+        """해시 → 본문 (없는 해시는 결과에서 제외)"""
+        wanted = list({h for h in hashes if h})
+        if not wanted:
+            return {}
+        return {
+            row.hash: decompress(row.encoding, row.data)
+            for row in db.execute(_SELECT_SQL, {"hashes": wanted})
+        }
+
+    def get_status(self) -> Dict[str, Any]:
+        with self.lock:
+            known = len(self._known)
+        return {
+            "compression": self.compression,
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "known_hashes": known,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "compression_ratio": round(self.stored_bytes / self.raw_bytes, 4) if self.raw_bytes else None,
+        }
+
+
+# Create singleton instance
+ai_blob_store = AIBlobStore(compression=settings.AI_BLOB_COMPRESSION)
@@ -0,0 +1,186 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.question import QuestionContent
+from app.services.ai_similarity import prompt_similarity_index
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """캐시 키용 프롬프트 정규화 (유니코드 NFC, 공백 정리)"""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", prompt)).strip()
+
+
+@dataclass
+class CachePolicy:
+    """문항별 응답 캐시 설정 (QuestionContent.ai_options["response_cache"])"""
+    enabled: bool = False
+    ttl_seconds: int = 3600
+    # 유사 프롬프트(공백/구두점/조사만 다른 경우)도 캐시 응답으로 처리
+    near_duplicate: bool = False
+    similarity_threshold: float = 0.85
+
+    @classmethod
+    def from_ai_options(cls, ai_options: Optional[Dict[str, Any]]) -> "CachePolicy":
+        options = (ai_options or {}).get("response_cache") or {}
+        if not isinstance(options, dict):
+            options = {"enabled": bool(options)}
+        return cls(
+            enabled=bool(options.get("enabled", False)),
+            ttl_seconds=int(options.get("ttl_seconds", settings.AI_CACHE_DEFAULT_TTL_SECONDS)),
+            near_duplicate=bool(options.get("near_duplicate", False)),
+            similarity_threshold=float(options.get("similarity_threshold", settings.AI_SIMILARITY_THRESHOLD)),
+        )
+
+
+@dataclass
+class _CacheEntry:
+    result: Dict[str, Any]
+    expires_at: float
+    size: int
+
+
+class AIResponseCache:
+    """
+    문항 단위 AI 응답 캐시 (완전 일치)
+
+    키: (question_id, provider, 정규화된 프롬프트)
+    프로바이더 호출 파라미터는 문항과 무관하게 같으므로 키에 포함하지 않습니다.
+    LRU + TTL로 제거하며 전체 응답 크기가 max_bytes를 넘지 않도록 유지합니다.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, policy_ttl: int = 60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy_ttl = policy_ttl
+        self.lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, _CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        # 문항별 캐시 설정 (요청마다 QuestionContent를 조회하지 않기 위함)
+        self._policies: Dict[int, Tuple[float, CachePolicy]] = {}
+
+        # 통계
+        self.hits = 0
+        self.misses = 0
+        self.near_duplicate_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_policy(self, db: Session, question_id: int) -> CachePolicy:
+        now = time.time()
+        cached = self._policies.get(question_id)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        row = db.query(QuestionContent.ai_options).filter(QuestionContent.question_id == question_id).first()
+        policy = CachePolicy.from_ai_options(row.ai_options if row else None)
+        self._policies[question_id] = (now + self.policy_ttl, policy)
+        return policy
+
+    def invalidate_question(self, question_id: int):
+        """문항 수정 시 설정과 캐시된 응답 제거"""
+        with self.lock:
+            self._policies.pop(question_id, None)
+            for key in [k for k in self._entries if k[0] == question_id]:
+                self._remove(key)
+        prompt_similarity_index.invalidate_question(question_id)
+
+    @staticmethod
+    def make_key(question_id: int, provider: str, prompt: str) -> Tuple:
+        return (question_id, provider, normalize_prompt(prompt))
+
+    @staticmethod
+    def _partition(key: Tuple) -> Tuple:
+        # 유사도 인덱스는 (문항, 프로바이더) 단위로 분리
+        return (key[0], key[1])
+
+    def get(self, key: Tuple, record: bool = True) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if record:
+                    self.misses += 1
+                return None
+            if entry.expires_at <= time.time():
+                self._remove(key)
+                self.expirations += 1
+                if record:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if record:
+                self.hits += 1
+            return dict(entry.result)
+
+    def lookup(self, key: Tuple, policy: CachePolicy) -> Optional[Dict[str, Any]]:
+        """완전 일치 조회 후, 설정된 경우 유사 프롬프트의 캐시 응답 조회"""
+        result = self.get(key)
+        if result is not None or not policy.near_duplicate:
+            return result
+
+        match = prompt_similarity_index.find(self._partition(key), key[2], policy.similarity_threshold)
+        if match is None:
+            return None
+        match_key, similarity = match
+        result = self.get(match_key, record=False)
+        if result is not None:
+            with self.lock:
+                self.near_duplicate_hits += 1
+            result["similarity"] = round(similarity, 4)
+        return result
+
+    def store(self, key: Tuple, result: Dict[str, Any], policy: CachePolicy):
+        self.put(key, result, policy.ttl_seconds)
+        if policy.near_duplicate:
+            prompt_similarity_index.add(self._partition(key), key[2], key)
+
+    def put(self, key: Tuple, result: Dict[str, Any], ttl_seconds: int):
+        size = len(result.get("response", "").encode("utf-8")) + len(key[2].encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _CacheEntry(result=dict(result), expires_at=time.time() + ttl_seconds, size=size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: Tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def get_status(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "near_duplicate_hits": self.near_duplicate_hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# Create singleton instance
+ai_response_cache = AIResponseCache(
+    max_entries=settings.AI_CACHE_MAX_ENTRIES,
+    max_bytes=settings.AI_CACHE_MAX_BYTES,
+)
@@ -0,0 +1,205 @@
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.answer import AIUsage
+from app.services.ai_blob_store import ai_blob_store
+from app.services.ai_service import ai_service
+
+SessionKey = Tuple[int, int, str]  # (exam_id, question_id, tool_type)
+
+
+@dataclass
+class _Turn:
+    prompt: str
+    response: str
+    tokens: int
+
+
+@dataclass
+class _Session:
+    turns: Deque[_Turn]
+    # 복원 시점의 사용 기록 수와 마지막 기록 id (다른 인스턴스가 기록한 턴이 있는지 확인용)
+    stored_turns: int = 0
+    last_id: int = 0
+    # 이 인스턴스에서 추가했지만 복원한 기록에는 아직 없는 턴 (지연 저장 전)
+    pending: List[_Turn] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    @property
+    def total_turns(self) -> int:
+        return self.stored_turns + len(self.pending)
+
+
+class ConversationStore:
+    """
+    (시험, 문항, 도구) 단위 서버측 대화 기록
+
+    클라이언트는 새 질문만 보내고, 이전 턴은 kpc_ai_usage에서 복원하여 메모리에 캐시합니다.
+    캐시된 세션은 마지막 기록 id만 확인하고 (인덱스 한 번 조회), 다른 인스턴스가 기록한 턴이
+    있을 때만 다시 복원합니다. 아직 저장되지 않은 로컬 턴은 복원 후에도 유지합니다.
+    프로바이더에 보내는 기록은 최근 턴부터 토큰 한도 안에서만 포함하며, 잘린 앞부분은
+    이전 질문 요약 한 줄로 대체합니다.
+    """
+
+    def __init__(self, max_sessions: int, max_turns: int, max_context_tokens: int, summary_chars: int):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.max_context_tokens = max_context_tokens
+        self.summary_chars = summary_chars
+        self.lock = threading.Lock()
+        self._sessions: "OrderedDict[SessionKey, _Session]" = OrderedDict()
+
+        # 통계
+        self.hits = 0
+        self.rebuilds = 0
+        self.evictions = 0
+        self.truncated = 0
+
+    def _usage_query(self, db: Session, key: SessionKey):
+        exam_id, question_id, tool_type = key
+        return db.query(AIUsage).filter(
+            AIUsage.exam_id == exam_id,
+            AIUsage.question_id == question_id,
+            AIUsage.tool_type == tool_type
+        )
+
+    def _rebuild(self, db: Session, key: SessionKey, pending: List[_Turn]) -> _Session:
+        """사용 기록에서 최근 max_turns개 턴 복원 (복원한 기록에 없는 pending 턴은 뒤에 이어 붙임)"""
+        total, last_id = self._usage_query(db, key).with_entities(
+            func.count(AIUsage.id), func.max(AIUsage.id)
+        ).one()
+        rows = self._usage_query(db, key).with_entities(
+            AIUsage.prompt, AIUsage.response, AIUsage.prompt_hash, AIUsage.response_hash
+        ).order_by(AIUsage.id.desc()).limit(self.max_turns).all()
+        blobs = ai_blob_store.load_many(db, (h for r in rows for h in (r.prompt_hash, r.response_hash)))
+        turns = deque(maxlen=self.max_turns)
+        for r in reversed(rows):
+            # 본문이 블롭으로 옮겨진 기록은 해시로 복원
+            prompt = r.prompt if r.prompt is not None else blobs.get(r.prompt_hash, "")
+            response = r.response if r.response is not None else blobs.get(r.response_hash, "")
+            turns.append(_Turn(prompt, response, ai_service._estimate_tokens(prompt, response)))
+        stored = {(turn.prompt, turn.response) for turn in turns}
+        pending = [turn for turn in pending if (turn.prompt, turn.response) not in stored]
+        turns.extend(pending)
+        self.rebuilds += 1
+        return _Session(turns=turns, stored_turns=total or 0, last_id=last_id or 0, pending=pending)
+
+    def _session(self, db: Session, key: SessionKey) -> _Session:
+        # 인덱스 (exam_id, question_id, tool_type, id)에서 한 번에 찾는 마지막 기록 id
+        last_id = self._usage_query(db, key).with_entities(func.max(AIUsage.id)).scalar() or 0
+        with self.lock:
+            cached = self._sessions.get(key)
+            if cached is not None and cached.last_id == last_id:
+                self._sessions.move_to_end(key)
+                self.hits += 1
+                return cached
+        pending: List[_Turn] = []
+        if cached is not None:
+            with cached.lock:
+                pending = list(cached.pending)
+        session = self._rebuild(db, key, pending)
+        with self.lock:
+            current = self._sessions.get(key)
+            if current is not None and current is not cached and current.last_id >= session.last_id:
+                # 복원하는 사이 다른 요청이 더 최신 상태로 먼저 캐시함
+                session = current
+            else:
+                self._sessions[key] = session
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                # 아직 저장되지 않은 턴이 있는 세션은 남김 (지금 복원하면 그 턴이 빠짐)
+                victim = next((k for k, cached in self._sessions.items() if not cached.pending), None)
+                if victim is None:
+                    break
+                del self._sessions[victim]
+                self.evictions += 1
+        return session
+
+    def history(self, db: Session, key: SessionKey) -> List[Dict[str, str]]:
+        """
+        프로바이더에 보낼 이전 대화 ([{"role": "user"|"assistant", "content": ...}, ...])
+
+        최근 턴부터 max_context_tokens 안에 들어가는 만큼만 포함합니다.
+        """
+        session = self._session(db, key)
+        with session.lock:
+            turns = list(session.turns)
+            omitted = session.total_turns - len(turns)
+
+        kept: List[_Turn] = []
+        budget = self.max_context_tokens
+        for turn in reversed(turns):
+            if turn.tokens > budget:
+                break
+            kept.append(turn)
+            budget -= turn.tokens
+        kept.reverse()
+        dropped = turns[:len(turns) - len(kept)]
+        omitted += len(dropped)
+
+        messages: List[Dict[str, str]] = []
+        for turn in kept:
+            messages.append({"role": "user", "content": turn.prompt})
+            messages.append({"role": "assistant", "content": turn.response})
+
+        if omitted and messages:
+            self.truncated += 1
+            # 잘린 턴은 질문 앞부분만 모아 첫 질문 앞에 붙임 (프로바이더별 역할 순서 제약 회피)
+            summary = self._summarize(omitted, dropped)
+            messages[0] = {"role": "user", "content": f"{summary}\n\n{messages[0]['content']}"}
+        return messages
+
+    def _summarize(self, omitted: int, dropped: List[_Turn]) -> str:
+        questions: List[str] = []
+        remaining = self.summary_chars
+        for turn in reversed(dropped):
+            text = " ".join(turn.prompt.split())
+            if remaining <= 0:
+                break
+            if len(text) > remaining:
+                text = text[:remaining] + "…"
+            questions.append(f"- {text}")
+            remaining -= len(text)
+        questions.reverse()
+        header = f"[이전 대화 {omitted}턴 생략]"
+        return "\n".join([header, "이전 질문:", *questions]) if questions else header
+
+    def append(self, key: SessionKey, prompt: str, response: str):
+        """사용 기록을 남긴 턴을 캐시된 세션에 추가 (세션이 없으면 다음 요청에서 복원)"""
+        with self.lock:
+            session = self._sessions.get(key)
+        if session is None:
+            return
+        turn = _Turn(prompt, response, ai_service._estimate_tokens(prompt, response))
+        with session.lock:
+            session.turns.append(turn)
+            session.pending.append(turn)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self.lock:
+            sessions = len(self._sessions)
+        return {
+            "sessions": sessions,
+            "max_sessions": self.max_sessions,
+            "max_turns": self.max_turns,
+            "max_context_tokens": self.max_context_tokens,
+            "hits": self.hits,
+            "rebuilds": self.rebuilds,
+            "evictions": self.evictions,
+            "truncated": self.truncated,
+        }
+
+
+# Create singleton instance
+conversation_store = ConversationStore(
+    max_sessions=settings.AI_CONVERSATION_MAX_SESSIONS,
+    max_turns=settings.AI_CONVERSATION_MAX_TURNS,
+    max_context_tokens=settings.AI_CONVERSATION_MAX_CONTEXT_TOKENS,
+    summary_chars=settings.AI_CONVERSATION_SUMMARY_CHARS
+)
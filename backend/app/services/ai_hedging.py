@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class LatencyWindow:
+    """프로바이더별 최근 응답 시간 (슬라이딩 윈도우 분위수)"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self.samples: deque = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """샘플이 충분하지 않으면 None"""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class HedgeBudget:
+    """
+    헤지 요청 예산
+
+    주 요청마다 ratio만큼 적립하고 헤지 요청마다 1을 차감하므로 헤지 요청 수는
+    ratio × 주 요청 수 + burst를 넘지 않습니다. ratio는 최대 1.0 (비용 2배 이내).
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = max(0.0, min(1.0, ratio))
+        self.burst = burst
+        self.credits = burst
+        self.lock = threading.Lock()
+
+    def on_request(self):
+        with self.lock:
+            self.credits = min(self.burst, self.credits + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self.lock:
+            if self.credits >= 1:
+                self.credits -= 1
+                return True
+            return False
+
+
+Factory = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class HedgingPolicy:
+    """
+    지연 기반 헤지 요청
+
+    주 프로바이더가 관측된 p95 안에 응답하지 않으면 예비 프로바이더(또는 다른 키)로
+    같은 요청을 시작하고, 먼저 끝난 응답을 사용한 뒤 나머지는 취소합니다.
+    """
+
+    def __init__(self, quantile: float = 0.95, min_delay: float = 1.0,
+                 budget_ratio: float = 0.1, budget_burst: float = 10.0):
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.budget = HedgeBudget(budget_ratio, budget_burst)
+        self.latencies: Dict[str, LatencyWindow] = {}
+
+        # 통계
+        self.total_requests = 0
+        self.total_hedged = 0
+        self.backup_wins = 0
+        self.budget_denied = 0
+
+    def _window(self, provider: str) -> LatencyWindow:
+        window = self.latencies.get(provider)
+        if window is None:
+            window = self.latencies[provider] = LatencyWindow()
+        return window
+
+    def hedge_delay(self, provider: str) -> Optional[float]:
+        """헤지 시작까지 기다릴 시간 (관측값이 부족하면 None - 헤지하지 않음)"""
+        p = self._window(provider).quantile(self.quantile)
+        return max(self.min_delay, p) if p is not None else None
+
+    def record(self, provider: str, seconds: float):
+        self._window(provider).record(seconds)
+
+    async def run(self, provider: str, primary: Factory,
+                  backups: List[Tuple[str, Factory]]) -> Dict[str, Any]:
+        """
+        Args:
+            provider: 주 프로바이더 이름 (지연 통계 키)
+            primary: 주 요청
+            backups: (프로바이더 이름, 요청) 목록 - 첫 번째 항목만 헤지에 사용
+        """
+        self.total_requests += 1
+        self.budget.on_request()
+        started = time.monotonic()
+        primary_task = asyncio.ensure_future(primary())
+        # 작업 → (프로바이더, 시작 시각)
+        tasks: Dict[asyncio.Future, Tuple[str, float]] = {primary_task: (provider, started)}
+        try:
+            delay = self.hedge_delay(provider)
+            if delay is not None and backups:
+                done, _ = await asyncio.wait(set(tasks), timeout=delay)
+                if not done:
+                    if self.budget.try_spend():
+                        backup_provider, backup = backups[0]
+                        tasks[asyncio.ensure_future(backup())] = (backup_provider, time.monotonic())
+                        self.total_hedged += 1
+                    else:
+                        self.budget_denied += 1
+
+            pending = set(tasks)
+            first_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        first_error = first_error or task.exception()
+                        continue
+                    winner, task_started = tasks[task]
+                    self.record(winner, time.monotonic() - task_started)
+                    result = dict(task.result())
+                    if len(tasks) > 1:
+                        result["hedged"] = True
+                        result["served_by"] = winner
+                        if task is not primary_task:
+                            self.backup_wins += 1
+                    return result
+            raise first_error
+        finally:
+            now = time.monotonic()
+            for task, (name, task_started) in tasks.items():
+                if not task.done():
+                    task.cancel()
+                    # 취소된 요청은 최소 이만큼 걸렸으므로 하한값으로 기록 (p95가 낮게 치우치지 않도록)
+                    self.record(name, now - task_started)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "total_requests": self.total_requests,
+            "total_hedged": self.total_hedged,
+            "hedge_rate": round(self.total_hedged / self.total_requests, 4) if self.total_requests else 0.0,
+            "backup_wins": self.backup_wins,
+            "budget_denied": self.budget_denied,
+            "budget_ratio": self.budget.ratio,
+            "budget_credits": round(self.budget.credits, 2),
+            "hedge_delay_ms": {
+                provider: round(delay * 1000, 2) if delay is not None else None
+                for provider, delay in ((p, self.hedge_delay(p)) for p in list(self.latencies))
+            },
+        }
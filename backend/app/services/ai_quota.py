@@ -0,0 +1,160 @@
+import logging
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.models.answer import AIQuota
+from app.models.exam import Exam
+
+logger = logging.getLogger(__name__)
+
+# 시험 소유권 확인 + 한도 내 슬롯 예약을 한 문장으로 처리
+# (소유자가 아니거나 한도에 도달하면 행이 반환되지 않음)
+_RESERVE_SQL = text("""
+    INSERT INTO kpc_ai_quota (exam_id, question_id, used)
+    SELECT id, :question_id, 1
+      FROM kpc_exams
+     WHERE id = :exam_id AND user_id = :user_id AND :limit > 0
+    ON CONFLICT (exam_id, question_id)
+    DO UPDATE SET used = kpc_ai_quota.used + 1, updated_at = now()
+        WHERE kpc_ai_quota.used < :limit
+    RETURNING used
+""")
+
+_REFUND_SQL = text("""
+    UPDATE kpc_ai_quota
+       SET used = used - 1, updated_at = now()
+     WHERE exam_id = :exam_id AND question_id = :question_id AND used > 0
+""")
+
+# Redis 카운터 값을 테이블에 반영 (동시 예약 순서가 바뀌어도 큰 값이 남음)
+_WRITE_THROUGH_SQL = text("""
+    INSERT INTO kpc_ai_quota (exam_id, question_id, used)
+    VALUES (:exam_id, :question_id, :used)
+    ON CONFLICT (exam_id, question_id)
+    DO UPDATE SET used = GREATEST(kpc_ai_quota.used, EXCLUDED.used), updated_at = now()
+""")
+
+# KEYS[1]: 카운터 키, ARGV[1]: 한도, ARGV[2]: TTL(초), ARGV[3]: 키가 없을 때의 초기값 (없으면 "")
+# 반환: 예약 후 사용 횟수, 한도 초과 시 -1, 초기값이 필요하면 -2
+_REDIS_RESERVE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    if ARGV[3] == '' then
+        return -2
+    end
+    redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[2], 'NX')
+end
+local used = redis.call('INCR', KEYS[1])
+if used > tonumber(ARGV[1]) then
+    redis.call('DECR', KEYS[1])
+    return -1
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return used
+"""
+
+_REDIS_REFUND_LUA = """
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+if used > 0 then
+    return redis.call('DECR', KEYS[1])
+end
+return 0
+"""
+
+
+class AIQuotaCounter:
+    """
+    문항별 AI 사용 한도 카운터
+
+    프로바이더 호출 전에 슬롯을 원자적으로 예약하고 실패 시 반환합니다.
+    기본은 kpc_ai_quota 테이블이며, AI_QUOTA_BACKEND가 redis(또는 auto + REDIS_URL)이면
+    Redis INCR(Lua)을 사용합니다. Redis 카운터도 kpc_ai_quota에 함께 기록하여, 키가 만료되거나
+    유실되면 테이블 값에서 다시 시작합니다 (사용 기록은 지연 저장되므로 기록 수로는 진행 중인
+    사용을 알 수 없음). 테이블 반영에 실패하면 슬롯을 반환하고 오류를 냅니다.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+
+    @property
+    def backend(self) -> str:
+        if settings.AI_QUOTA_BACKEND not in ("redis", "auto"):
+            return "database"
+        return "redis" if get_redis() is not None else "database"
+
+    @staticmethod
+    def _redis_key(exam_id: int, question_id: int) -> str:
+        return f"kpc:ai_quota:{exam_id}:{question_id}"
+
+    async def reserve(self, db: Session, user_id: int, exam_id: int, question_id: int) -> Optional[int]:
+        """
+        슬롯 예약
+
+        Returns:
+            예약 후 사용 횟수, 권한이 없거나 한도에 도달한 경우 None
+        """
+        if self.backend == "redis":
+            return await self._reserve_redis(db, user_id, exam_id, question_id)
+
+        try:
+            row = db.execute(_RESERVE_SQL, {
+                "exam_id": exam_id,
+                "question_id": question_id,
+                "user_id": user_id,
+                "limit": self.limit
+            }).first()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return row.used if row else None
+
+    async def refund(self, db: Session, exam_id: int, question_id: int):
+        """프로바이더 호출 실패 시 예약한 슬롯 반환"""
+        try:
+            if self.backend == "redis":
+                client = get_redis()
+                await client.eval(_REDIS_REFUND_LUA, 1, self._redis_key(exam_id, question_id))
+            db.execute(_REFUND_SQL, {"exam_id": exam_id, "question_id": question_id})
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"[Quota] refund failed exam_id={exam_id} question_id={question_id}: {e}", exc_info=True)
+
+    async def _reserve_redis(self, db: Session, user_id: int, exam_id: int, question_id: int) -> Optional[int]:
+        exam = db.query(Exam.user_id).filter(Exam.id == exam_id).first()
+        if not exam or exam.user_id != user_id:
+            return None
+
+        client = get_redis()
+        key = self._redis_key(exam_id, question_id)
+        ttl = settings.AI_QUOTA_REDIS_TTL_SECONDS
+
+        used = await client.eval(_REDIS_RESERVE_LUA, 1, key, self.limit, ttl, "")
+        if used == -2:
+            # 카운터가 없으면 kpc_ai_quota 값으로 초기화 (SET NX이므로 동시 초기화에도 안전)
+            row = db.query(AIQuota.used).filter(
+                AIQuota.exam_id == exam_id,
+                AIQuota.question_id == question_id
+            ).first()
+            used = await client.eval(_REDIS_RESERVE_LUA, 1, key, self.limit, ttl, row.used if row else 0)
+        if used <= 0:
+            return None
+
+        try:
+            db.execute(_WRITE_THROUGH_SQL, {"exam_id": exam_id, "question_id": question_id, "used": used})
+            db.commit()
+        except Exception as e:
+            # 테이블에 남지 않은 사용은 Redis 키가 유실되면 다시 셀 수 없으므로 슬롯을 반환하고 실패 처리
+            db.rollback()
+            logger.error(f"[Quota] write-through failed exam_id={exam_id} question_id={question_id}: {e}", exc_info=True)
+            await client.eval(_REDIS_REFUND_LUA, 1, key)
+            raise
+        return used
+
+
+# Create singleton instance
+ai_quota = AIQuotaCounter(settings.AI_USAGE_LIMIT_PER_QUESTION)
@@ -1,169 +1,341 @@
 import openai
-from anthropic import Anthropic
-from typing import Dict, Any, List, Optional, Callable
+from anthropic import AsyncAnthropic
+from typing import Dict, Any, List, Optional, Callable, AsyncIterator
 from app.core.config import settings
+from app.services.circuit_breaker import is_key_failure, backoff_delay
+from app.services.key_pool_state import create_key_pool_state
+from app.services.ai_hedging import HedgingPolicy
+from app.services.provider_executor import ProviderExecutor
+from app.services.ai_batch import BatchCheckpoint
+from app.services.ai_stub import StubGeminiClient, create_stub_client_factory, stub_keys
+from app.services.latency_metrics import LatencyHistogram, LatencyMetrics, classify_error
 import time
 import asyncio
 import threading
-from collections import deque
 from dataclasses import dataclass, field
 from datetime import datetime
 import uuid
+import json
+import math
+import itertools
 
 # Safely import google.generativeai
 try:
     import google.generativeai as genai
+    from google.ai import generativelanguage as glm
     GENAI_AVAILABLE = True
 except ImportError as e:
     print(f"Warning: google.generativeai not available: {e}")
     genai = None
+    glm = None
     GENAI_AVAILABLE = False
 
+GEMINI_MODEL_NAME = 'models/gemini-2.5-flash-lite'
+
+
+def create_gemini_client(key: str) -> Any:
+    """
+    키 전용 Gemini 클라이언트 생성
+
+    genai.configure()는 프로세스 전역 설정이라 동시 요청에서 다른 키로 덮어써질 수 있으므로,
+    키마다 별도의 GenerativeServiceClient(transport)를 모델에 연결합니다.
+    SDK에 모델별 키를 지정하는 공개 API가 없어 GenerativeModel._client를 사용하므로,
+    SDK 업데이트로 속성이 없어지면 조용히 전역 클라이언트를 쓰지 않고 즉시 실패합니다.
+    """
+    model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+    if not hasattr(model, "_client"):
+        raise RuntimeError(
+            "google.generativeai.GenerativeModel has no _client attribute; "
+            "per-key Gemini clients need to be updated for this SDK version"
+        )
+    model._client = glm.GenerativeServiceClient(client_options={"api_key": key})
+    return model
+
+
+# 요청 우선순위 (낮을수록 먼저 처리)
+PRIORITY_LIVE = 0    # 응시자 실시간 요청
+PRIORITY_ADMIN = 1   # 관리자 문제 생성
+PRIORITY_BATCH = 2   # 일괄 채점/생성
+
+PRIORITY_NAMES = {PRIORITY_LIVE: "live", PRIORITY_ADMIN: "admin", PRIORITY_BATCH: "batch"}
+
+
+class KeyPoolSaturatedError(Exception):
+    """요청 큐가 가득 찬 경우 (호출자는 503 + Retry-After로 응답)"""
+    
+    def __init__(self, retry_after: int):
+        super().__init__(f"Gemini request queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class KeyExcludedError(Exception):
+    """헤지 예비 요청을 주 요청과 다른 키로 보낼 수 없는 경우 (헤지는 주 요청 결과를 사용)"""
+    
+    def __init__(self):
+        super().__init__("No Gemini key other than the primary request's key is free for the hedge")
+
 
 @dataclass
 class GeminiRequest:
     """Gemini API 요청을 나타내는 클래스"""
     id: str
-    prompt: str
-    generation_config: Dict[str, Any]
+    call: Callable[[Any], Any]  # 키 전용 클라이언트를 받아 블로킹 SDK 호출을 수행
     created_at: float = field(default_factory=time.time)
     future: asyncio.Future = field(default=None)
-    priority: int = 0  # 낮을수록 높은 우선순위
+    priority: int = PRIORITY_LIVE  # 낮을수록 높은 우선순위
+    tokens: int = 0  # 예상 토큰 수 (분당 토큰 한도 예약용)
+    seq: int = 0  # 같은 우선순위 내 도착 순서 (큐에 다시 넣을 때 순서 유지)
+    used_keys: Optional[set] = None  # 배정된 키를 기록할 집합 (헤지 주 요청)
+    exclude_keys: Optional[set] = None  # 사용하지 않을 키 집합 (헤지 예비 요청 - 주 요청의 키)
+    skips: int = 0  # exclude_keys 때문에 다른 키의 워커로 넘겨진 횟수
 
 
 class GeminiKeyPool:
     """Gemini API 키 풀링, Rate Limiting 및 비동기 요청 큐 관리"""
     
-    def __init__(self, keys: List[str], rate_limit_per_minute: int = 15):
+    def __init__(self, keys: List[str], rate_limit_per_minute: int = 15,
+                 client_factory: Optional[Callable[[str], Any]] = None,
+                 tokens_per_minute: int = 0, state: Any = None,
+                 max_concurrent_per_key: int = 5, queue_max_size: Optional[int] = None,
+                 executor: Any = None):
         self.keys = keys
+        # 키별 클라이언트 생성 함수 (테스트/스텁 프로바이더 주입용)
+        self.client_factory = client_factory or create_gemini_client
         self.rate_limit = rate_limit_per_minute
-        self.current_index = 0
+        self.tokens_per_minute = tokens_per_minute
         self.lock = threading.Lock()
-        self.async_lock = None  # asyncio.Lock은 이벤트 루프 내에서 초기화
         
-        # 각 키별 요청 타임스탬프 기록 (슬라이딩 윈도우)
-        self.request_times: Dict[str, deque] = {key: deque() for key in keys}
+        # 키별 분당 요청/토큰 버킷과 서킷 브레이커 (REDIS_URL이 있으면 인스턴스 간 공유)
+        self.state = state or create_key_pool_state(keys, rate_limit_per_minute, tokens_per_minute)
         # 각 키별 클라이언트 캐시
         self.clients: Dict[str, Any] = {}
         # 각 키별 동시 요청 수 추적
         self.active_requests: Dict[str, int] = {key: 0 for key in keys}
         # 키당 최대 동시 요청 수
-        self.max_concurrent_per_key = 5
+        self.max_concurrent_per_key = max_concurrent_per_key
         
-        # 요청 큐 및 워커 관련
-        self.request_queue: asyncio.Queue = None
+        # 요청 큐 및 워커 관련 (키당 max_concurrent_per_key개의 워커가 우선순위 큐를 소비)
+        self.request_queue: asyncio.PriorityQueue = None
+        self.queue_max_size = queue_max_size if queue_max_size is not None else settings.GEMINI_QUEUE_MAX_SIZE
         self.workers_started = False
-        self.worker_count = len(keys) * 2  # 키당 2개의 워커
+        self.worker_count = len(keys) * self.max_concurrent_per_key
+        # 블로킹 SDK 호출 전용 스레드 풀 (워커 수만큼 - 기본 executor와 분리, 시뮬레이터는 가상 실행기 주입)
+        self.executor = executor or ProviderExecutor(self.worker_count, "gemini")
+        self.workers: List[asyncio.Task] = []
+        # 키별로 큐를 기다리는 워커를 하나로 제한 (_worker 참고)
+        self.dispatch_locks: Dict[str, asyncio.Lock] = {}
+        self._queue_seq = itertools.count()
         
         # 통계
         self.total_requests = 0
         self.total_completed = 0
         self.total_errors = 0
-        self.avg_response_time = 0.0
+        self.total_rejected = 0
+        # 요청 단위 지연 시간 (대기/재시도 포함) 및 키별 SDK 호출 지연 시간
+        self.latency = LatencyHistogram()
+        self.key_latency = LatencyMetrics()
+        self.queued_by_priority: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+        self.avg_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.total_throttle_wait = 0.0  # 한도 때문에 키 앞에서 대기한 누적 시간
         
         print(f"[KeyPool] Gemini Key Pool initialized with {len(keys)} key(s), {self.worker_count} workers")
     
     async def _ensure_async_initialized(self):
         """비동기 컴포넌트 초기화 확인"""
-        if self.async_lock is None:
-            self.async_lock = asyncio.Lock()
         if self.request_queue is None:
-            self.request_queue = asyncio.Queue()
+            self.request_queue = asyncio.PriorityQueue(maxsize=self.queue_max_size)
+        if not self.workers_started:
+            self.dispatch_locks = {key: asyncio.Lock() for key in self.keys}
+            self.workers = [
+                asyncio.create_task(self._worker(key))
+                for key in self.keys
+                for _ in range(self.max_concurrent_per_key)
+            ]
+            self.workers_started = True
     
-    def _clean_old_requests(self, key: str):
-        """1분이 지난 요청 기록 제거"""
-        current_time = time.time()
-        while self.request_times[key] and current_time - self.request_times[key][0] > 60:
-            self.request_times[key].popleft()
+    async def stop_workers(self):
+        """워커 종료 (애플리케이션 종료 시)"""
+        for worker in self.workers:
+            worker.cancel()
+        for worker in self.workers:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        self.workers = []
+        self.workers_started = False
     
-    def _get_best_available_key(self) -> Optional[str]:
-        """가장 여유로운 키 반환 (동시 요청 수와 Rate Limit 고려)"""
-        best_key = None
-        best_score = float('inf')
+    async def submit(self, call: Callable[[Any], Any], priority: int = PRIORITY_LIVE,
+                     tokens: int = 0, used_keys: Optional[set] = None,
+                     exclude_keys: Optional[set] = None) -> tuple:
+        """
+        요청을 우선순위 큐에 넣고 워커가 처리할 때까지 대기
         
-        for key in self.keys:
-            self._clean_old_requests(key)
-            
-            # Rate Limit 확인
-            rate_usage = len(self.request_times[key])
-            if rate_usage >= self.rate_limit:
-                continue
-            
-            # 동시 요청 수 확인
-            concurrent = self.active_requests[key]
-            if concurrent >= self.max_concurrent_per_key:
-                continue
-            
-            # 점수 계산 (낮을수록 좋음): rate 사용률 + 동시 요청 수
-            score = (rate_usage / self.rate_limit) + (concurrent / self.max_concurrent_per_key)
-            
-            if score < best_score:
-                best_score = score
-                best_key = key
-        
-        # 모든 키가 Rate Limit에 도달한 경우, 가장 여유로운 키 반환
-        if best_key is None:
-            min_score = float('inf')
-            for key in self.keys:
-                self._clean_old_requests(key)
-                concurrent = self.active_requests[key]
-                rate_usage = len(self.request_times[key])
-                score = rate_usage + concurrent
-                if score < min_score:
-                    min_score = score
-                    best_key = key
-        
-        return best_key
-    
-    def get_client(self) -> tuple:
-        """사용 가능한 키로 Gemini 클라이언트 반환 (동기 버전)"""
-        with self.lock:
-            key = self._get_best_available_key()
-            if not key:
-                raise ValueError("No available Gemini API keys")
-            
-            # 요청 시간 기록
-            self.request_times[key].append(time.time())
-            self.active_requests[key] += 1
-            self.total_requests += 1
-            
-            # 클라이언트가 캐시에 없으면 생성
-            if key not in self.clients:
-                genai.configure(api_key=key)
-                self.clients[key] = genai.GenerativeModel('models/gemini-2.5-flash-lite')
-            
-            # 해당 키로 configure 설정 (멀티키 환경에서 필요)
-            genai.configure(api_key=key)
-            
-            return self.clients[key], key
-    
-    async def get_client_async(self) -> tuple:
-        """사용 가능한 키로 Gemini 클라이언트 반환 (비동기 버전)"""
+        Args:
+            tokens: 예상 토큰 수 (분당 토큰 한도 사용 시 미리 예약, 완료 후 adjust_tokens로 보정)
+            used_keys: 요청이 배정된 키를 추가할 집합
+            exclude_keys: 사용하지 않을 키 집합 (실행 시점 기준이므로 used_keys와 같은 집합을 넘기면
+                아직 실행 중인 다른 요청의 키도 피함)
+        
+        Returns:
+            (call의 반환값, 사용한 키)
+        
+        Raises:
+            KeyPoolSaturatedError: 큐가 가득 찬 경우 즉시 발생
+            KeyExcludedError: exclude_keys 외의 키 워커가 요청을 받지 못한 경우
+        """
         await self._ensure_async_initialized()
         
-        async with self.async_lock:
-            key = self._get_best_available_key()
-            if not key:
-                # Rate limit에 걸린 경우, 잠시 대기 후 재시도
-                await asyncio.sleep(0.5)
-                key = self._get_best_available_key()
-                if not key:
-                    raise ValueError("No available Gemini API keys")
-            
-            # 요청 시간 기록
-            self.request_times[key].append(time.time())
-            self.active_requests[key] += 1
-            self.total_requests += 1
-            
-            # 클라이언트가 캐시에 없으면 생성
-            if key not in self.clients:
-                genai.configure(api_key=key)
-                self.clients[key] = genai.GenerativeModel('models/gemini-2.5-flash-lite')
-            
-            # 해당 키로 configure 설정
-            genai.configure(api_key=key)
-            
-            return self.clients[key], key
+        request = GeminiRequest(
+            id=uuid.uuid4().hex,
+            call=call,
+            priority=priority,
+            tokens=tokens,
+            used_keys=used_keys,
+            exclude_keys=exclude_keys,
+            seq=next(self._queue_seq),
+            created_at=time.time(),
+            future=asyncio.get_running_loop().create_future()
+        )
+        try:
+            self.request_queue.put_nowait((priority, request.seq, request))
+        except asyncio.QueueFull:
+            self.total_rejected += 1
+            raise KeyPoolSaturatedError(self._estimate_retry_after())
+        self.queued_by_priority[priority] = self.queued_by_priority.get(priority, 0) + 1
+        
+        return await request.future
+    
+    def _estimate_retry_after(self) -> int:
+        """큐가 비워질 때까지의 예상 시간 (초)"""
+        depth = self.request_queue.qsize() if self.request_queue else 0
+        rate_per_sec = len(self.keys) * self.rate_limit / 60
+        avg_response_time = self.latency.mean(60)
+        if avg_response_time:
+            rate_per_sec = min(rate_per_sec, self.worker_count / avg_response_time)
+        if rate_per_sec <= 0:
+            return 60
+        return max(1, min(60, math.ceil(depth / rate_per_sec)))
+    
+    async def adjust_tokens(self, key: str, estimated: int, actual: int):
+        """실제 토큰 사용량으로 예약분 보정"""
+        if self.tokens_per_minute > 0 and estimated != actual:
+            await self.state.refund(key, 0, estimated - actual)
+    
+    async def _worker(self, key: str):
+        """
+        키 전용 워커: 키에 여유가 생기는 시점까지 정확히 대기한 뒤 큐에서 요청을 꺼내 실행
+        
+        상태 저장소/클라이언트 생성 등에서 예기치 않은 오류가 나도 워커는 계속 실행합니다
+        (꺼낸 요청에는 오류를 전달 - 워커가 종료되면 요청이 영원히 대기하고 키도 더 이상 쓰이지 않음).
+        """
+        while True:
+            request: Optional[GeminiRequest] = None
+            acquired = False
+            try:
+                # 키당 한 워커만 큐를 기다림 - 버킷 슬롯이 하나뿐이라 같은 키의 워커가 모두 기다리면
+                # 몰려온 요청이 한 키에 60/RPM초 간격으로 몰리고 다른 키는 놀게 됨
+                async with self.dispatch_locks[key]:
+                    # 한도에 도달한 키의 워커는 큐를 소비하지 않음 (다른 키의 워커가 처리)
+                    wait = await self.state.time_until_available(key)
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                        continue
+                    
+                    _, _, request = await self.request_queue.get()
+                    self.queued_by_priority[request.priority] -= 1
+                    if request.future.done():
+                        # 대기 중 취소된 요청
+                        continue
+                    
+                    if request.exclude_keys and key in request.exclude_keys:
+                        # 헤지 예비 요청은 주 요청과 다른 키의 워커에 넘김 (다른 키가 모두 바쁘면 포기)
+                        request.skips += 1
+                        if request.skips > self.worker_count:
+                            request.future.set_exception(KeyExcludedError())
+                        else:
+                            self._requeue(request)
+                            # 깨어난 다른 워커가 먼저 꺼내도록 양보
+                            await asyncio.sleep(0)
+                        continue
+                    
+                    # 꺼내는 사이 다른 인스턴스가 슬롯을 가져갔으면 (Redis 공유 상태) 다음 슬롯 시점까지 대기
+                    throttle = await self.state.reserve(key, request.tokens)
+                    if throttle > 0:
+                        self.total_throttle_wait += throttle
+                        await asyncio.sleep(throttle)
+                        if request.future.done():
+                            await self.state.refund(key, 1, request.tokens)
+                            continue
+                    
+                    if not await self.state.acquire(key):
+                        # 대기 중 브레이커가 열렸거나 다른 워커가 시험 요청 중 - 다른 키가 처리하도록 반환
+                        await self.state.refund(key, 1, request.tokens)
+                        self._requeue(request)
+                        continue
+                    acquired = True
+                    if request.used_keys is not None:
+                        request.used_keys.add(key)
+                
+                wait = time.time() - request.created_at
+                with self.lock:
+                    self.active_requests[key] += 1
+                    self.total_requests += 1
+                    self.avg_queue_wait = wait if self.avg_queue_wait == 0 else 0.9 * self.avg_queue_wait + 0.1 * wait
+                    self.max_queue_wait = max(self.max_queue_wait, wait)
+                
+                started = time.monotonic()
+                try:
+                    result = await self.executor.run(request.call, self._client_for(key))
+                    self.key_latency.record(key, time.monotonic() - started)
+                    await self._record_key_result(key, None)
+                    if not request.future.done():
+                        request.future.set_result((result, key))
+                except asyncio.CancelledError:
+                    await asyncio.shield(self.state.release_probe(key))
+                    raise
+                except Exception as e:
+                    self.key_latency.record(key, time.monotonic() - started, e)
+                    await self._record_key_result(key, e)
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                finally:
+                    self.release_key(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[KeyPool] key {self.keys.index(key)} worker error: {e}")
+                if request is not None and not request.future.done():
+                    request.future.set_exception(e)
+                if acquired:
+                    try:
+                        await self.state.release_probe(key)
+                    except Exception:
+                        pass
+                if request is None:
+                    # 요청을 꺼내기 전 실패 (상태 저장소 장애 등) - 잠시 후 다시 시도
+                    await asyncio.sleep(1.0)
+    
+    def _requeue(self, request: GeminiRequest):
+        """원래 순서를 유지하여 큐에 다시 넣음 (큐가 가득 차면 포화 오류로 응답)"""
+        try:
+            self.request_queue.put_nowait((request.priority, request.seq, request))
+            self.queued_by_priority[request.priority] += 1
+        except asyncio.QueueFull:
+            if not request.future.done():
+                request.future.set_exception(KeyPoolSaturatedError(self._estimate_retry_after()))
+    
+    async def _record_key_result(self, key: str, error: Optional[Exception]):
+        """키 상태 반영 - 429/5xx만 실패로 보고, 잘못된 요청 등은 키가 정상 응답한 것으로 취급"""
+        if await self.state.record_result(key, error):
+            print(f"[KeyPool] key {self.keys.index(key)} circuit opened: {str(error)[:200]}")
+    
+    def _client_for(self, key: str) -> Any:
+        """키 전용 클라이언트 반환 (없으면 생성하여 캐시)"""
+        if key not in self.clients:
+            self.clients[key] = self.client_factory(key)
+        return self.clients[key]
     
     def release_key(self, key: str):
         """키 사용 완료 후 해제"""
@@ -171,25 +343,19 @@ class GeminiKeyPool:
             if key in self.active_requests:
                 self.active_requests[key] = max(0, self.active_requests[key] - 1)
     
-    async def release_key_async(self, key: str):
-        """키 사용 완료 후 해제 (비동기)"""
-        await self._ensure_async_initialized()
-        async with self.async_lock:
-            if key in self.active_requests:
-                self.active_requests[key] = max(0, self.active_requests[key] - 1)
-    
-    def record_completion(self, response_time: float, success: bool = True):
-        """요청 완료 기록"""
+    def record_completion(self, response_time: float, success: bool = True,
+                          error: Optional[Exception] = None):
+        """요청 완료 기록 (실패한 요청도 실패까지 걸린 시간을 기록, 오류 없는 실패는 클라이언트 취소)"""
         with self.lock:
             if success:
                 self.total_completed += 1
-                # 이동 평균으로 응답 시간 계산
-                if self.avg_response_time == 0:
-                    self.avg_response_time = response_time
-                else:
-                    self.avg_response_time = 0.9 * self.avg_response_time + 0.1 * response_time
             else:
                 self.total_errors += 1
+        if error is not None:
+            error_class = classify_error(error)
+        else:
+            error_class = None if success else "cancelled"
+        self.latency.record(response_time, error_class)
     
     def get_status(self) -> Dict[str, Any]:
         """키 풀 상태 반환"""
@@ -197,41 +363,124 @@ class GeminiKeyPool:
             status = {
                 "total_keys": len(self.keys),
                 "rate_limit_per_minute": self.rate_limit,
+                "tokens_per_minute": self.tokens_per_minute,
+                "state_backend": self.state.backend,
                 "max_concurrent_per_key": self.max_concurrent_per_key,
                 "total_requests": self.total_requests,
                 "total_completed": self.total_completed,
                 "total_errors": self.total_errors,
-                "avg_response_time_ms": round(self.avg_response_time * 1000, 2),
+                "latency": self.latency.get_status(),
+                "executor": self.executor.get_status(),
+                "queue": {
+                    "depth": self.request_queue.qsize() if self.request_queue else 0,
+                    "max_size": self.queue_max_size,
+                    "depth_by_priority": {PRIORITY_NAMES.get(p, str(p)): n for p, n in self.queued_by_priority.items()},
+                    "workers": len(self.workers),
+                    "total_rejected": self.total_rejected,
+                    "avg_wait_ms": round(self.avg_queue_wait * 1000, 2),
+                    "max_wait_ms": round(self.max_queue_wait * 1000, 2),
+                    "total_throttle_wait_ms": round(self.total_throttle_wait * 1000, 2)
+                },
                 "keys_status": []
             }
             for i, key in enumerate(self.keys):
-                self._clean_old_requests(key)
-                status["keys_status"].append({
+                key_status = {
                     "key_index": i,
                     "key_preview": f"{key[:8]}...{key[-4:]}",
-                    "requests_last_minute": len(self.request_times[key]),
-                    "available_requests": max(0, self.rate_limit - len(self.request_times[key])),
                     "active_concurrent": self.active_requests[key],
                     "available_concurrent": max(0, self.max_concurrent_per_key - self.active_requests[key])
-                })
+                }
+                key_status.update(self.state.key_status(key))
+                key_status["latency"] = self.key_latency.histogram(key).get_status()
+                client = self.clients.get(key)
+                if isinstance(client, StubGeminiClient):
+                    key_status["stub"] = client.get_status()
+                status["keys_status"].append(key_status)
             return status
 
 
+class _InFlightCall:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    동일한 (provider, prompt, config) 요청이 동시에 들어오면 프로바이더 호출 하나를 공유
+
+    대기자 중 하나가 취소되어도 공유 호출은 계속 진행되며, 모든 대기자가 취소된 경우에만
+    프로바이더 호출을 취소합니다.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[Any, _InFlightCall] = {}
+        
+        # 통계
+        self.total_calls = 0
+        self.total_coalesced = 0
+    
+    async def do(self, key: Any, factory: Callable[[], Any]) -> Dict[str, Any]:
+        call = self._calls.get(key)
+        if call is None:
+            call = _InFlightCall(asyncio.ensure_future(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _, key=key, call=call: self._forget(key, call))
+            self.total_calls += 1
+        else:
+            self.total_coalesced += 1
+        
+        call.waiters += 1
+        try:
+            result = await asyncio.shield(call.task)
+            # 호출자마다 독립된 결과 (이후 수정이 다른 호출자에게 영향을 주지 않도록)
+            return dict(result)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+    
+    def _forget(self, key: Any, call: _InFlightCall):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # 모든 대기자가 취소된 뒤 끝난 호출의 예외는 여기서 소비
+        if not call.task.cancelled():
+            call.task.exception()
+    
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._calls),
+            "total_calls": self.total_calls,
+            "total_coalesced": self.total_coalesced
+        }
+
+
 class AIService:
     def __init__(self):
-        # Initialize OpenAI client safely
+        # 프로바이더 호출 제한 시간 (초과 시 요청 취소)
+        self.request_timeout = settings.AI_REQUEST_TIMEOUT_SECONDS
+        
+        # Initialize OpenAI client safely (async client - 이벤트 루프를 블로킹하지 않음)
         self.openai_client = None
         if settings.OPENAI_API_KEY:
             try:
-                self.openai_client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+                self.openai_client = openai.AsyncOpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    timeout=self.request_timeout,
+                    max_retries=settings.AI_MAX_RETRIES
+                )
             except Exception as e:
                 print(f"Warning: Failed to initialize OpenAI client: {e}")
         
-        # Initialize Anthropic client safely
+        # Initialize Anthropic client safely (async client)
         self.anthropic_client = None
         if settings.ANTHROPIC_API_KEY:
             try:
-                self.anthropic_client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+                self.anthropic_client = AsyncAnthropic(
+                    api_key=settings.ANTHROPIC_API_KEY,
+                    timeout=self.request_timeout,
+                    max_retries=settings.AI_MAX_RETRIES
+                )
             except Exception as e:
                 print(f"Warning: Failed to initialize Anthropic client: {e}")
         
@@ -239,7 +488,17 @@ class AIService:
         self.gemini_key_pool: Optional[GeminiKeyPool] = None
         self.gemini_client = None
         
-        if GENAI_AVAILABLE and genai:
+        if settings.AI_STUB_ENABLED:
+            # 로컬 스텁 프로바이더 (네트워크/API 키 없이 키 풀과 /ai/* 엔드포인트 확인용)
+            stub_pool_keys = stub_keys(settings.AI_STUB_KEYS)
+            self.gemini_key_pool = GeminiKeyPool(
+                stub_pool_keys, settings.GEMINI_RATE_LIMIT_PER_KEY,
+                client_factory=create_stub_client_factory(),
+                tokens_per_minute=settings.GEMINI_TOKENS_PER_MINUTE_PER_KEY
+            )
+            self.gemini_client = self.gemini_key_pool._client_for(stub_pool_keys[0])
+            print(f"[OK] Gemini stub provider enabled with {len(stub_pool_keys)} key(s), latency={settings.AI_STUB_LATENCY}")
+        elif GENAI_AVAILABLE and genai:
             # 여러 키 파싱 (GEMINI_API_KEYS가 설정되어 있으면 사용, 아니면 GEMINI_API_KEY 사용)
             gemini_keys = []
             
@@ -254,17 +513,34 @@ class AIService:
             if gemini_keys:
                 try:
                     rate_limit = getattr(settings, 'GEMINI_RATE_LIMIT_PER_KEY', 15)
-                    self.gemini_key_pool = GeminiKeyPool(gemini_keys, rate_limit)
-                    # 기본 클라이언트도 설정 (호환성)
-                    genai.configure(api_key=gemini_keys[0])
-                    self.gemini_client = genai.GenerativeModel('models/gemini-2.5-flash-lite')
+                    self.gemini_key_pool = GeminiKeyPool(
+                        gemini_keys, rate_limit,
+                        tokens_per_minute=settings.GEMINI_TOKENS_PER_MINUTE_PER_KEY
+                    )
+                    # 기본 클라이언트도 설정 (호환성) - 첫 번째 키 전용 클라이언트
+                    self.gemini_client = self.gemini_key_pool._client_for(gemini_keys[0])
                     print(f"[OK] Gemini initialized with {len(gemini_keys)} API key(s)")
                 except Exception as e:
                     print(f"Warning: Failed to initialize Gemini client: {e}")
         elif settings.GEMINI_API_KEY and not GENAI_AVAILABLE:
             print(f"Warning: Gemini API key provided but google.generativeai package not available")
         
+        # 블로킹 SDK 호출 전용 스레드 풀 (키 풀이 있으면 키 수 × 키당 동시 요청 수)
+        if self.gemini_key_pool:
+            self.provider_executor = self.gemini_key_pool.executor
+        else:
+            self.provider_executor = ProviderExecutor(5, "gemini")
+        
         self.default_provider = settings.DEFAULT_AI_PROVIDER
+        self.single_flight = SingleFlight()
+        # 프로바이더별 지연 시간 히스토그램 (키별 히스토그램은 Gemini 키 풀에 있음)
+        self.provider_latency = LatencyMetrics()
+        self.hedging = HedgingPolicy(
+            quantile=settings.AI_HEDGE_QUANTILE,
+            min_delay=settings.AI_HEDGE_MIN_DELAY_SECONDS,
+            budget_ratio=settings.AI_HEDGE_BUDGET_RATIO,
+            budget_burst=settings.AI_HEDGE_BUDGET_BURST
+        )
     
     async def chat_gpt(self, prompt: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """Call OpenAI ChatGPT API"""
@@ -272,21 +548,30 @@ class AIService:
             raise ValueError("OpenAI API key not configured")
         
         try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant for an AI competency assessment."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=2000
+            # wait_for로 전체 호출 시간을 제한하고, 타임아웃/취소 시 HTTP 요청도 함께 취소됨
+            response = await asyncio.wait_for(
+                self.openai_client.chat.completions.create(
+                    model="gpt-4-turbo-preview",
+                    messages=[
+                        {"role": "system", "content": "You are a helpful assistant for an AI competency assessment."},
+                        *self._history(context),
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.7,
+                    max_tokens=2000
+                ),
+                timeout=self.request_timeout
             )
             
             return {
                 "response": response.choices[0].message.content,
                 "tokens_used": response.usage.total_tokens,
+                "input_tokens": response.usage.prompt_tokens,
+                "output_tokens": response.usage.completion_tokens,
                 "model": response.model
             }
+        except asyncio.TimeoutError:
+            raise Exception(f"OpenAI API error: request timed out after {self.request_timeout}s")
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}")
     
@@ -296,24 +581,38 @@ class AIService:
             raise ValueError("Anthropic API key not configured")
         
         try:
-            response = self.anthropic_client.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=2000,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
+            response = await asyncio.wait_for(
+                self.anthropic_client.messages.create(
+                    model="claude-3-sonnet-20240229",
+                    max_tokens=2000,
+                    messages=[
+                        *self._history(context),
+                        {"role": "user", "content": prompt}
+                    ]
+                ),
+                timeout=self.request_timeout
             )
             
             return {
                 "response": response.content[0].text,
                 "tokens_used": response.usage.input_tokens + response.usage.output_tokens,
+                "input_tokens": response.usage.input_tokens,
+                "output_tokens": response.usage.output_tokens,
                 "model": response.model
             }
+        except asyncio.TimeoutError:
+            raise Exception(f"Anthropic API error: request timed out after {self.request_timeout}s")
         except Exception as e:
             raise Exception(f"Anthropic API error: {str(e)}")
     
-    async def gemini(self, prompt: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Call Google Gemini API - 비동기 풀링 방식으로 최적화"""
+    async def gemini(self, prompt: str, context: Dict[str, Any] = None,
+                     priority: int = PRIORITY_LIVE, used_keys: Optional[set] = None,
+                     exclude_keys: Optional[set] = None) -> Dict[str, Any]:
+        """
+        Call Google Gemini API - 키 풀 우선순위 큐를 통해 처리
+        
+        used_keys/exclude_keys는 헤지용 (GeminiKeyPool.submit 참고)
+        """
         if not self.gemini_key_pool and not self.gemini_client:
             if not GENAI_AVAILABLE:
                 raise ValueError("google.generativeai package not available")
@@ -324,98 +623,174 @@ class AIService:
         last_error = None
         used_key = None
         
+        generation_config = {
+            "temperature": 0.7,
+            "max_output_tokens": 1024,
+        }
+        
+        contents = self._gemini_contents(prompt, context)
+        
+        def call(client):
+            return client.generate_content(contents, generation_config=generation_config)
+        
+        # 분당 토큰 한도 예약용 (입력 + 최대 출력의 절반으로 추정, 완료 후 실제 값으로 보정)
+        estimated_tokens = self._estimate_tokens(self._history_text(context) + prompt, "") + generation_config["max_output_tokens"] // 2
+        
         for attempt in range(max_retries):
             try:
-                # 비동기로 키 풀에서 클라이언트 가져오기
                 if self.gemini_key_pool:
-                    client, used_key = await self.gemini_key_pool.get_client_async()
+                    # 워커가 여유 있는 키를 골라 실행 (키 점유/해제는 워커가 담당)
+                    response, used_key = await self.gemini_key_pool.submit(
+                        call, priority, tokens=estimated_tokens, used_keys=used_keys, exclude_keys=exclude_keys
+                    )
                 else:
-                    client = self.gemini_client
+                    # 전용 스레드 풀에서 동기 API 실행
+                    response = await self.provider_executor.run(call, self.gemini_client)
                     used_key = "single"
                 
-                # 비동기로 API 호출 (블로킹 호출을 별도 스레드에서 실행)
-                generation_config = {
-                    "temperature": 0.7,
-                    "max_output_tokens": 1024,
-                }
-                
-                # ThreadPoolExecutor를 사용하여 동기 API를 비동기로 실행
-                loop = asyncio.get_event_loop()
-                response = await loop.run_in_executor(
-                    None,  # 기본 executor 사용
-                    lambda: client.generate_content(
-                        prompt,
-                        generation_config=generation_config
-                    )
-                )
-                
                 # 응답 텍스트 추출
                 response_text = self._extract_gemini_text_fast(response)
                 
                 if not response_text:
                     raise ValueError("No text content in response")
                 
-                # 성공 시 키 해제 및 통계 기록
+                # 성공 시 통계 기록
                 response_time = time.time() - start_time
-                if self.gemini_key_pool and used_key != "single":
-                    await self.gemini_key_pool.release_key_async(used_key)
+                input_tokens, output_tokens = self._gemini_usage(response)
+                if input_tokens is not None:
+                    tokens_used = input_tokens + output_tokens
+                else:
+                    tokens_used = self._estimate_tokens(prompt, response_text)
+                if self.gemini_key_pool:
                     self.gemini_key_pool.record_completion(response_time, success=True)
+                    await self.gemini_key_pool.adjust_tokens(used_key, estimated_tokens, tokens_used)
                 
                 return {
                     "response": response_text,
-                    "tokens_used": (len(prompt) + len(response_text)) // 4,
+                    "tokens_used": tokens_used,
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
                     "model": "gemini-2.5-flash-lite",
-                    "key_index": self.gemini_key_pool.keys.index(used_key) if self.gemini_key_pool and used_key != "single" else 0,
+                    "key_index": self.gemini_key_pool.keys.index(used_key) if self.gemini_key_pool else 0,
                     "response_time_ms": round(response_time * 1000, 2)
                 }
-                
+            
+            except (KeyPoolSaturatedError, KeyExcludedError):
+                raise
             except Exception as e:
                 last_error = e
-                error_msg = str(e).lower()
-                
-                # 키 해제
-                if self.gemini_key_pool and used_key and used_key != "single":
-                    await self.gemini_key_pool.release_key_async(used_key)
                 
-                # Rate limit 또는 quota 에러인 경우 다음 키로 재시도
-                if "quota" in error_msg or "rate" in error_msg or "limit" in error_msg or "429" in error_msg:
-                    print(f"[WARN] Gemini API rate limit hit (attempt {attempt + 1}/{max_retries}), trying next key...")
-                    await asyncio.sleep(0.2)  # 짧은 대기 후 재시도
+                # 429/5xx는 해당 키의 브레이커에 반영되며, 백오프 후 (다른 키로) 재시도
+                if is_key_failure(e) and attempt + 1 < max_retries:
+                    delay = backoff_delay(
+                        attempt,
+                        settings.GEMINI_RETRY_BACKOFF_SECONDS,
+                        settings.GEMINI_RETRY_MAX_BACKOFF_SECONDS
+                    )
+                    print(f"[WARN] Gemini API error (attempt {attempt + 1}/{max_retries}), retrying in {delay:.2f}s: {e}")
+                    await asyncio.sleep(delay)
                     continue
                 
                 # 다른 에러는 즉시 발생
                 if self.gemini_key_pool:
-                    self.gemini_key_pool.record_completion(0, success=False)
+                    self.gemini_key_pool.record_completion(time.time() - start_time, success=False, error=e)
                 raise Exception(f"Gemini API error: {str(e)}")
         
         # 모든 키가 실패한 경우
         if self.gemini_key_pool:
-            self.gemini_key_pool.record_completion(0, success=False)
+            self.gemini_key_pool.record_completion(time.time() - start_time, success=False, error=last_error)
         raise Exception(f"Gemini API error (all keys exhausted): {str(last_error)}")
     
-    async def gemini_batch(self, prompts: List[str], context: Dict[str, Any] = None) -> List[Dict[str, Any]]:
-        """여러 프롬프트를 병렬로 처리 (배치 처리)"""
+    async def gemini_batch(self, prompts: List[str], context: Dict[str, Any] = None,
+                           concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """여러 프롬프트를 처리하여 입력 순서대로 반환 (gemini_batch_stream 사용)"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(prompts)
+        async for result in self.gemini_batch_stream(prompts, context, concurrency=concurrency):
+            results[result["index"]] = result
+        return results
+    
+    def _batch_concurrency(self) -> int:
+        """기본 동시 처리 수: 모든 키를 채울 수 있는 워커 수 (그 이상은 큐만 채움)"""
+        if settings.GEMINI_BATCH_CONCURRENCY > 0:
+            return settings.GEMINI_BATCH_CONCURRENCY
+        return self.gemini_key_pool.worker_count if self.gemini_key_pool else 1
+    
+    async def _batch_item(self, index: int, prompt: str, context: Dict[str, Any],
+                          max_retries: int) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            try:
+                result = await self.gemini(prompt, context, priority=PRIORITY_BATCH)
+                return dict(result, index=index, attempts=attempt + 1)
+            except KeyPoolSaturatedError as e:
+                # 실시간 요청으로 큐가 가득 찬 경우 - 항목 실패로 보지 않고 비워질 때까지 대기
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                attempt += 1
+                if attempt > max_retries:
+                    return {
+                        "index": index,
+                        "response": f"Error: {str(e)}",
+                        "tokens_used": 0,
+                        "model": "gemini-2.5-flash-lite",
+                        "error": True,
+                        "attempts": attempt
+                    }
+                await asyncio.sleep(backoff_delay(
+                    attempt, settings.GEMINI_RETRY_BACKOFF_SECONDS, settings.GEMINI_RETRY_MAX_BACKOFF_SECONDS
+                ))
+    
+    async def gemini_batch_stream(
+        self,
+        prompts: List[str],
+        context: Dict[str, Any] = None,
+        concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        checkpoint_path: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        대량 프롬프트 일괄 처리 - 완료되는 순서대로 결과를 내보냄
+        
+        동시에 concurrency개까지만 키 풀에 제출하므로 큐가 배치 요청으로 가득 차 실시간 요청이
+        503을 받는 일이 없고, 배치 요청은 가장 낮은 우선순위로 처리됩니다.
+        결과에는 입력 순서인 "index"가 포함되며, 실패한 항목은 max_retries만큼 재시도한 뒤
+        "error": True로 반환됩니다. checkpoint_path를 주면 완료 항목을 기록하고,
+        다시 실행할 때 이미 완료된 항목은 호출하지 않습니다 ("checkpointed": True).
+        """
         if not prompts:
-            return []
-        
-        # 모든 프롬프트를 동시에 처리
-        tasks = [self.gemini(prompt, context) for prompt in prompts]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # 결과 처리
-        processed_results = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                processed_results.append({
-                    "response": f"Error: {str(result)}",
-                    "tokens_used": 0,
-                    "model": "gemini-2.5-flash-lite",
-                    "error": True
-                })
-            else:
-                processed_results.append(result)
+            return
+        max_retries = settings.GEMINI_BATCH_MAX_RETRIES if max_retries is None else max_retries
+        limit = max(1, concurrency or self._batch_concurrency())
         
-        return processed_results
+        checkpoint = BatchCheckpoint(checkpoint_path) if checkpoint_path else None
+        completed = checkpoint.load(prompts) if checkpoint else {}
+        for index in sorted(completed):
+            yield dict(completed[index], index=index, checkpointed=True)
+        
+        remaining = (i for i in range(len(prompts)) if i not in completed)
+        running = set()
+        try:
+            while True:
+                while len(running) < limit:
+                    index = next(remaining, None)
+                    if index is None:
+                        break
+                    running.add(asyncio.ensure_future(
+                        self._batch_item(index, prompts[index], context, max_retries)
+                    ))
+                if not running:
+                    break
+                
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if checkpoint and not result.get("error"):
+                        await checkpoint.append(result["index"], prompts[result["index"]], result)
+                    yield result
+        finally:
+            # 소비자가 중단하면 진행 중인 항목도 취소
+            for task in running:
+                task.cancel()
     
     def _extract_gemini_text_fast(self, response) -> str:
         """Fast text extraction from Gemini response"""
@@ -450,15 +825,326 @@ class AIService:
     async def generate(self, prompt: str, provider: str = None, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Generate response using the specified AI provider or the default one
+        
+        동시에 들어온 동일한 요청은 프로바이더 호출 하나를 공유합니다 (single-flight).
+        """
+        provider = provider or self.default_provider
+        # 주 요청이 배정된 Gemini 키 (같은 프로바이더로 헤지할 때 예비 요청은 이 키를 제외)
+        hedge_keys: set = set()
+        factory = self._provider_call(provider, prompt, context, {"used_keys": hedge_keys})
+        
+        if settings.AI_HEDGE_ENABLED:
+            backups = self._hedge_backups(provider, prompt, context, hedge_keys)
+            if backups:
+                primary = factory
+                factory = lambda: self.hedging.run(provider, primary, backups)
+        
+        if not settings.AI_SINGLE_FLIGHT_ENABLED:
+            return await factory()
+        
+        key = (provider, prompt, json.dumps(context or {}, sort_keys=True, default=str))
+        return await self.single_flight.do(key, factory)
+    
+    def _provider_call(self, provider: str, prompt: str, context: Dict[str, Any] = None,
+                       key_options: Dict[str, Any] = None) -> Callable[[], Any]:
+        """key_options: Gemini 키 풀 옵션 (used_keys/exclude_keys)"""
+        if provider == "openai":
+            return self._timed(provider, lambda: self.chat_gpt(prompt, context))
+        elif provider == "anthropic":
+            return self._timed(provider, lambda: self.claude(prompt, context))
+        elif provider == "gemini":
+            return self._timed(provider, lambda: self.gemini(prompt, context, **(key_options or {})))
+        raise ValueError(f"Unknown AI provider: {provider}")
+    
+    def _timed(self, provider: str, call: Callable[[], Any]) -> Callable[[], Any]:
+        """프로바이더별 지연 시간/오류 기록 (헤지로 취소된 요청은 제외)"""
+        async def run():
+            started = time.monotonic()
+            try:
+                result = await call()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.provider_latency.record(provider, time.monotonic() - started, e)
+                raise
+            self.provider_latency.record(provider, time.monotonic() - started)
+            return result
+        return run
+    
+    async def _timed_stream(self, provider: str, stream: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """스트림 시작부터 done 이벤트까지의 시간 기록 (클라이언트 연결 종료는 제외)"""
+        started = time.monotonic()
+        try:
+            async for event in stream:
+                if event["type"] == "done":
+                    self.provider_latency.record(provider, time.monotonic() - started)
+                yield event
+        except Exception as e:
+            self.provider_latency.record(provider, time.monotonic() - started, e)
+            raise
+        finally:
+            await stream.aclose()
+    
+    def _is_configured(self, provider: str) -> bool:
+        return {
+            "openai": self.openai_client is not None,
+            "anthropic": self.anthropic_client is not None,
+            "gemini": self.gemini_key_pool is not None or self.gemini_client is not None,
+        }.get(provider, False)
+    
+    def _hedge_backups(self, provider: str, prompt: str, context: Dict[str, Any] = None,
+                       primary_keys: Optional[set] = None) -> list:
+        """헤지에 사용할 예비 요청 목록 (같은 프로바이더의 다른 키 우선 - primary_keys의 키는 사용하지 않음)"""
+        backups = []
+        pool = self.gemini_key_pool
+        if provider == "gemini" and pool and len(pool.keys) > 1:
+            # 대기 큐가 쌓여 있으면 여유 키가 없으므로 헤지하지 않음
+            if pool.request_queue is None or pool.request_queue.qsize() == 0:
+                backups.append(("gemini", self._provider_call(
+                    "gemini", prompt, context, {"exclude_keys": primary_keys}
+                )))
+        for backup in (p.strip() for p in settings.AI_HEDGE_BACKUP_PROVIDERS.split(",")):
+            if backup and backup != provider and self._is_configured(backup):
+                backups.append((backup, self._provider_call(backup, prompt, context)))
+        return backups
+    
+    # ------------------------------------------------------------------
+    # Streaming
+    #
+    # 스트리밍 메서드는 {"type": "token", "text": ...} 이벤트를 순서대로 내보내고,
+    # 마지막에 전체 응답과 토큰 수가 담긴 {"type": "done", ...} 이벤트를 내보냅니다.
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _history(context: Optional[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """context["history"]의 이전 대화 ([{"role": "user"|"assistant", "content": ...}])"""
+        history = (context or {}).get("history") or []
+        return [
+            {"role": m["role"], "content": m["content"]}
+            for m in history
+            if isinstance(m, dict) and m.get("role") in ("user", "assistant") and isinstance(m.get("content"), str)
+        ]
+    
+    def _history_text(self, context: Optional[Dict[str, Any]]) -> str:
+        return "".join(m["content"] for m in self._history(context))
+    
+    def _gemini_contents(self, prompt: str, context: Optional[Dict[str, Any]]):
+        """이전 대화가 있으면 Gemini contents 목록, 없으면 프롬프트 문자열 그대로"""
+        history = self._history(context)
+        if not history:
+            return prompt
+        contents = [
+            {"role": "model" if m["role"] == "assistant" else "user", "parts": [m["content"]]}
+            for m in history
+        ]
+        contents.append({"role": "user", "parts": [prompt]})
+        return contents
+    
+    @staticmethod
+    def _estimate_tokens(prompt: str, response_text: str) -> int:
         """
+        usage 메타데이터가 없을 때의 대략적인 토큰 수
+
+        영문은 약 4자당 1토큰이지만 한글은 음절당 1토큰 안팎이므로 ASCII와 나머지를 따로 셉니다.
+        """
+        text = prompt + response_text
+        ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+        return ascii_chars // 4 + (len(text) - ascii_chars)
+    
+    @staticmethod
+    def _gemini_usage(response) -> tuple:
+        """Gemini 응답의 usage_metadata에서 (입력, 출력) 토큰 수 (없으면 (None, None))"""
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None) if usage else None
+        if not prompt_tokens:
+            return None, None
+        return prompt_tokens, getattr(usage, "candidates_token_count", 0) or 0
+    
+    @staticmethod
+    async def _close_stream(stream):
+        """SDK 스트림의 HTTP 응답을 닫아 프로바이더 생성을 중단"""
+        response = getattr(stream, "response", None)
+        if response is not None:
+            await response.aclose()
+    
+    def _done_event(self, prompt: str, parts: List[str], model: str,
+                    input_tokens: Optional[int], output_tokens: Optional[int]) -> Dict[str, Any]:
+        response_text = "".join(parts)
+        if input_tokens is not None and output_tokens is not None:
+            tokens_used = input_tokens + output_tokens
+        else:
+            tokens_used = self._estimate_tokens(prompt, response_text)
+        return {
+            "type": "done",
+            "response": response_text,
+            "tokens_used": tokens_used,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "model": model
+        }
+    
+    async def chat_gpt_stream(self, prompt: str, context: Dict[str, Any] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream OpenAI ChatGPT API"""
+        if not self.openai_client:
+            raise ValueError("OpenAI API key not configured")
+        
+        stream = await self.openai_client.chat.completions.create(
+            model="gpt-4-turbo-preview",
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant for an AI competency assessment."},
+                *self._history(context),
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=2000,
+            stream=True,
+            # 마지막 청크에 실제 토큰 사용량 포함
+            extra_body={"stream_options": {"include_usage": True}}
+        )
+        
+        parts: List[str] = []
+        model = "gpt-4-turbo-preview"
+        input_tokens = output_tokens = None
+        try:
+            async for chunk in stream:
+                model = getattr(chunk, "model", None) or model
+                usage = getattr(chunk, "usage", None)
+                if usage:
+                    input_tokens = usage.prompt_tokens
+                    output_tokens = usage.completion_tokens
+                if chunk.choices and chunk.choices[0].delta.content:
+                    text = chunk.choices[0].delta.content
+                    parts.append(text)
+                    yield {"type": "token", "text": text}
+        finally:
+            await self._close_stream(stream)
+        
+        yield self._done_event(prompt, parts, model, input_tokens, output_tokens)
+    
+    async def claude_stream(self, prompt: str, context: Dict[str, Any] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream Anthropic Claude API"""
+        if not self.anthropic_client:
+            raise ValueError("Anthropic API key not configured")
+        
+        stream = await self.anthropic_client.messages.create(
+            model="claude-3-sonnet-20240229",
+            max_tokens=2000,
+            messages=[
+                *self._history(context),
+                {"role": "user", "content": prompt}
+            ],
+            stream=True
+        )
+        
+        parts: List[str] = []
+        model = "claude-3-sonnet-20240229"
+        input_tokens = output_tokens = None
+        try:
+            async for event in stream:
+                if event.type == "message_start":
+                    model = event.message.model
+                    input_tokens = event.message.usage.input_tokens
+                elif event.type == "content_block_delta":
+                    text = getattr(event.delta, "text", "")
+                    if text:
+                        parts.append(text)
+                        yield {"type": "token", "text": text}
+                elif event.type == "message_delta":
+                    output_tokens = event.usage.output_tokens
+        finally:
+            await self._close_stream(stream)
+        
+        yield self._done_event(prompt, parts, model, input_tokens, output_tokens)
+    
+    async def gemini_stream(self, prompt: str, context: Dict[str, Any] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream Google Gemini API (동기 스트림을 별도 스레드에서 읽어 전달)"""
+        if not self.gemini_key_pool and not self.gemini_client:
+            if not GENAI_AVAILABLE:
+                raise ValueError("google.generativeai package not available")
+            raise ValueError("Gemini API key not configured")
+        
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        start_time = time.time()
+        contents = self._gemini_contents(prompt, context)
+        
+        def produce(client):
+            # 프로바이더 오류는 그대로 발생시켜 키 풀 워커가 키 브레이커에 반영한 뒤 on_provider_done으로 전달
+            response = client.generate_content(
+                contents,
+                generation_config={"temperature": 0.7, "max_output_tokens": 1024},
+                stream=True
+            )
+            for chunk in response:
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, ("chunk", chunk))
+            loop.call_soon_threadsafe(queue.put_nowait, ("end", None))
+        
+        if self.gemini_key_pool:
+            # 스트림을 읽는 동안 워커가 키를 점유
+            estimated_tokens = self._estimate_tokens(self._history_text(context) + prompt, "") + 512
+            provider_task = asyncio.ensure_future(
+                self.gemini_key_pool.submit(produce, PRIORITY_LIVE, tokens=estimated_tokens)
+            )
+        else:
+            provider_task = asyncio.ensure_future(self.provider_executor.run(produce, self.gemini_client))
+        
+        def on_provider_done(task):
+            # 큐 포화 등 제출 단계 오류와 프로바이더 오류 (이미 보낸 청크 뒤에 전달됨)
+            if not task.cancelled() and task.exception() is not None:
+                queue.put_nowait(("error", task.exception()))
+        
+        provider_task.add_done_callback(on_provider_done)
+        
+        parts: List[str] = []
+        input_tokens = output_tokens = None
+        success = False
+        stream_error = None
+        try:
+            while True:
+                kind, item = await queue.get()
+                if kind == "error":
+                    stream_error = item
+                    if isinstance(item, KeyPoolSaturatedError):
+                        raise item
+                    raise Exception(f"Gemini API error: {str(item)}")
+                if kind == "end":
+                    break
+                usage = getattr(item, "usage_metadata", None)
+                if usage and getattr(usage, "prompt_token_count", None):
+                    input_tokens = usage.prompt_token_count
+                    output_tokens = usage.candidates_token_count
+                text = self._extract_gemini_text_fast(item)
+                if text:
+                    parts.append(text)
+                    yield {"type": "token", "text": text}
+            success = True
+        finally:
+            # 클라이언트 연결 종료 시 생산 스레드도 중단 (큐에서 대기 중이면 요청 취소)
+            stop.set()
+            if not provider_task.done():
+                provider_task.cancel()
+            if self.gemini_key_pool:
+                self.gemini_key_pool.record_completion(time.time() - start_time, success=success, error=stream_error)
+                if provider_task.done() and not provider_task.cancelled() and provider_task.exception() is None:
+                    _, used_key = provider_task.result()
+                    actual = (input_tokens or 0) + (output_tokens or 0) or self._estimate_tokens(prompt, "".join(parts))
+                    await self.gemini_key_pool.adjust_tokens(used_key, estimated_tokens, actual)
+        
+        yield self._done_event(prompt, parts, "gemini-2.5-flash-lite", input_tokens, output_tokens)
+    
+    def generate_stream(self, prompt: str, provider: str = None, context: Dict[str, Any] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream response using the specified AI provider or the default one"""
         provider = provider or self.default_provider
         
         if provider == "openai":
-            return await self.chat_gpt(prompt, context)
+            return self._timed_stream(provider, self.chat_gpt_stream(prompt, context))
         elif provider == "anthropic":
-            return await self.claude(prompt, context)
+            return self._timed_stream(provider, self.claude_stream(prompt, context))
         elif provider == "gemini":
-            return await self.gemini(prompt, context)
+            return self._timed_stream(provider, self.gemini_stream(prompt, context))
         else:
             raise ValueError(f"Unknown AI provider: {provider}")
     
@@ -622,31 +1308,22 @@ Be precise and cite specific concerns."""
 문제를 생성해주세요:"""
 
         try:
-            # 비동기로 키 풀에서 클라이언트 가져오기
-            used_key = None
+            generation_config = {
+                "temperature": 0.7,
+                "top_p": 0.8,
+                "top_k": 40,
+                "max_output_tokens": 4000,
+            }
             if self.gemini_key_pool:
-                client, used_key = await self.gemini_key_pool.get_client_async()
+                # 관리자 문제 생성은 응시자 실시간 요청보다 낮은 우선순위로 대기
+                response, _ = await self.gemini_key_pool.submit(
+                    lambda client: client.generate_content(prompt, generation_config=generation_config),
+                    PRIORITY_ADMIN
+                )
             else:
-                client = self.gemini_client
-            
-            # ThreadPoolExecutor를 사용하여 동기 API를 비동기로 실행
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: client.generate_content(
-                    prompt,
-                    generation_config={
-                        "temperature": 0.7,
-                        "top_p": 0.8,
-                        "top_k": 40,
-                        "max_output_tokens": 4000,
-                    }
+                response = await self.provider_executor.run(
+                    lambda: self.gemini_client.generate_content(prompt, generation_config=generation_config)
                 )
-            )
-            
-            # 키 해제
-            if self.gemini_key_pool and used_key:
-                await self.gemini_key_pool.release_key_async(used_key)
             
             # Parse JSON response
             import json
@@ -702,18 +1379,23 @@ Be precise and cite specific concerns."""
                     {"text": "선택지 4"}
                 ]
             
-            estimated_tokens = (len(prompt) + len(response.text)) // 4
+            input_tokens, output_tokens = self._gemini_usage(response)
+            if input_tokens is not None:
+                tokens_used = input_tokens + output_tokens
+            else:
+                tokens_used = self._estimate_tokens(prompt, response.text)
             
             return {
                 "question_data": question_data,
-                "tokens_used": estimated_tokens,
+                "tokens_used": tokens_used,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
                 "model": "gemini-2.5-flash-lite"
             }
             
+        except KeyPoolSaturatedError:
+            raise
         except Exception as e:
-            # 키 해제
-            if self.gemini_key_pool and used_key:
-                await self.gemini_key_pool.release_key_async(used_key)
             raise Exception(f"Failed to generate question: {str(e)}")
 
 
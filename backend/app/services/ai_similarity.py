@@ -0,0 +1,220 @@
+import hashlib
+import random
+import re
+import threading
+import unicodedata
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from app.core.config import settings
+
+# 자주 쓰이는 조사/어미 (토큰 끝에서 제거하여 "요약해줘"/"요약해 줘", "문제점을"/"문제점" 등을 같게 취급)
+_PARTICLES = sorted([
+    "으로", "에서", "에게", "한테", "까지", "부터", "처럼", "보다", "이랑",
+    "은", "는", "이", "가", "을", "를", "에", "의", "도", "로", "와", "과", "랑", "요",
+], key=len, reverse=True)
+
+_NON_WORD_RE = re.compile(r"[^\w\s]", re.UNICODE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _strip_particle(token: str) -> str:
+    for particle in _PARTICLES:
+        if len(token) > len(particle) + 1 and token.endswith(particle):
+            return token[:-len(particle)]
+    return token
+
+
+def shingles(prompt: str, n: int = 3) -> FrozenSet[str]:
+    """공백/구두점/조사를 제거한 문자 n-gram 집합"""
+    text = unicodedata.normalize("NFC", prompt).lower()
+    text = _NON_WORD_RE.sub(" ", text)
+    tokens = [_strip_particle(t) for t in _WHITESPACE_RE.split(text) if t]
+    joined = "".join(tokens)
+    if len(joined) <= n:
+        return frozenset([joined]) if joined else frozenset()
+    return frozenset(joined[i:i + n] for i in range(len(joined) - n + 1))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class _IndexEntry:
+    shingles: FrozenSet[str]
+    signature: Tuple[int, ...]
+    cache_key: Tuple
+    prompt: str
+
+
+class _Partition:
+    """(문항, 프로바이더, 설정) 단위 LSH 인덱스"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[int, _IndexEntry]" = OrderedDict()
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], set] = {}
+        self.next_id = 0
+
+
+class PromptSimilarityIndex:
+    """
+    문자 n-gram MinHash + LSH 기반 유사 프롬프트 인덱스
+
+    LSH로 후보를 찾은 뒤 실제 Jaccard 유사도로 검증하며, 임계값 이상이면
+    해당 프롬프트의 응답 캐시 키를 반환합니다.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, max_entries_per_partition: int = 500,
+                 sample_rate: float = 0.05, sample_size: int = 200, seed: int = 1):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries_per_partition
+        self.sample_rate = sample_rate
+        self.lock = threading.Lock()
+        self._partitions: Dict[Tuple, _Partition] = {}
+
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+        self._rng = random.Random()
+
+        # 통계 (임계값 튜닝용)
+        self.lookups = 0
+        self.hits = 0
+        self.candidates_checked = 0
+        # 최적 후보 유사도 분포 (0.1 단위 구간) - 적중/미적중 모두 기록
+        self.similarity_histogram = [0] * 10
+        # 적중 샘플 (유사도 분포/반복 적중 검토용, 프롬프트는 해시와 길이만)
+        self.hit_samples: deque = deque(maxlen=sample_size)
+
+    def _signature(self, items: FrozenSet[str]) -> Tuple[int, ...]:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+            for s in items
+        ]
+        if not hashes:
+            return tuple([_MAX_HASH] * self.num_perm)
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._perms
+        )
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        return [(i, signature[i * self.rows:(i + 1) * self.rows]) for i in range(self.bands)]
+
+    def add(self, partition_key: Tuple, prompt: str, cache_key: Tuple):
+        items = shingles(prompt)
+        if not items:
+            return
+        signature = self._signature(items)
+        with self.lock:
+            partition = self._partitions.get(partition_key)
+            if partition is None:
+                partition = self._partitions[partition_key] = _Partition(self.max_entries)
+            entry_id = partition.next_id
+            partition.next_id += 1
+            partition.entries[entry_id] = _IndexEntry(items, signature, cache_key, prompt)
+            for band in self._band_keys(signature):
+                partition.buckets.setdefault(band, set()).add(entry_id)
+            while len(partition.entries) > partition.max_entries:
+                self._remove(partition, next(iter(partition.entries)))
+
+    def _remove(self, partition: _Partition, entry_id: int):
+        entry = partition.entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for band in self._band_keys(entry.signature):
+            ids = partition.buckets.get(band)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del partition.buckets[band]
+
+    def find(self, partition_key: Tuple, prompt: str, threshold: float) -> Optional[Tuple[Tuple, float]]:
+        """임계값 이상으로 가장 유사한 기존 프롬프트의 (캐시 키, 유사도)"""
+        items = shingles(prompt)
+        if not items:
+            return None
+        signature = self._signature(items)
+        with self.lock:
+            self.lookups += 1
+            partition = self._partitions.get(partition_key)
+            if partition is None:
+                return None
+
+            candidates = set()
+            for band in self._band_keys(signature):
+                candidates |= partition.buckets.get(band, set())
+
+            best: Optional[_IndexEntry] = None
+            best_score = 0.0
+            for entry_id in candidates:
+                entry = partition.entries[entry_id]
+                score = jaccard(items, entry.shingles)
+                self.candidates_checked += 1
+                if score > best_score:
+                    best, best_score = entry, score
+
+            if best is not None:
+                self.similarity_histogram[min(9, int(best_score * 10))] += 1
+            if best is None or best_score < threshold:
+                return None
+
+            self.hits += 1
+            if self._rng.random() < self.sample_rate:
+                # 응시자 프롬프트 원문은 남기지 않음 (해시/길이로 같은 프롬프트끼리만 구분)
+                self.hit_samples.append({
+                    "question_id": partition_key[0],
+                    "prompt_hash": self._sample_hash(prompt),
+                    "prompt_length": len(prompt),
+                    "matched_prompt_hash": self._sample_hash(best.prompt),
+                    "matched_prompt_length": len(best.prompt),
+                    "similarity": round(best_score, 4),
+                    "threshold": threshold,
+                })
+            return best.cache_key, best_score
+
+    @staticmethod
+    def _sample_hash(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+    def invalidate_question(self, question_id: int):
+        with self.lock:
+            for key in [k for k in self._partitions if k[0] == question_id]:
+                del self._partitions[key]
+
+    def get_status(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "partitions": len(self._partitions),
+                "entries": sum(len(p.entries) for p in self._partitions.values()),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "avg_candidates_per_lookup": round(self.candidates_checked / self.lookups, 2) if self.lookups else 0.0,
+                "best_similarity_histogram": {
+                    f"{i / 10:.1f}-{(i + 1) / 10:.1f}": count
+                    for i, count in enumerate(self.similarity_histogram)
+                },
+                "hit_samples": list(self.hit_samples),
+            }
+
+
+# Create singleton instance
+prompt_similarity_index = PromptSimilarityIndex(
+    max_entries_per_partition=settings.AI_SIMILARITY_MAX_PER_QUESTION,
+    sample_rate=settings.AI_SIMILARITY_SAMPLE_RATE,
+)
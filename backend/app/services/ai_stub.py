@@ -0,0 +1,183 @@
+import math
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+
+
+class ResourceExhausted(Exception):
+    """
+    스텁 429 응답
+
+    google.api_core.exceptions.ResourceExhausted와 클래스 이름/코드가 같아 키 브레이커와
+    오류 분류에서 실제 429와 동일하게 처리됩니다.
+    """
+    code = 429
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    지연 시간 분포 (초)
+
+    - "fixed:0.8"
+    - "uniform:0.2,1.5"
+    - "lognormal:0.8,0.5" (중앙값, sigma)
+    - "exponential:0.8" (평균)
+    """
+    name, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()]
+    name = name.strip().lower()
+    if name == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if name == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if name == "lognormal" and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    if name == "exponential" and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def parse_key_rates(spec: str) -> Dict[int, float]:
+    """"0:0.3,2:0.05" → {키 번호: 429 비율}"""
+    rates: Dict[int, float] = {}
+    for item in spec.split(","):
+        if ":" in item:
+            index, rate = item.split(":", 1)
+            rates[int(index)] = float(rate)
+    return rates
+
+
+@dataclass
+class StubUsage:
+    prompt_token_count: int
+    candidates_token_count: int
+
+
+class StubResponse:
+    """generate_content 응답 (text / usage_metadata만 제공)"""
+
+    def __init__(self, text: str, usage: Optional[StubUsage] = None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class StubGeminiClient:
+    """
+    네트워크 없이 동작하는 Gemini 클라이언트 대역
+
+    GenerativeModel.generate_content와 같은 형태로 호출되며, 지연 시간은 설정된 분포에서
+    뽑아 실제로 대기(블로킹)하므로 키 풀 워커/전용 스레드 풀 동작을 그대로 확인할 수 있습니다.
+    429는 키별 비율로 무작위 주입하거나, rpm_limit를 넘는 요청에 대해 발생시킵니다.
+    """
+
+    def __init__(self, key: str, latency: Callable[[random.Random], float], error_rate: float = 0.0,
+                 rpm_limit: int = 0, stream_chunks: int = 8, seed: Optional[int] = None):
+        self.key = key
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rpm_limit = rpm_limit
+        self.stream_chunks = max(1, stream_chunks)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self._recent: Deque[float] = deque()
+
+        # 통계
+        self.calls = 0
+        self.injected_429 = 0
+        self.over_limit_429 = 0
+
+    def _admit(self):
+        with self.lock:
+            self.calls += 1
+            now = time.monotonic()
+            if self.rpm_limit > 0:
+                while self._recent and self._recent[0] <= now - 60:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rpm_limit:
+                    self.over_limit_429 += 1
+                    retry_after = self._recent[0] + 60 - now
+                    raise ResourceExhausted(
+                        f"429 Resource has been exhausted (stub rpm limit {self.rpm_limit}). "
+                        f"Please retry in {retry_after:.1f}s",
+                        retry_after=retry_after
+                    )
+                self._recent.append(now)
+            if self.error_rate > 0 and self.rng.random() < self.error_rate:
+                self.injected_429 += 1
+                raise ResourceExhausted("429 Resource has been exhausted (stub injected)")
+            return self.latency(self.rng)
+
+    @staticmethod
+    def _prompt_text(contents: Any) -> str:
+        if isinstance(contents, str):
+            return contents
+        parts: List[str] = []
+        for content in contents or []:
+            parts.extend(str(p) for p in content.get("parts", []))
+        return "".join(parts)
+
+    def _answer(self, prompt: str) -> List[str]:
+        words = [f"stub-{self.key[-4:]}", "response", "for", f"{len(prompt)}", "chars:"]
+        words.extend(prompt.split()[:20])
+        words.extend(["(end)"])
+        size = max(1, len(words) // self.stream_chunks)
+        return [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+
+    def generate_content(self, contents: Any, generation_config: Optional[Dict[str, Any]] = None,
+                         stream: bool = False):
+        delay = self._admit()
+        prompt = self._prompt_text(contents)
+        chunks = self._answer(prompt)
+        usage = StubUsage(max(1, len(prompt) // 4), sum(len(c) for c in chunks) // 4)
+        if stream:
+            return self._stream(delay, chunks, usage)
+        time.sleep(delay)
+        return StubResponse("".join(chunks), usage)
+
+    def _stream(self, delay: float, chunks: List[str], usage: StubUsage) -> Iterator[StubResponse]:
+        # 전체 지연 시간을 청크에 나눠 전달 (마지막 청크에 usage 포함)
+        per_chunk = delay / len(chunks)
+        for i, chunk in enumerate(chunks):
+            time.sleep(per_chunk)
+            yield StubResponse(chunk, usage if i == len(chunks) - 1 else None)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "injected_429": self.injected_429,
+            "over_limit_429": self.over_limit_429,
+        }
+
+
+def stub_keys(count: int) -> List[str]:
+    return [f"stub-key-{i:04d}" for i in range(count)]
+
+
+def create_stub_client_factory() -> Callable[[str], StubGeminiClient]:
+    """설정(AI_STUB_*)으로 키별 스텁 클라이언트를 만드는 함수 (GeminiKeyPool의 client_factory)"""
+    latency = parse_latency(settings.AI_STUB_LATENCY)
+    key_rates = parse_key_rates(settings.AI_STUB_429_RATE_BY_KEY)
+    keys = stub_keys(settings.AI_STUB_KEYS)
+
+    def factory(key: str) -> StubGeminiClient:
+        index = keys.index(key) if key in keys else -1
+        return StubGeminiClient(
+            key,
+            latency,
+            error_rate=key_rates.get(index, settings.AI_STUB_429_RATE),
+            rpm_limit=settings.AI_STUB_RPM_PER_KEY,
+            stream_chunks=settings.AI_STUB_STREAM_CHUNKS,
+            seed=index if index >= 0 else None
+        )
+
+    return factory
@@ -0,0 +1,72 @@
+import logging
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 시험 및 해당 시험 회차의 누적 사용량을 한 번에 조회
+_USAGE_SQL = text("""
+    SELECT u.scope, u.used_tokens
+      FROM kpc_exams e
+      JOIN kpc_ai_token_usage u
+        ON (u.scope = 'exam' AND u.scope_key = CAST(e.id AS VARCHAR))
+        OR (u.scope = 'cohort' AND u.scope_key = e.cohort)
+     WHERE e.id = :exam_id
+""")
+
+# 시험/회차 카운터를 한 문장으로 증가 (회차가 없는 시험은 시험 카운터만)
+_CHARGE_SQL = text("""
+    INSERT INTO kpc_ai_token_usage (scope, scope_key, used_tokens)
+    SELECT 'exam', CAST(id AS VARCHAR), :tokens FROM kpc_exams WHERE id = :exam_id
+    UNION ALL
+    SELECT 'cohort', cohort, :tokens FROM kpc_exams WHERE id = :exam_id AND cohort IS NOT NULL
+    ON CONFLICT (scope, scope_key)
+    DO UPDATE SET used_tokens = kpc_ai_token_usage.used_tokens + EXCLUDED.used_tokens, updated_at = now()
+""")
+
+
+class AITokenBudget:
+    """
+    시험별/회차별 토큰 예산
+
+    호출 전에는 누적 사용량이 예산 미만인지만 확인하고(응답 길이를 미리 알 수 없음),
+    호출 후 프로바이더가 보고한 실제 토큰 수를 누적합니다. 따라서 마지막 요청 하나만큼
+    예산을 넘을 수 있습니다.
+    """
+
+    def __init__(self, per_exam: int, per_cohort: int):
+        self.per_exam = per_exam
+        self.per_cohort = per_cohort
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_exam > 0 or self.per_cohort > 0
+
+    def exhausted_scope(self, db: Session, exam_id: int) -> Optional[str]:
+        """예산을 모두 쓴 범위 ('exam' / 'cohort'), 여유가 있으면 None"""
+        if not self.enabled:
+            return None
+        for row in db.execute(_USAGE_SQL, {"exam_id": exam_id}):
+            if row.scope == "exam" and self.per_exam > 0 and row.used_tokens >= self.per_exam:
+                return "exam"
+            if row.scope == "cohort" and self.per_cohort > 0 and row.used_tokens >= self.per_cohort:
+                return "cohort"
+        return None
+
+    def charge(self, db: Session, exam_id: int, tokens: Optional[int]):
+        """
+        실제 사용 토큰 누적 (호출자의 트랜잭션에 포함, 커밋은 호출자가 수행)
+
+        예산을 나중에 켜도 정확하도록 예산 설정과 관계없이 항상 누적합니다.
+        """
+        if not tokens:
+            return
+        db.execute(_CHARGE_SQL, {"exam_id": exam_id, "tokens": tokens})
+
+
+# Create singleton instance
+ai_token_budget = AITokenBudget(settings.AI_TOKEN_BUDGET_PER_EXAM, settings.AI_TOKEN_BUDGET_PER_COHORT)
@@ -0,0 +1,308 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.answer import AIUsage
+from app.services.ai_blob_store import ai_blob_store
+from app.services.ai_token_budget import ai_token_budget
+
+logger = logging.getLogger(__name__)
+
+
+class AIUsageWriter:
+    """
+    AIUsage 기록 지연 일괄 저장 (write-behind)
+
+    요청 경로에서는 큐에 넣기만 하고, 백그라운드 작업이 flush_interval마다 (또는 batch_size개가
+    모이면) 여러 행을 한 번의 INSERT로 저장하며 토큰 예산 카운터도 같은 트랜잭션에서 시험별로
+    합산해 누적합니다. 프롬프트/응답 본문은 압축하여 kpc_ai_blobs에 저장하고 행에는 해시만 남깁니다.
+
+    사용 한도는 kpc_ai_quota 카운터로 예약하므로 기록이 늦게 저장되어도 한도 판정에는 영향이
+    없습니다. 토큰 예산 확인은 최대 flush_interval만큼 늦게 반영됩니다.
+
+    max_attempts번 재시도해도 저장하지 못한 배치는 최대 max_dead_letters개까지 보관했다가
+    다음 배치 저장이 성공하면 다시 큐에 넣습니다 (한도를 넘으면 오래된 기록부터 버리고 집계).
+    제약 조건 위반 등 행 자체의 오류는 배치를 반씩 나눠 문제 행만 찾아 버리므로, 잘못된 행이
+    다른 행과 함께 계속 다시 실패하지 않습니다.
+    """
+
+    def __init__(self, session_factory=SessionLocal, flush_interval: float = 0.25,
+                 batch_size: int = 500, max_queue: int = 10000, max_attempts: int = 3,
+                 max_dead_letters: int = 10000):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.max_dead_letters = max_dead_letters
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self._collecting: List[Tuple[Dict[str, Any], int]] = []  # 큐에서 꺼냈지만 아직 저장을 시작하지 않은 기록
+        self._sync_writes: Set[asyncio.Future] = set()  # 큐를 거치지 않고 스레드 풀에서 저장 중인 기록
+        # 저장에 실패한 기록 (_write는 스레드 풀에서 실행되므로 잠금 사용)
+        self._dead_letters: Deque[Tuple[Dict[str, Any], int]] = deque(maxlen=max_dead_letters)
+        self._dead_letter_lock = threading.Lock()
+
+        # 통계
+        self.total_enqueued = 0
+        self.total_written = 0
+        self.total_batches = 0
+        self.total_sync_writes = 0  # 작업 미실행/큐 포화로 큐를 거치지 않고 바로 저장한 기록
+        self.total_failed_batches = 0
+        self.total_dead_lettered = 0  # 저장에 실패해 보관한 기록 (재시도 후 다시 실패하면 중복 집계)
+        self.total_dropped = 0  # 보관 한도를 넘어 버린 기록
+        self.total_rejected = 0  # 행 자체의 오류로 버린 기록
+        self.max_batch = 0
+        self.last_flush_ms = 0.0
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+        logger.info("[AIUsage] writer started")
+
+    async def stop(self):
+        """남은 기록을 모두 저장한 뒤 종료 (보관 중인 기록도 한 번 더 저장 시도)"""
+        loop = asyncio.get_running_loop()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+            if self._inflight is not None:
+                # 종료 직전에 시작된 배치 저장이 끝날 때까지 대기
+                await asyncio.gather(self._inflight, return_exceptions=True)
+                self._inflight = None
+            if self._collecting:
+                await loop.run_in_executor(None, self._write, self._collecting)
+                self._collecting = []
+            while not self._queue.empty():
+                batch = self._drain(self.batch_size)
+                await loop.run_in_executor(None, self._write, batch)
+
+        if self._sync_writes:
+            await asyncio.gather(*list(self._sync_writes), return_exceptions=True)
+        with self._dead_letter_lock:
+            unsaved = list(self._dead_letters)
+            self._dead_letters.clear()
+        for i in range(0, len(unsaved), self.batch_size):
+            await loop.run_in_executor(None, self._write, unsaved[i:i + self.batch_size])
+        logger.info(
+            f"[AIUsage] writer stopped (written={self.total_written}, "
+            f"unsaved={len(self._dead_letters)}, dropped={self.total_dropped})"
+        )
+
+    def record(self, exam_id: int, question_id: int, tool_type: str, prompt: str, response: str,
+               tokens_used: Optional[int], input_tokens: Optional[int] = None,
+               output_tokens: Optional[int] = None, cached: bool = False, charge_budget: bool = True):
+        """
+        사용 기록 추가 (charge_budget이고 캐시 응답이 아니면 토큰 예산에도 누적)
+
+        작업이 실행 중이 아니거나 큐가 가득 차면 기록을 잃지 않도록 바로 저장합니다 (이벤트 루프
+        안에서는 재시도 대기가 루프를 막지 않도록 스레드 풀에서 저장).
+        """
+        row = {
+            "exam_id": exam_id,
+            "question_id": question_id,
+            "tool_type": tool_type,
+            "prompt": prompt,
+            "response": response,
+            "tokens_used": tokens_used,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cached": cached,
+            # 저장 시각이 아닌 요청 완료 시각
+            "timestamp": datetime.now(timezone.utc),
+        }
+        item = (row, tokens_used if charge_budget and not cached else 0)
+        if self._task is not None:
+            try:
+                self._queue.put_nowait(item)
+                self.total_enqueued += 1
+                return
+            except asyncio.QueueFull:
+                logger.warning("[AIUsage] write-behind queue full, writing synchronously")
+        self.total_sync_writes += 1
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 이벤트 루프 밖 (스크립트 등)
+            self._write([item])
+            return
+        future = loop.run_in_executor(None, self._write, [item])
+        self._sync_writes.add(future)
+        future.add_done_callback(self._sync_writes.discard)
+
+    def _drain(self, limit: int) -> List[Tuple[Dict[str, Any], int]]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._collecting = [await self._queue.get()]
+            # 첫 기록부터 flush_interval 동안 (또는 batch_size까지) 모아서 저장
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+            batch.extend(self._drain(self.batch_size - len(batch)))
+            self._collecting = []
+            self._inflight = loop.run_in_executor(None, self._write, batch)
+            try:
+                # 저장 중 종료되어도 이 배치는 끝까지 저장 (stop에서 완료를 기다림)
+                written = await asyncio.shield(self._inflight)
+                self._inflight = None
+                if written:
+                    self._requeue_dead_letters()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[AIUsage] writer error: {e}", exc_info=True)
+
+    def _requeue_dead_letters(self):
+        """저장이 다시 성공하면 보관 중인 기록을 큐 여유만큼 다시 넣음"""
+        with self._dead_letter_lock:
+            while self._dead_letters and not self._queue.full():
+                self._queue.put_nowait(self._dead_letters.popleft())
+
+    def _dead_letter(self, batch: List[Tuple[Dict[str, Any], int]]):
+        with self._dead_letter_lock:
+            overflow = max(0, len(self._dead_letters) + len(batch) - self.max_dead_letters)
+            # deque(maxlen)이 오래된 기록부터 버림
+            self._dead_letters.extend(batch)
+            self.total_dead_lettered += len(batch)
+            self.total_dropped += overflow
+
+    def _write(self, batch: List[Tuple[Dict[str, Any], int]]) -> bool:
+        """
+        배치 저장 (DB 연결 오류 등으로 max_attempts번 실패하면 보관하고 False 반환)
+
+        행 자체의 오류(제약 조건 위반 등)는 재시도하지 않고 문제 행을 찾아 버립니다.
+        """
+        started = time.perf_counter()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self._insert(batch)
+                break
+            except (IntegrityError, DataError) as e:
+                logger.warning(f"[AIUsage] rejected batch of {len(batch)} usage records, isolating bad rows: {e}")
+                return self._isolate(batch)
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    self.total_failed_batches += 1
+                    self._dead_letter(batch)
+                    logger.error(f"[AIUsage] failed to write {len(batch)} usage records, keeping them for retry: {e}",
+                                 exc_info=True)
+                    return False
+                logger.warning(f"[AIUsage] write failed (attempt {attempt}/{self.max_attempts}): {e}")
+                time.sleep(0.1 * attempt)
+
+        self.total_batches += 1
+        self.max_batch = max(self.max_batch, len(batch))
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+        return True
+
+    def _isolate(self, batch: List[Tuple[Dict[str, Any], int]]) -> bool:
+        """반씩 나눠 저장하며 오류가 나는 행만 버림 (중간에 연결 오류가 나면 남은 부분은 보관)"""
+        if len(batch) == 1:
+            row = batch[0][0]
+            self.total_rejected += 1
+            logger.error(
+                f"[AIUsage] dropped invalid usage record exam_id={row['exam_id']} "
+                f"question_id={row['question_id']} tool_type={row['tool_type']}"
+            )
+            return True
+        middle = len(batch) // 2
+        for half in (batch[:middle], batch[middle:]):
+            try:
+                self._insert(half)
+            except (IntegrityError, DataError):
+                self._isolate(half)
+            except Exception as e:
+                self.total_failed_batches += 1
+                self._dead_letter(half)
+                logger.error(f"[AIUsage] failed to write {len(half)} usage records, keeping them for retry: {e}")
+                return False
+        return True
+
+    def _insert(self, batch: List[Tuple[Dict[str, Any], int]]):
+        """한 트랜잭션으로 기록 INSERT + 시험별 토큰 예산 누적"""
+        charges: Dict[int, int] = defaultdict(int)
+        for row, tokens in batch:
+            if tokens:
+                charges[row["exam_id"]] += tokens
+
+        db = self.session_factory()
+        try:
+            hashes, new_hashes = ai_blob_store.store_many(
+                db, (text for row, _ in batch for text in (row["prompt"], row["response"]))
+            )
+            rows = [
+                dict(row, prompt=None, response=None,
+                     prompt_hash=hashes[row["prompt"]], response_hash=hashes[row["response"]])
+                for row, _ in batch
+            ]
+            # executemany - PostgreSQL 드라이버에서는 다중 행 INSERT로 묶여 실행됨
+            db.execute(insert(AIUsage), rows)
+            for exam_id, tokens in charges.items():
+                ai_token_budget.charge(db, exam_id, tokens)
+            db.commit()
+            ai_blob_store.remember(new_hashes)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.total_written += len(batch)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "total_enqueued": self.total_enqueued,
+            "total_written": self.total_written,
+            "total_batches": self.total_batches,
+            "avg_batch": round(self.total_written / self.total_batches, 2) if self.total_batches else 0.0,
+            "max_batch": self.max_batch,
+            "total_sync_writes": self.total_sync_writes,
+            "pending_sync_writes": len(self._sync_writes),
+            "total_failed_batches": self.total_failed_batches,
+            "dead_letters": len(self._dead_letters),
+            "max_dead_letters": self.max_dead_letters,
+            "total_dead_lettered": self.total_dead_lettered,
+            "total_dropped": self.total_dropped,
+            "total_rejected": self.total_rejected,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+# Create singleton instance
+ai_usage_writer = AIUsageWriter(
+    flush_interval=settings.AI_USAGE_FLUSH_INTERVAL_SECONDS,
+    batch_size=settings.AI_USAGE_BATCH_SIZE,
+    max_queue=settings.AI_USAGE_QUEUE_MAX_SIZE,
+    max_dead_letters=settings.AI_USAGE_DEAD_LETTER_MAX_SIZE
+)
@@ -0,0 +1,156 @@
+import random
+import re
+import time
+from typing import Any, Dict, Optional
+
+# 상태
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATUS_CODE_RE = re.compile(r"\b(429|500|502|503|504)\b")
+# "retry_delay { seconds: 12 }", "Please retry in 12.5s", "Retry-After: 12"
+_RETRY_AFTER_RES = [
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry in\s*([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry-after:?\s*([\d.]+)", re.IGNORECASE),
+]
+# google.api_core.exceptions 클래스 이름 기준
+_KEY_FAILURE_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+    "InternalServerError", "DeadlineExceeded", "BadGateway", "GatewayTimeout",
+}
+
+
+def is_key_failure(error: Exception) -> bool:
+    """키 상태에 반영할 오류인지 (429 한도 초과 또는 5xx 서버 오류)"""
+    if type(error).__name__ in _KEY_FAILURE_ERRORS:
+        return True
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code == 429 or 500 <= code < 600
+    message = str(error).lower()
+    if _STATUS_CODE_RE.search(message):
+        return True
+    return "quota" in message or "rate limit" in message or "unavailable" in message
+
+
+def parse_retry_after(error: Exception) -> Optional[float]:
+    """오류에 포함된 재시도 권장 시간 (초)"""
+    retry_after = getattr(error, "retry_after", None)
+    if isinstance(retry_after, (int, float)):
+        return float(retry_after)
+    message = str(error)
+    for pattern in _RETRY_AFTER_RES:
+        match = pattern.search(message)
+        if match:
+            try:
+                return float(match.group(1))
+            except ValueError:
+                return None
+    return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """지수 백오프 + full jitter (동시에 실패한 요청들이 같은 시점에 몰리지 않도록)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    API 키별 서킷 브레이커
+
+    - closed: 정상. 연속 failure_threshold회 429/5xx가 발생하면 open
+    - open: 쿨다운 동안 요청을 보내지 않음. 쿨다운은 연속 open 횟수에 따라
+      지수적으로 늘어나며(jitter 포함) Retry-After가 더 길면 그 값을 따름
+    - half_open: 쿨다운이 끝나면 요청 하나만 시험적으로 보내고,
+      성공하면 closed, 실패하면 다시 open
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown_seconds: float = 5.0,
+                 max_cooldown_seconds: float = 120.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.trips = 0  # 연속 open 횟수 (closed로 돌아가면 초기화)
+        self.open_until = 0.0
+        self.probe_in_flight = False
+        self.last_error: Optional[str] = None
+
+        # 통계
+        self.total_failures = 0
+        self.total_opens = 0
+
+    def _cooldown(self, retry_after: Optional[float]) -> float:
+        cooldown = min(self.max_cooldown_seconds, self.cooldown_seconds * (2 ** (self.trips - 1)))
+        cooldown *= random.uniform(0.8, 1.2)
+        if retry_after:
+            cooldown = max(cooldown, retry_after)
+        return cooldown
+
+    def time_until_available(self, now: Optional[float] = None) -> float:
+        """요청을 보낼 수 있을 때까지 남은 시간 (초)"""
+        now = now if now is not None else time.monotonic()
+        if self.state == OPEN:
+            if now < self.open_until:
+                return self.open_until - now
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and self.probe_in_flight:
+            # 시험 요청 결과를 기다리는 중
+            return min(1.0, self.cooldown_seconds)
+        return 0.0
+
+    def acquire(self, now: Optional[float] = None) -> bool:
+        """요청 전송 허가 (half_open이면 시험 요청 하나만 허용)"""
+        if self.time_until_available(now) > 0:
+            return False
+        if self.state == HALF_OPEN:
+            self.probe_in_flight = True
+        return True
+
+    def record_success(self):
+        if self.state == OPEN:
+            # 열리기 전에 보낸 요청의 성공 - 쿨다운이 끝난 뒤 시험 요청으로 회복 여부 확인
+            return
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.probe_in_flight = False
+
+    def record_failure(self, error: Exception, now: Optional[float] = None):
+        now = now if now is not None else time.monotonic()
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        self.last_error = str(error)[:200]
+        if self.state == OPEN:
+            # 열리기 전에 보낸 요청의 실패 - 쿨다운을 다시 늘리지 않음
+            return
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.trip(parse_retry_after(error), now)
+        self.probe_in_flight = False
+
+    def trip(self, retry_after: Optional[float] = None, now: Optional[float] = None):
+        now = now if now is not None else time.monotonic()
+        self.trips += 1
+        self.total_opens += 1
+        self.state = OPEN
+        self.open_until = now + self._cooldown(retry_after)
+
+    def release_probe(self):
+        """시험 요청이 키 상태와 무관하게 끝난 경우 (취소 등)"""
+        self.probe_in_flight = False
+
+    def get_status(self) -> Dict[str, Any]:
+        remaining = self.time_until_available() if self.state == OPEN else 0.0
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "open_remaining_ms": round(remaining * 1000, 2),
+            "total_failures": self.total_failures,
+            "total_opens": self.total_opens,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,208 @@
+import asyncio
+import heapq
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.exam_timer import as_utc
+
+logger = logging.getLogger(__name__)
+
+SubmittedHook = Callable[[List[Dict[str, Any]]], Union[None, Awaitable[None]]]
+
+# 배정 시간 + 연장 + 누적 일시정지 시간으로 계산한 종료 시각
+_DEADLINE_SQL = (
+    "start_time + make_interval(secs => COALESCE(duration_seconds, :default_duration)"
+    " + extension_seconds + paused_seconds + :grace)"
+)
+
+# 마감이 지난 시험을 한 번에 제출 처리 (여러 인스턴스가 동시에 실행해도 안전)
+_EXPIRE_SQL = text(f"""
+    UPDATE kpc_exams
+       SET status = 'submitted', end_time = now(), updated_at = now()
+     WHERE status = 'in_progress'
+       AND paused_at IS NULL
+       AND start_time IS NOT NULL
+       AND {_DEADLINE_SQL} <= now()
+    RETURNING id, user_id
+""")
+
+# 진행 중인 시험의 마감 시각 (같은 초의 마감은 힙에 넣을 때 하나로 합쳐짐)
+_DEADLINES_SQL = text(f"""
+    SELECT DISTINCT {_DEADLINE_SQL} AS deadline
+      FROM kpc_exams
+     WHERE status = 'in_progress'
+       AND paused_at IS NULL
+       AND start_time IS NOT NULL
+""")
+
+
+class DeadlineScheduler:
+    """
+    시험 마감 시각을 힙으로 관리하고, 마감 시점마다 만료된 시험을 일괄 제출 처리
+
+    힙에는 시험 단위가 아니라 마감 시각(초 단위)만 저장하므로 같은 시각에 끝나는
+    수천 개의 시험도 한 번의 UPDATE ... RETURNING으로 처리됩니다. 마감 시각은 초 단위로
+    올림하여, 타이머가 실제 마감보다 먼저 깨어나 아무것도 제출하지 못하는 일이 없도록 합니다.
+    """
+
+    def __init__(self, session_factory=SessionLocal, resync_interval: int = 60, grace_seconds: int = 0):
+        self.session_factory = session_factory
+        self.resync_interval = resync_interval
+        self.grace_seconds = grace_seconds
+
+        self._heap: List[float] = []
+        self._scheduled: set = set()
+        self._hooks: List[SubmittedHook] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._next_resync = 0.0
+
+        # 통계
+        self.total_runs = 0
+        self.total_expired = 0
+        self.last_run_at: Optional[float] = None
+
+    def on_submitted(self, hook: SubmittedHook) -> SubmittedHook:
+        """자동 제출된 시험 목록을 일괄로 받는 후처리 훅 등록"""
+        self._hooks.append(hook)
+        return hook
+
+    def schedule(self, when: Optional[datetime]):
+        """마감 시각 등록 (같은 초의 마감은 하나로 합쳐짐)"""
+        if when is None:
+            return
+        ts = float(self._second(when) + self.grace_seconds)
+        if ts in self._scheduled:
+            return
+        self._scheduled.add(ts)
+        heapq.heappush(self._heap, ts)
+        if self._wakeup is not None and self._heap[0] == ts:
+            self._wakeup.set()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("[Deadline] scheduler started")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("[Deadline] scheduler stopped")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                now = time.time()
+                if now >= self._next_resync:
+                    await loop.run_in_executor(None, self._resync)
+                    self._next_resync = time.time() + self.resync_interval
+
+                due = False
+                while self._heap and self._heap[0] <= time.time():
+                    self._scheduled.discard(heapq.heappop(self._heap))
+                    due = True
+                if due:
+                    await self.enforce()
+
+                # 다음 마감 또는 재동기화 시각까지 대기 (새 마감이 등록되면 즉시 깨어남)
+                next_at = self._next_resync
+                if self._heap:
+                    next_at = min(next_at, self._heap[0])
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, next_at - time.time()))
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Deadline] scheduler error: {e}", exc_info=True)
+                await asyncio.sleep(1)
+
+    def _resync(self):
+        """DB에서 진행 중인 시험의 마감 시각을 다시 읽어 힙에 반영 (재시작/연장/재개 대응)"""
+        db = self.session_factory()
+        try:
+            rows = db.execute(_DEADLINES_SQL, self._params()).fetchall()
+        finally:
+            db.close()
+        for row in rows:
+            if row.deadline is not None:
+                ts = float(self._second(row.deadline))
+                if ts not in self._scheduled:
+                    self._scheduled.add(ts)
+                    heapq.heappush(self._heap, ts)
+
+    @staticmethod
+    def _second(when: datetime) -> int:
+        """마감 시각을 초 단위로 올림 (내림하면 마감 직전에 깨어나 UPDATE가 아무 행도 찾지 못함)"""
+        return math.ceil(as_utc(when).timestamp())
+
+    def _expire(self) -> List[Dict[str, Any]]:
+        db = self.session_factory()
+        try:
+            rows = db.execute(_EXPIRE_SQL, self._params()).fetchall()
+            db.commit()
+            return [{"id": row.id, "user_id": row.user_id} for row in rows]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _params(self) -> Dict[str, Any]:
+        return {"default_duration": settings.EXAM_DURATION_SECONDS, "grace": self.grace_seconds}
+
+    async def enforce(self) -> List[Dict[str, Any]]:
+        """만료된 시험을 한 번에 제출 처리하고 후처리 훅 실행"""
+        loop = asyncio.get_running_loop()
+        expired = await loop.run_in_executor(None, self._expire)
+        self.total_runs += 1
+        self.last_run_at = time.time()
+        if not expired:
+            return expired
+
+        self.total_expired += len(expired)
+        logger.info(f"[Deadline] auto-submitted {len(expired)} expired exam(s)")
+
+        for hook in self._hooks:
+            try:
+                result = hook(expired)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f"[Deadline] post-submit hook failed: {e}", exc_info=True)
+        return expired
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "pending_deadlines": len(self._heap),
+            "next_deadline": self._heap[0] if self._heap else None,
+            "total_runs": self.total_runs,
+            "total_expired": self.total_expired,
+            "last_run_at": self.last_run_at,
+        }
+
+
+# Create singleton instance
+deadline_scheduler = DeadlineScheduler(
+    resync_interval=settings.EXAM_DEADLINE_RESYNC_SECONDS,
+    grace_seconds=settings.EXAM_DEADLINE_GRACE_SECONDS,
+)
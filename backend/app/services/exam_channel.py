@@ -0,0 +1,317 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.answer import Answer
+from app.models.exam import Exam, ExamStatus
+from app.services.exam_timer import remaining_seconds, utcnow
+from app.services.deadline_scheduler import deadline_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelConnection:
+    """시험 세션 채널의 개별 연결 (WebSocket 또는 SSE)"""
+
+    def __init__(self, exam_id: int, user_id: int, transport: str, queue_size: int):
+        self.exam_id = exam_id
+        self.user_id = user_id
+        self.transport = transport
+        # 연결별 송신 큐 - 가득 차면 느린 클라이언트로 보고 연결 종료 (backpressure)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+        self.close_reason: Optional[str] = None
+        self.connected_at = utcnow()
+
+    def send(self, message: Dict[str, Any]) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.close("slow_consumer")
+            return False
+
+    def close(self, reason: str = "closed"):
+        if self.closed:
+            return
+        self.closed = True
+        self.close_reason = reason
+        # 대기 중인 송신 루프를 깨우기 위한 종료 신호
+        while True:
+            try:
+                self.queue.put_nowait(None)
+                break
+            except asyncio.QueueFull:
+                self.queue.get_nowait()
+
+    async def next_message(self) -> Optional[Dict[str, Any]]:
+        return await self.queue.get()
+
+
+class ExamChannelHub:
+    """시험 세션별 연결 관리, 타이머 틱/답안 저장 확인/관리자 공지 전달"""
+
+    def __init__(self, queue_size: int = 100, tick_interval: int = 15):
+        self.queue_size = queue_size
+        self.tick_interval = tick_interval
+        self.connections: Dict[int, Set[ChannelConnection]] = {}
+        # 연결된 시험의 타이머 계산용 스냅샷 (틱마다 한 번의 쿼리로 DB와 다시 맞춤 - 다른 인스턴스의 변경 반영)
+        self.exams: Dict[int, SimpleNamespace] = {}
+        self._tick_task: Optional[asyncio.Task] = None
+
+        # 통계
+        self.total_connections = 0
+        self.total_messages_sent = 0
+        self.total_saves = 0
+        self.total_slow_consumers = 0
+
+    def connection_count(self) -> int:
+        return sum(len(conns) for conns in self.connections.values())
+
+    def _snapshot(self, exam) -> SimpleNamespace:
+        status = exam.status.value if hasattr(exam.status, "value") else exam.status
+        return SimpleNamespace(
+            id=exam.id,
+            status=status,
+            start_time=exam.start_time,
+            duration_seconds=exam.duration_seconds,
+            extension_seconds=exam.extension_seconds,
+            paused_at=exam.paused_at,
+            paused_seconds=exam.paused_seconds,
+        )
+
+    def connect(self, exam, user_id: int, transport: str) -> ChannelConnection:
+        conn = ChannelConnection(exam.id, user_id, transport, self.queue_size)
+        self.exams[exam.id] = self._snapshot(exam)
+        self.connections.setdefault(exam.id, set()).add(conn)
+        self.total_connections += 1
+        conn.send(self.timer_message(exam.id))
+        logger.info(f"[Channel] {transport} connected: exam_id={exam.id}, connections={self.connection_count()}")
+        return conn
+
+    def disconnect(self, conn: ChannelConnection):
+        conns = self.connections.get(conn.exam_id)
+        if conns is not None:
+            conns.discard(conn)
+            if not conns:
+                del self.connections[conn.exam_id]
+                self.exams.pop(conn.exam_id, None)
+        if conn.close_reason == "slow_consumer":
+            self.total_slow_consumers += 1
+        conn.close("disconnected")
+        logger.info(f"[Channel] disconnected: exam_id={conn.exam_id}, connections={self.connection_count()}")
+
+    def publish(self, exam_id: int, message: Dict[str, Any]) -> int:
+        """특정 시험의 모든 연결에 메시지 전송, 전달된 연결 수 반환"""
+        delivered = 0
+        for conn in list(self.connections.get(exam_id, ())):
+            if conn.send(message):
+                delivered += 1
+        self.total_messages_sent += delivered
+        return delivered
+
+    def broadcast(self, message: str, exam_ids: Optional[List[int]] = None) -> int:
+        """관리자 공지 (예: "5분 남았습니다")"""
+        payload = {"type": "broadcast", "message": message, "sent_at": utcnow().isoformat()}
+        targets = exam_ids if exam_ids is not None else list(self.connections.keys())
+        return sum(self.publish(exam_id, payload) for exam_id in targets)
+
+    def timer_message(self, exam_id: int) -> Dict[str, Any]:
+        exam = self.exams[exam_id]
+        return {
+            "type": "timer",
+            "exam_id": exam_id,
+            "status": exam.status,
+            "timer_remaining": remaining_seconds(exam),
+            "is_paused": exam.paused_at is not None,
+            "server_time": utcnow().isoformat(),
+        }
+
+    def update_exam(self, exam):
+        """일시정지/재개/연장 등 타이머 변경을 연결된 클라이언트에 즉시 반영"""
+        if exam.id not in self.connections:
+            return
+        self.exams[exam.id] = self._snapshot(exam)
+        self.publish(exam.id, self.timer_message(exam.id))
+
+    async def refresh_exams(self):
+        """연결된 시험의 스냅샷을 DB에서 다시 읽어 다른 인스턴스의 일시정지/연장/제출을 반영"""
+        exam_ids = list(self.connections.keys())
+        if not exam_ids:
+            return
+        loop = asyncio.get_running_loop()
+        snapshots = await loop.run_in_executor(None, self._load_snapshots_sync, exam_ids)
+        for exam_id, snapshot in snapshots.items():
+            previous = self.exams.get(exam_id)
+            if exam_id not in self.connections or previous is None:
+                continue
+            self.exams[exam_id] = snapshot
+            if previous.status == "in_progress" and snapshot.status != "in_progress":
+                self.publish(exam_id, {"type": "exam_submitted", "exam_id": exam_id, "reason": snapshot.status})
+
+    def _load_snapshots_sync(self, exam_ids: List[int]) -> Dict[int, SimpleNamespace]:
+        db = SessionLocal()
+        try:
+            exams = db.query(Exam).filter(Exam.id.in_(exam_ids)).all()
+            return {exam.id: self._snapshot(exam) for exam in exams}
+        finally:
+            db.close()
+
+    def on_exams_submitted(self, rows: List[Dict[str, Any]]):
+        """마감 스케줄러가 자동 제출한 시험에 종료 알림"""
+        for row in rows:
+            exam = self.exams.get(row["id"])
+            if exam is None:
+                continue
+            exam.status = "submitted"
+            self.publish(row["id"], {"type": "exam_submitted", "exam_id": row["id"], "reason": "deadline"})
+
+    async def handle_client_message(self, conn: ChannelConnection, message: Dict[str, Any]):
+        msg_type = message.get("type")
+        if msg_type == "save_answer":
+            await self._handle_save(conn, message)
+        elif msg_type in ("ping", "timer"):
+            conn.send(self.timer_message(conn.exam_id))
+        else:
+            conn.send({"type": "error", "detail": f"Unknown message type: {msg_type}"})
+
+    async def _handle_save(self, conn: ChannelConnection, message: Dict[str, Any]):
+        client_msg_id = message.get("client_msg_id")
+        question_id = message.get("question_id")
+        answer_data = message.get("answer_data")
+
+        if not isinstance(question_id, int) or not isinstance(answer_data, dict):
+            conn.send({
+                "type": "save_error",
+                "client_msg_id": client_msg_id,
+                "detail": "question_id (int) and answer_data (dict) are required"
+            })
+            return
+
+        exam = self.exams.get(conn.exam_id)
+        if exam is None or exam.status != "in_progress":
+            conn.send({"type": "save_error", "client_msg_id": client_msg_id, "detail": "Exam is not in progress"})
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+            saved = await loop.run_in_executor(
+                None, _save_answer_sync, conn.exam_id, question_id, answer_data
+            )
+        except Exception as e:
+            logger.error(f"[Channel] answer save failed: {e}", exc_info=True)
+            conn.send({"type": "save_error", "client_msg_id": client_msg_id, "detail": "Failed to save answer"})
+            return
+
+        if saved is None:
+            # 다른 인스턴스에서 제출된 시험 - 스냅샷은 다음 틱에 갱신
+            conn.send({"type": "save_error", "client_msg_id": client_msg_id, "detail": "Exam is not in progress"})
+            return
+        answer_id, saved_at = saved
+
+        self.total_saves += 1
+        conn.send({
+            "type": "save_ack",
+            "client_msg_id": client_msg_id,
+            "question_id": question_id,
+            "answer_id": answer_id,
+            "saved_at": saved_at.isoformat(),
+        })
+
+    async def start(self):
+        if self._tick_task is None:
+            self._tick_task = asyncio.create_task(self._tick_loop())
+
+    async def stop(self):
+        if self._tick_task is not None:
+            self._tick_task.cancel()
+            try:
+                await self._tick_task
+            except asyncio.CancelledError:
+                pass
+            self._tick_task = None
+        for conns in list(self.connections.values()):
+            for conn in list(conns):
+                conn.close("shutdown")
+
+    async def _tick_loop(self):
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            try:
+                await self.refresh_exams()
+            except Exception as e:
+                # DB 오류 시 기존 스냅샷으로 틱 전송
+                logger.warning(f"[Channel] exam snapshot refresh failed: {e}")
+            for exam_id in list(self.connections.keys()):
+                if exam_id in self.exams:
+                    self.publish(exam_id, self.timer_message(exam_id))
+
+    def get_status(self) -> Dict[str, Any]:
+        by_transport: Dict[str, int] = {}
+        for conns in self.connections.values():
+            for conn in conns:
+                by_transport[conn.transport] = by_transport.get(conn.transport, 0) + 1
+        return {
+            "active_connections": self.connection_count(),
+            "active_exams": len(self.connections),
+            "connections_by_transport": by_transport,
+            "total_connections": self.total_connections,
+            "total_messages_sent": self.total_messages_sent,
+            "total_saves": self.total_saves,
+            "total_slow_consumers": self.total_slow_consumers,
+        }
+
+
+def _save_answer_sync(exam_id: int, question_id: int, answer_data: Dict[str, Any]):
+    """
+    답안 저장 (채널 연결 시 이미 인증/소유권을 확인했으므로 upsert만 수행)
+
+    시험 상태는 메모리 스냅샷이 아니라 DB에서 확인하고, 진행 중이 아니면 None을 반환합니다.
+    시험 행을 공유 잠금으로 읽어 저장이 끝날 때까지 제출로 상태가 바뀌지 않게 합니다.
+    """
+    db = SessionLocal()
+    try:
+        exam_status = db.query(Exam.status).filter(Exam.id == exam_id).with_for_update(read=True).scalar()
+        if exam_status != ExamStatus.IN_PROGRESS:
+            db.rollback()
+            return None
+
+        now = datetime.now(timezone.utc)
+        answer = db.query(Answer).filter(
+            Answer.exam_id == exam_id,
+            Answer.question_id == question_id
+        ).first()
+        if answer:
+            answer.answer_data = answer_data
+            answer.updated_at = now
+            if answer.submitted_at is None:
+                answer.submitted_at = now
+        else:
+            answer = Answer(
+                exam_id=exam_id,
+                question_id=question_id,
+                answer_data=answer_data,
+                submitted_at=now
+            )
+            db.add(answer)
+        db.commit()
+        return answer.id, now
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# Create singleton instance
+exam_channel = ExamChannelHub(
+    queue_size=settings.EXAM_CHANNEL_QUEUE_SIZE,
+    tick_interval=settings.EXAM_CHANNEL_TICK_SECONDS,
+)
+deadline_scheduler.on_submitted(exam_channel.on_exams_submitted)
@@ -0,0 +1,52 @@
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+
+from app.core.config import settings
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """naive datetime(utcnow로 저장된 값)을 UTC aware로 변환"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def allotted_seconds(exam) -> int:
+    """시험에 배정된 총 시간 (기본 시간 + 연장 시간)"""
+    duration = exam.duration_seconds or settings.EXAM_DURATION_SECONDS
+    return duration + (exam.extension_seconds or 0)
+
+
+def elapsed_seconds(exam, now: Optional[datetime] = None) -> int:
+    """일시정지 시간을 제외한 실제 경과 시간"""
+    start_time = as_utc(exam.start_time)
+    if start_time is None:
+        return 0
+
+    now = now or utcnow()
+    paused = exam.paused_seconds or 0
+    paused_at = as_utc(exam.paused_at)
+    if paused_at is not None:
+        # 일시정지 중이면 정지 시점 이후의 시간은 경과로 보지 않음
+        paused += max(0, int((now - paused_at).total_seconds()))
+
+    return max(0, int((now - start_time).total_seconds()) - paused)
+
+
+def remaining_seconds(exam, now: Optional[datetime] = None) -> int:
+    """서버 기준 남은 시간 (초)"""
+    return max(0, allotted_seconds(exam) - elapsed_seconds(exam, now))
+
+
+def deadline(exam) -> Optional[datetime]:
+    """일시정지 중이 아닐 때의 시험 종료 시각"""
+    start_time = as_utc(exam.start_time)
+    if start_time is None or exam.paused_at is not None:
+        return None
+    return start_time + timedelta(seconds=allotted_seconds(exam) + (exam.paused_seconds or 0))
@@ -0,0 +1,419 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.services.circuit_breaker import CircuitBreaker, OPEN, CLOSED, is_key_failure, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    분당 한도용 토큰 버킷
+
+    capacity만큼 쌓이고 초당 refill_rate씩 채워집니다. 토큰이 부족해도 reserve()로
+    미리 차감(음수 허용)할 수 있으며, 반환된 대기 시간 뒤에 사용하면 한도를 넘지 않습니다.
+    어떤 60초 구간에서도 capacity + refill_rate * 60을 넘지 않으므로 분당 한도용 버킷은
+    per_minute_limits()로 만듭니다.
+    """
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def time_until(self, amount: float = 1) -> float:
+        """amount만큼의 토큰이 쌓일 때까지 남은 시간 (초)"""
+        self._refill(time.monotonic())
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def reserve(self, amount: float = 1) -> float:
+        """토큰을 차감하고, 차감한 토큰이 실제로 채워질 때까지의 대기 시간 반환"""
+        wait = self.time_until(amount)
+        self.tokens -= amount
+        return wait
+
+    def refund(self, amount: float):
+        """사용하지 않은 예약분 반환 (실제 사용량이 예상보다 많으면 음수로 추가 차감)"""
+        self._refill(time.monotonic())
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    @property
+    def available(self) -> float:
+        self._refill(time.monotonic())
+        return max(0.0, self.tokens)
+
+
+def per_minute_limits(rate_limit_per_minute: float, tokens_per_minute: float = 0):
+    """
+    분당 한도용 버킷 설정: ((요청 capacity, 초당 충전량), (토큰 capacity, 초당 충전량))
+
+    capacity를 분당 한도로 두면 가득 찬 버킷 + 60초 충전량으로 한 60초 구간에 최대 2배가
+    통과하므로, 요청은 한 번에 하나씩 60/RPM초 간격으로, 토큰은 6초 분량(요청 하나보다 크게)만
+    한 번에 쓰고 나머지를 고르게 채워 어떤 60초 구간에서도 분당 한도를 넘지 않게 합니다.
+    """
+    token_burst = tokens_per_minute / 10
+    return (1, rate_limit_per_minute / 60), (token_burst, (tokens_per_minute - token_burst) / 60)
+
+
+class LocalKeyPoolState:
+    """
+    프로세스 내 키 상태 (토큰 버킷 + 서킷 브레이커)
+
+    인스턴스가 하나이거나 Redis를 사용할 수 없을 때 사용합니다.
+    """
+
+    backend = "local"
+
+    def __init__(self, keys: List[str], rate_limit_per_minute: int, tokens_per_minute: int = 0):
+        self.lock = threading.Lock()
+        request_limit, token_limit = per_minute_limits(rate_limit_per_minute, tokens_per_minute)
+        self.request_buckets: Dict[str, TokenBucket] = {key: TokenBucket(*request_limit) for key in keys}
+        self.token_buckets: Dict[str, TokenBucket] = {
+            key: TokenBucket(*token_limit) for key in keys
+        } if tokens_per_minute > 0 else {}
+        self.breakers: Dict[str, CircuitBreaker] = {
+            key: CircuitBreaker(
+                failure_threshold=settings.GEMINI_BREAKER_FAILURE_THRESHOLD,
+                cooldown_seconds=settings.GEMINI_BREAKER_COOLDOWN_SECONDS,
+                max_cooldown_seconds=settings.GEMINI_BREAKER_MAX_COOLDOWN_SECONDS
+            )
+            for key in keys
+        }
+
+    async def time_until_available(self, key: str, tokens: int = 0) -> float:
+        with self.lock:
+            wait = max(self.request_buckets[key].time_until(1), self.breakers[key].time_until_available())
+            if key in self.token_buckets and tokens > 0:
+                wait = max(wait, self.token_buckets[key].time_until(tokens))
+            return wait
+
+    async def reserve(self, key: str, tokens: int = 0) -> float:
+        with self.lock:
+            wait = self.request_buckets[key].reserve(1)
+            if key in self.token_buckets and tokens > 0:
+                wait = max(wait, self.token_buckets[key].reserve(tokens))
+            return wait
+
+    async def refund(self, key: str, requests: int, tokens: int):
+        with self.lock:
+            if requests:
+                self.request_buckets[key].refund(requests)
+            if key in self.token_buckets and tokens:
+                self.token_buckets[key].refund(tokens)
+
+    async def acquire(self, key: str) -> bool:
+        with self.lock:
+            return self.breakers[key].acquire()
+
+    async def record_result(self, key: str, error: Optional[Exception]) -> bool:
+        """결과 반영, 이번 결과로 브레이커가 열렸으면 True"""
+        with self.lock:
+            breaker = self.breakers[key]
+            if error is not None and is_key_failure(error):
+                previous_state = breaker.state
+                breaker.record_failure(error)
+                return previous_state != OPEN and breaker.state == OPEN
+            breaker.record_success()
+            return False
+
+    async def release_probe(self, key: str):
+        with self.lock:
+            self.breakers[key].release_probe()
+
+    async def refresh(self):
+        pass
+
+    def key_status(self, key: str) -> Dict[str, Any]:
+        with self.lock:
+            bucket = self.request_buckets[key]
+            status = {
+                "available_requests": int(bucket.available),
+                "next_slot_ms": round(bucket.time_until(1) * 1000, 2),
+            }
+            if key in self.token_buckets:
+                status["available_tokens"] = int(self.token_buckets[key].available)
+            status["breaker"] = self.breakers[key].get_status()
+            return status
+
+
+# KEYS: 버킷 키들 (요청 수, [토큰 수])
+# ARGV[1]: mode (peek|reserve|refund), ARGV[2]: TTL(초), 이후 버킷마다 capacity, 초당 충전량, amount
+# 반환: {대기 시간(초), 버킷별 잔량...} (Lua 숫자는 정수로 변환되므로 문자열로 반환)
+_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local mode = ARGV[1]
+local ttl = tonumber(ARGV[2])
+local wait = 0
+local result = {}
+for i, key in ipairs(KEYS) do
+    local base = 2 + (i - 1) * 3
+    local capacity = tonumber(ARGV[base + 1])
+    local rate = tonumber(ARGV[base + 2])
+    local amount = tonumber(ARGV[base + 3])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    if mode == 'refund' then
+        tokens = math.min(capacity, tokens + amount)
+    else
+        if amount > 0 and tokens < amount then
+            wait = math.max(wait, (amount - tokens) / rate)
+        end
+        if mode == 'reserve' then
+            tokens = tokens - amount
+        end
+    end
+    if mode ~= 'peek' then
+        redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+        redis.call('EXPIRE', key, ttl)
+    end
+    result[i + 1] = tostring(tokens)
+end
+result[1] = tostring(wait)
+return result
+"""
+
+# KEYS[1]: 브레이커 해시, ARGV[1]: mode (peek|acquire), ARGV[2]: 시험 요청 임대 시간(초), ARGV[3]: TTL
+# 반환: {대기 시간(초), 상태}
+_BREAKER_ACQUIRE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local h = redis.call('HMGET', KEYS[1], 'state', 'open_until', 'probe_until')
+local state = h[1] or 'closed'
+local open_until = tonumber(h[2]) or 0
+local probe_until = tonumber(h[3]) or 0
+if state == 'open' then
+    if now < open_until then
+        return {tostring(open_until - now), state}
+    end
+    state = 'half_open'
+    redis.call('HSET', KEYS[1], 'state', state)
+end
+if state == 'half_open' then
+    if now < probe_until then
+        return {tostring(math.min(1, probe_until - now)), state}
+    end
+    if ARGV[1] == 'acquire' then
+        -- 시험 요청은 클러스터 전체에서 하나만 (임대 시간이 지나면 다른 인스턴스가 재시도)
+        redis.call('HSET', KEYS[1], 'probe_until', tostring(now + tonumber(ARGV[2])))
+        redis.call('EXPIRE', KEYS[1], ARGV[3])
+    end
+end
+return {'0', state}
+"""
+
+# KEYS[1]: 브레이커 해시
+# ARGV[1]: outcome (success|failure|release), ARGV[2]: 실패 임계값, ARGV[3]: 기본 쿨다운,
+# ARGV[4]: 최대 쿨다운, ARGV[5]: jitter 배수, ARGV[6]: Retry-After (없으면 0), ARGV[7]: TTL,
+# ARGV[8]: 오류 메시지
+# 반환: {상태, 이번 결과로 열렸으면 1}
+_BREAKER_RECORD_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local outcome = ARGV[1]
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+if outcome == 'success' then
+    if state == 'open' then
+        return {state, 0}
+    end
+    redis.call('HSET', KEYS[1], 'state', 'closed', 'failures', 0, 'trips', 0, 'probe_until', 0)
+    redis.call('EXPIRE', KEYS[1], ARGV[7])
+    return {'closed', 0}
+end
+if outcome == 'release' then
+    redis.call('HSET', KEYS[1], 'probe_until', 0)
+    return {state, 0}
+end
+local failures = redis.call('HINCRBY', KEYS[1], 'failures', 1)
+redis.call('HINCRBY', KEYS[1], 'total_failures', 1)
+redis.call('HSET', KEYS[1], 'last_error', ARGV[8])
+redis.call('EXPIRE', KEYS[1], ARGV[7])
+if state == 'open' then
+    return {state, 0}
+end
+if state == 'half_open' or failures >= tonumber(ARGV[2]) then
+    local trips = redis.call('HINCRBY', KEYS[1], 'trips', 1)
+    redis.call('HINCRBY', KEYS[1], 'total_opens', 1)
+    local cooldown = math.min(tonumber(ARGV[4]), tonumber(ARGV[3]) * math.pow(2, trips - 1)) * tonumber(ARGV[5])
+    cooldown = math.max(cooldown, tonumber(ARGV[6]))
+    redis.call('HSET', KEYS[1], 'state', 'open', 'open_until', tostring(now + cooldown), 'probe_until', 0)
+    return {'open', 1}
+end
+return {state, 0}
+"""
+
+
+class RedisKeyPoolState:
+    """
+    Redis 공유 키 상태 (Cloud Run 인스턴스 간 분당 한도/브레이커 공유)
+
+    토큰 버킷과 브레이커 전이를 Lua 스크립트로 원자적으로 처리하며, 시간은 Redis 서버 시계를
+    사용하므로 인스턴스 간 시계 차이의 영향을 받지 않습니다. Redis 오류 시에는 일정 시간 동안
+    프로세스 내 상태로 대체합니다.
+    """
+
+    backend = "redis"
+
+    def __init__(self, keys: List[str], rate_limit_per_minute: int, tokens_per_minute: int = 0,
+                 fallback_seconds: float = 30.0):
+        self.rate_limit = rate_limit_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.fallback_seconds = fallback_seconds
+        self.ttl = 3600
+        self.local = LocalKeyPoolState(keys, rate_limit_per_minute, tokens_per_minute)
+        # API 키 원문 대신 해시를 Redis 키에 사용
+        self._ids = {key: hashlib.sha256(key.encode("utf-8")).hexdigest()[:16] for key in keys}
+        self._redis_down_until = 0.0
+        self._snapshots: Dict[str, Dict[str, Any]] = {key: {} for key in keys}
+
+        # 통계
+        self.redis_errors = 0
+        self.fallback_calls = 0
+
+    def _redis_failed(self, error: Exception):
+        self.redis_errors += 1
+        self._redis_down_until = time.monotonic() + self.fallback_seconds
+        logger.warning(f"[KeyPool] Redis unavailable, using in-process state for {self.fallback_seconds}s: {error}")
+
+    async def _with_fallback(self, redis_op, local_op):
+        """Redis로 처리하고, 실패하면 fallback_seconds 동안 프로세스 내 상태 사용"""
+        client = get_redis() if time.monotonic() >= self._redis_down_until else None
+        if client is not None:
+            try:
+                return await redis_op(client)
+            except Exception as e:
+                self._redis_failed(e)
+        self.fallback_calls += 1
+        return await local_op()
+
+    def _bucket_args(self, key: str, mode: str, requests: float, tokens: float):
+        request_limit, token_limit = per_minute_limits(self.rate_limit, self.tokens_per_minute)
+        keys = [f"kpc:gemini:{self._ids[key]}:rpm"]
+        args = [mode, self.ttl, *request_limit, requests]
+        if self.tokens_per_minute > 0:
+            keys.append(f"kpc:gemini:{self._ids[key]}:tpm")
+            args += [*token_limit, tokens]
+        return keys, args
+
+    def _breaker_key(self, key: str) -> str:
+        return f"kpc:gemini:{self._ids[key]}:breaker"
+
+    async def _bucket(self, client, key: str, mode: str, requests: float, tokens: float) -> float:
+        keys, args = self._bucket_args(key, mode, requests, tokens)
+        result = await client.eval(_BUCKET_LUA, len(keys), *keys, *args)
+        snapshot = self._snapshots[key]
+        snapshot["available_requests"] = max(0, int(float(result[1])))
+        if len(result) > 2:
+            snapshot["available_tokens"] = max(0, int(float(result[2])))
+        return float(result[0])
+
+    async def _breaker_wait(self, client, key: str, mode: str) -> float:
+        wait, state = await client.eval(
+            _BREAKER_ACQUIRE_LUA, 1, self._breaker_key(key),
+            mode, settings.AI_REQUEST_TIMEOUT_SECONDS, self.ttl
+        )
+        self._snapshots[key].setdefault("breaker", {})["state"] = state
+        return float(wait)
+
+    async def _record(self, client, key: str, outcome: str, error: Optional[Exception] = None) -> bool:
+        state, opened = await client.eval(
+            _BREAKER_RECORD_LUA, 1, self._breaker_key(key),
+            outcome,
+            settings.GEMINI_BREAKER_FAILURE_THRESHOLD,
+            settings.GEMINI_BREAKER_COOLDOWN_SECONDS,
+            settings.GEMINI_BREAKER_MAX_COOLDOWN_SECONDS,
+            random.uniform(0.8, 1.2),
+            (parse_retry_after(error) or 0) if error is not None else 0,
+            self.ttl,
+            str(error)[:200] if error is not None else ""
+        )
+        self._snapshots[key].setdefault("breaker", {})["state"] = state
+        return int(opened) == 1
+
+    async def time_until_available(self, key: str, tokens: int = 0) -> float:
+        async def redis_op(client):
+            wait = await self._bucket(client, key, "peek", 1, tokens)
+            return max(wait, await self._breaker_wait(client, key, "peek"))
+        return await self._with_fallback(redis_op, lambda: self.local.time_until_available(key, tokens))
+
+    async def reserve(self, key: str, tokens: int = 0) -> float:
+        return await self._with_fallback(
+            lambda client: self._bucket(client, key, "reserve", 1, tokens),
+            lambda: self.local.reserve(key, tokens)
+        )
+
+    async def refund(self, key: str, requests: int, tokens: int):
+        await self._with_fallback(
+            lambda client: self._bucket(client, key, "refund", requests, tokens),
+            lambda: self.local.refund(key, requests, tokens)
+        )
+
+    async def acquire(self, key: str) -> bool:
+        async def redis_op(client):
+            return await self._breaker_wait(client, key, "acquire") <= 0
+        return await self._with_fallback(redis_op, lambda: self.local.acquire(key))
+
+    async def record_result(self, key: str, error: Optional[Exception]) -> bool:
+        failed = error is not None and is_key_failure(error)
+        return await self._with_fallback(
+            lambda client: self._record(client, key, "failure" if failed else "success", error if failed else None),
+            lambda: self.local.record_result(key, error)
+        )
+
+    async def release_probe(self, key: str):
+        await self._with_fallback(
+            lambda client: self._record(client, key, "release"),
+            lambda: self.local.release_probe(key)
+        )
+
+    async def refresh(self):
+        """상태 조회용 스냅샷 갱신 (관리자 상태 API 호출 시)"""
+        client = get_redis() if time.monotonic() >= self._redis_down_until else None
+        if client is None:
+            return
+        try:
+            for key in self._ids:
+                wait = await self._bucket(client, key, "peek", 1, 0)
+                breaker = await client.hgetall(self._breaker_key(key))
+                snapshot = self._snapshots[key]
+                snapshot["next_slot_ms"] = round(wait * 1000, 2)
+                snapshot["breaker"] = {
+                    "state": breaker.get("state", CLOSED),
+                    "consecutive_failures": int(breaker.get("failures", 0)),
+                    "trips": int(breaker.get("trips", 0)),
+                    "total_failures": int(breaker.get("total_failures", 0)),
+                    "total_opens": int(breaker.get("total_opens", 0)),
+                    "last_error": breaker.get("last_error") or None,
+                }
+        except Exception as e:
+            self._redis_failed(e)
+
+    def key_status(self, key: str) -> Dict[str, Any]:
+        if time.monotonic() < self._redis_down_until:
+            return dict(self.local.key_status(key), backend="local (redis fallback)")
+        return dict(self._snapshots[key], backend="redis")
+
+
+def create_key_pool_state(keys: List[str], rate_limit_per_minute: int, tokens_per_minute: int = 0):
+    """GEMINI_POOL_STATE_BACKEND 설정에 따라 키 상태 저장소 생성 (auto: REDIS_URL이 있으면 Redis)"""
+    backend = settings.GEMINI_POOL_STATE_BACKEND
+    if backend != "local" and get_redis() is not None:
+        return RedisKeyPoolState(keys, rate_limit_per_minute, tokens_per_minute)
+    if backend == "redis":
+        logger.warning("[KeyPool] GEMINI_POOL_STATE_BACKEND=redis but Redis is not configured, using in-process state")
+    return LocalKeyPoolState(keys, rate_limit_per_minute, tokens_per_minute)
@@ -0,0 +1,185 @@
+import asyncio
+import bisect
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+# 지연 시간 버킷 상한 (ms) - 마지막 버킷은 상한 없음
+LATENCY_BUCKETS_MS: Tuple[float, ...] = (
+    25, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 7500, 10000, 15000, 20000, 30000, 60000
+)
+# 보고할 슬라이딩 윈도우 (이름, 초)
+WINDOWS: Tuple[Tuple[str, int], ...] = (("1m", 60), ("5m", 300))
+QUANTILES: Tuple[Tuple[str, float], ...] = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+
+
+def classify_error(error: BaseException) -> str:
+    """오류 분류 (상태 화면 카운터용): rate_limited, server_error, timeout, client_error, other"""
+    name = type(error).__name__
+    message = str(error).lower()
+    code = getattr(error, "code", None)
+    if not isinstance(code, int):
+        code = None
+    if isinstance(error, asyncio.TimeoutError) or name in ("DeadlineExceeded", "TimeoutError", "ReadTimeout"):
+        return "timeout"
+    if code == 429 or name in ("ResourceExhausted", "TooManyRequests", "RateLimitError") \
+            or "429" in message or "quota" in message or "rate limit" in message:
+        return "rate_limited"
+    if (code is not None and 500 <= code < 600) or name in (
+        "InternalServerError", "ServiceUnavailable", "BadGateway", "GatewayTimeout"
+    ) or any(c in message for c in ("500", "502", "503", "504")):
+        return "server_error"
+    if "timed out" in message or "timeout" in message:
+        return "timeout"
+    if (code is not None and 400 <= code < 500) or name in ("InvalidArgument", "BadRequestError", "PermissionDenied"):
+        return "client_error"
+    return "other"
+
+
+class _Slot:
+    __slots__ = ("start", "counts", "total", "errors")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0.0  # 지연 시간 합 (초)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+
+class LatencyHistogram:
+    """
+    고정 버킷 지연 시간 히스토그램 (슬라이딩 윈도우)
+
+    slot_seconds 단위 슬롯의 링으로 최근 구간만 유지하며, 분위수는 해당 버킷 안에서
+    선형 보간하여 추정합니다. 누적 버킷 수는 별도로 유지합니다.
+    """
+
+    def __init__(self, slot_seconds: int = 10, window_seconds: int = 300):
+        self.slot_seconds = slot_seconds
+        self.slots: List[Optional[_Slot]] = [None] * max(1, window_seconds // slot_seconds)
+        self.lock = threading.Lock()
+        self.cumulative = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_count = 0
+        self.total_errors: Dict[str, int] = defaultdict(int)
+
+    def _slot(self, now: float) -> _Slot:
+        start = now - now % self.slot_seconds
+        index = int(start // self.slot_seconds) % len(self.slots)
+        slot = self.slots[index]
+        if slot is None or slot.start != start:
+            slot = self.slots[index] = _Slot(start)
+        return slot
+
+    def record(self, seconds: float, error: Optional[str] = None, now: Optional[float] = None):
+        """
+        Args:
+            seconds: 응답(또는 실패)까지 걸린 시간
+            error: 실패 시 classify_error 결과 (지연 시간은 성공/실패 모두 기록)
+        """
+        now = time.time() if now is None else now
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)
+        with self.lock:
+            slot = self._slot(now)
+            slot.counts[bucket] += 1
+            slot.total += seconds
+            self.cumulative[bucket] += 1
+            self.total_count += 1
+            if error:
+                slot.errors[error] += 1
+                self.total_errors[error] += 1
+
+    def _window(self, seconds: int, now: float) -> Tuple[List[int], float, Dict[str, int]]:
+        counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        total = 0.0
+        errors: Dict[str, int] = defaultdict(int)
+        oldest = now - seconds
+        for slot in self.slots:
+            # 슬롯 일부만 윈도우에 걸쳐도 포함 (최대 slot_seconds만큼 길게 집계)
+            if slot is None or slot.start + self.slot_seconds <= oldest or slot.start > now:
+                continue
+            for i, n in enumerate(slot.counts):
+                counts[i] += n
+            total += slot.total
+            for name, n in slot.errors.items():
+                errors[name] += n
+        return counts, total, errors
+
+    @staticmethod
+    def quantile(counts: List[int], q: float) -> Optional[float]:
+        """버킷 수로 추정한 분위수 (ms), 기록이 없으면 None"""
+        count = sum(counts)
+        if count == 0:
+            return None
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lower = LATENCY_BUCKETS_MS[i - 1] if i > 0 else 0.0
+                if i == len(LATENCY_BUCKETS_MS):
+                    # 상한 없는 버킷은 하한으로 보고
+                    return float(lower)
+                upper = LATENCY_BUCKETS_MS[i]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return float(LATENCY_BUCKETS_MS[-1])
+
+    def mean(self, seconds: int = 60, now: Optional[float] = None) -> Optional[float]:
+        """윈도우 평균 지연 시간 (초), 기록이 없으면 None"""
+        now = time.time() if now is None else now
+        with self.lock:
+            counts, total, _ = self._window(seconds, now)
+        count = sum(counts)
+        return total / count if count else None
+
+    def get_status(self, now: Optional[float] = None) -> Dict[str, Any]:
+        now = time.time() if now is None else now
+        with self.lock:
+            windows = {name: self._window(seconds, now) for name, seconds in WINDOWS}
+            cumulative = list(self.cumulative)
+            total_count = self.total_count
+            total_errors = dict(self.total_errors)
+
+        status: Dict[str, Any] = {"count": total_count, "errors": total_errors, "windows": {}}
+        for name, (counts, total, errors) in windows.items():
+            count = sum(counts)
+            window = {
+                "count": count,
+                "errors": dict(errors),
+                "error_rate": round(sum(errors.values()) / count, 4) if count else 0.0,
+                "mean_ms": round(total / count * 1000, 2) if count else None,
+            }
+            for label, q in QUANTILES:
+                value = self.quantile(counts, q)
+                window[f"{label}_ms"] = round(value, 2) if value is not None else None
+            status["windows"][name] = window
+        status["buckets_ms"] = {
+            (f"le_{int(bound)}" if i < len(LATENCY_BUCKETS_MS) else "inf"): n
+            for i, (bound, n) in enumerate(zip(list(LATENCY_BUCKETS_MS) + [float("inf")], cumulative))
+        }
+        return status
+
+
+class LatencyMetrics:
+    """이름(키/프로바이더)별 지연 시간 히스토그램 모음"""
+
+    def __init__(self, slot_seconds: int = 10, window_seconds: int = 300):
+        self.slot_seconds = slot_seconds
+        self.window_seconds = window_seconds
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, LatencyHistogram] = {}
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram(self.slot_seconds, self.window_seconds)
+            return histogram
+
+    def record(self, name: str, seconds: float, error: Optional[BaseException] = None):
+        self.histogram(name).record(seconds, classify_error(error) if error is not None else None)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self.lock:
+            names = list(self.histograms)
+        return {name: self.histogram(name).get_status() for name in names}
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class ProviderExecutor:
+    """
+    블로킹 프로바이더 SDK 호출 전용 스레드 풀
+
+    기본 executor(run_in_executor(None, ...))와 분리하여, AI 호출이 밀려도 DB 작업 등
+    다른 블로킹 작업이 지연되지 않도록 합니다. 크기는 키 풀의 동시 요청 한도에 맞춥니다.
+    """
+
+    def __init__(self, max_workers: int, name: str = "ai-provider"):
+        self.max_workers = max_workers
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.lock = threading.Lock()
+
+        # 통계
+        self.active = 0
+        self.pending = 0  # 스레드를 기다리는 호출
+        self.max_active = 0
+        self.max_pending = 0
+        self.total_calls = 0
+        self.total_saturated = 0  # 제출 시점에 모든 스레드가 사용 중이었던 호출
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        submitted_at = time.monotonic()
+        with self.lock:
+            self.total_calls += 1
+            if self.active + self.pending >= self.max_workers:
+                self.total_saturated += 1
+            self.pending += 1
+            self.max_pending = max(self.max_pending, self.pending)
+
+        def call():
+            wait = time.monotonic() - submitted_at
+            with self.lock:
+                self.pending -= 1
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            try:
+                return fn(*args)
+            finally:
+                with self.lock:
+                    self.active -= 1
+
+        future = self._executor.submit(call)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # 스레드에서 시작되기 전에 취소된 호출은 대기 수에서 제외
+            if future.cancelled():
+                with self.lock:
+                    self.pending -= 1
+            raise
+
+    def shutdown(self):
+        # 실행 중인 SDK 호출은 기다리지 않음 (종료 지연 방지)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "max_workers": self.max_workers,
+                "active": self.active,
+                "pending": self.pending,
+                "utilization": round(self.active / self.max_workers, 4) if self.max_workers else 0.0,
+                "max_active": self.max_active,
+                "max_pending": self.max_pending,
+                "total_calls": self.total_calls,
+                "total_saturated": self.total_saturated,
+                "avg_wait_ms": round(self.total_wait / self.total_calls * 1000, 2) if self.total_calls else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+            }
@@ -0,0 +1,602 @@
+"""
+Gemini 키 풀 스케줄링 시뮬레이터 (가상 시계)
+Run with: python simulate_key_pool.py --candidates 300 --requests 10
+          python simulate_key_pool.py --candidates 300 --variant "fast:rate_limit=30" --variant "narrow:concurrency=2"
+          python simulate_key_pool.py --trace ai_trace.jsonl --trace-scale 5 --find-keys --target-p99-wait 5
+
+실제 GeminiKeyPool과 LocalKeyPoolState(토큰 버킷, 서킷 브레이커)를 가상 시간 이벤트 루프 위에서
+실행합니다. 프로바이더는 지연 시간 분포와 키별 실제 분당 한도(초과 시 429)만 흉내 내고 기다리는
+동안 시계를 건너뛰므로, 한 시간짜리 시험도 몇 초 안에 재생됩니다.
+
+도착 트레이스:
+- 합성: 응시자마다 ramp-up 구간 안에서 시작해, 응답을 받으면 think-time(지수 분포)만큼 쉬고 다음 요청
+- 기록: JSONL 한 줄에 {"t": 초 또는 ISO 시각, "priority": "live"|"batch", "tokens": 예상 토큰}
+  (시각만 있는 줄도 허용). 예: psql에서
+  \\copy (SELECT json_build_object('t', timestamp) FROM kpc_ai_usage ORDER BY id) TO 'ai_trace.jsonl'
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import selectors
+import time
+from collections import Counter
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 설정 로드에 필요한 값 (시뮬레이터는 DB에 연결하지 않음)
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/simulation")
+
+from app.core.config import settings
+from app.services import ai_service as ai_service_module
+from app.services import ai_stub, circuit_breaker, key_pool_state, latency_metrics
+from app.services.ai_service import (
+    GeminiKeyPool, KeyPoolSaturatedError, PRIORITY_BATCH, PRIORITY_LIVE, PRIORITY_NAMES
+)
+from app.services.ai_stub import StubGeminiClient, StubResponse, parse_latency, stub_keys
+from app.services.circuit_breaker import backoff_delay, is_key_failure
+from app.services.key_pool_state import LocalKeyPoolState
+from app.services.latency_metrics import classify_error
+
+
+class VirtualClock:
+    """시뮬레이션 시계 (monotonic은 0부터, time은 고정된 시작 시각 기준)"""
+
+    def __init__(self, epoch: float = 1_700_000_000.0):
+        self.now = 0.0
+        self.epoch = epoch
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.epoch + self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class _ClockModule:
+    """각 모듈의 time 대신 넣는 대역 (시계 함수만 가상 시간, 나머지는 time 모듈 그대로)"""
+
+    def __init__(self, clock: VirtualClock):
+        self._clock = clock
+
+    def time(self) -> float:
+        return self._clock.time()
+
+    def monotonic(self) -> float:
+        return self._clock.monotonic()
+
+    def perf_counter(self) -> float:
+        return self._clock.monotonic()
+
+    def sleep(self, seconds: float):
+        raise RuntimeError("Blocking sleep inside the simulation")
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(time, name)
+
+
+# 키 풀 경로에서 시계를 읽는 모듈
+CLOCK_MODULES = (ai_service_module, key_pool_state, circuit_breaker, latency_metrics, ai_stub)
+
+
+@contextlib.contextmanager
+def virtual_time(clock: VirtualClock):
+    originals = [(module, module.time) for module in CLOCK_MODULES]
+    fake = _ClockModule(clock)
+    for module, _ in originals:
+        module.time = fake
+    try:
+        yield
+    finally:
+        for module, original in originals:
+            module.time = original
+
+
+class _VirtualSelector:
+    """
+    준비된 I/O가 없으면 잠들지 않고 다음 타이머 시점까지 가상 시계를 옮기는 selector
+
+    실제 시계처럼 루프가 한 바퀴 돌 때마다 TICK만큼은 흐르게 합니다 (토큰 버킷이 1e-15초 같은
+    대기를 돌려줄 때 같은 시각에서 영원히 다시 확인하는 것을 방지).
+    """
+
+    TICK = 1e-6
+
+    def __init__(self, clock: VirtualClock):
+        self._clock = clock
+        self._selector = selectors.DefaultSelector()
+
+    def select(self, timeout: Optional[float] = None):
+        events = self._selector.select(0)
+        if events:
+            return events
+        if timeout is None:
+            # 예약된 타이머도 준비된 콜백도 없음 - 스레드를 쓰지 않으므로 영원히 깨어나지 않음
+            raise RuntimeError("Simulation stalled: nothing is scheduled")
+        self._clock.advance(max(timeout, self.TICK))
+        return events
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._selector, name)
+
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    """asyncio.sleep/타이머가 가상 시계로 동작하는 이벤트 루프"""
+
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        super().__init__(selector=_VirtualSelector(clock))
+
+    def time(self) -> float:
+        return self.clock.monotonic()
+
+
+class SimulatedGeminiClient(StubGeminiClient):
+    """지연 시간을 기다리지 않고 응답에 담아 반환 (SimulatedExecutor가 가상 시간으로 대기)"""
+
+    def generate_content(self, contents: Any, generation_config: Optional[Dict[str, Any]] = None,
+                         stream: bool = False):
+        response = StubResponse("")
+        response.delay = self._admit()
+        return response
+
+
+class SimulatedExecutor:
+    """ProviderExecutor 대역: 스레드 없이 호출 결과의 지연 시간만큼 가상 시간으로 대기"""
+
+    def __init__(self, error_latency: float):
+        self.error_latency = error_latency
+        self.active = 0
+        self.max_active = 0
+        self.total_calls = 0
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        self.total_calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            try:
+                result = fn(*args)
+            except Exception:
+                # 429 등은 짧은 왕복 시간 뒤에 실패
+                await asyncio.sleep(self.error_latency)
+                raise
+            await asyncio.sleep(getattr(result, "delay", 0.0))
+            return result
+        finally:
+            self.active -= 1
+
+    def get_status(self) -> Dict[str, Any]:
+        return {"max_active": self.max_active, "total_calls": self.total_calls}
+
+    def shutdown(self):
+        pass
+
+
+@dataclass
+class Policy:
+    """키 풀 정책 (비교할 변형마다 하나)"""
+    name: str
+    keys: int
+    rate_limit: int  # 풀이 지키는 키별 분당 요청 수
+    concurrency: int  # 키당 워커 수 (max_concurrent_per_key)
+    queue_size: int
+    provider_rpm: int  # 프로바이더의 실제 키별 분당 한도 (0이면 없음)
+    tpm: int = 0
+    error_rate: float = 0.0  # 무작위 429 비율
+
+    def describe(self) -> str:
+        return (f"keys={self.keys} rate_limit={self.rate_limit}/min concurrency={self.concurrency}"
+                f" queue={self.queue_size} provider_rpm={self.provider_rpm or '-'}"
+                + (f" tpm={self.tpm}" if self.tpm else "")
+                + (f" error_rate={self.error_rate}" if self.error_rate else ""))
+
+
+POLICY_FIELDS: Dict[str, Callable[[str], Any]] = {
+    "keys": int,
+    "rate_limit": int,
+    "concurrency": int,
+    "queue_size": int,
+    "provider_rpm": int,
+    "tpm": int,
+    "error_rate": float,
+}
+
+
+def parse_policy(spec: str, base: Policy) -> Policy:
+    """"이름:keys=5,rate_limit=30" → base에서 지정한 값만 바꾼 정책"""
+    name, _, assignments = spec.partition(":")
+    if not assignments and "=" in name:
+        name, assignments = spec, spec
+    changes: Dict[str, Any] = {"name": name.strip()}
+    for item in assignments.split(","):
+        if not item.strip():
+            continue
+        field_name, _, value = item.partition("=")
+        field_name = field_name.strip()
+        if field_name not in POLICY_FIELDS:
+            raise ValueError(f"Unknown policy field: {field_name} (use {', '.join(POLICY_FIELDS)})")
+        changes[field_name] = POLICY_FIELDS[field_name](value.strip())
+    return replace(base, **changes)
+
+
+@dataclass
+class Arrival:
+    at: float  # 트레이스 시작 기준 초
+    priority: int = PRIORITY_LIVE
+    tokens: int = 0
+
+
+def _parse_time(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+def _parse_priority(value: Any) -> int:
+    if isinstance(value, int):
+        return value
+    names = {name: priority for priority, name in PRIORITY_NAMES.items()}
+    return names.get(str(value).lower(), PRIORITY_LIVE)
+
+
+def load_trace(path: str, default_tokens: int) -> List[Arrival]:
+    """기록된 도착 트레이스 (JSONL 또는 줄마다 시각) - 첫 도착이 0초가 되도록 맞춤"""
+    arrivals: List[Arrival] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                arrivals.append(Arrival(
+                    _parse_time(record["t"]),
+                    _parse_priority(record.get("priority", PRIORITY_LIVE)),
+                    int(record.get("tokens") or default_tokens)
+                ))
+            else:
+                arrivals.append(Arrival(_parse_time(line.split(",")[0].strip().strip('"')), tokens=default_tokens))
+    if not arrivals:
+        return arrivals
+    start = min(a.at for a in arrivals)
+    return sorted((replace(a, at=a.at - start) for a in arrivals), key=lambda a: a.at)
+
+
+def scale_trace(arrivals: List[Arrival], factor: float, rng: random.Random, jitter: float = 1.0) -> List[Arrival]:
+    """응시자 수를 factor배로 늘린 트레이스 (도착마다 복제, 복제본은 jitter초 안에서 흩뜨림)"""
+    if factor == 1:
+        return arrivals
+    scaled: List[Arrival] = []
+    for arrival in arrivals:
+        copies = int(factor) + (1 if rng.random() < factor % 1 else 0)
+        for i in range(copies):
+            scaled.append(arrival if i == 0 else replace(arrival, at=arrival.at + rng.uniform(0, jitter)))
+    return sorted(scaled, key=lambda a: a.at)
+
+
+@dataclass
+class SimulationResult:
+    policy: Policy
+    requests: int = 0
+    completed: int = 0
+    rejected: int = 0  # 큐 포화 (실시간 요청은 503)
+    failed: int = 0  # 재시도 후에도 실패
+    retried: int = 0  # 429/5xx 후 재시도한 횟수
+    batch_requeued: int = 0  # 큐 포화로 다시 넣은 배치 요청
+    provider_429: int = 0  # 프로바이더 한도 초과/주입 429
+    errors: Counter = field(default_factory=Counter)
+    waits: List[float] = field(default_factory=list)  # 도착 → 성공한 호출 시작 (큐/한도/백오프 대기)
+    latencies: List[float] = field(default_factory=list)  # 도착 → 응답
+    queue_waits: List[float] = field(default_factory=list)  # 시도별 큐 대기
+    key_calls: List[int] = field(default_factory=list)
+    throttle_wait: float = 0.0
+    max_active: int = 0
+    virtual_duration: float = 0.0
+    wall_duration: float = 0.0
+
+    @property
+    def lost(self) -> int:
+        return self.rejected + self.failed
+
+    @property
+    def loss_rate(self) -> float:
+        return self.lost / self.requests if self.requests else 0.0
+
+
+class KeyPoolSimulation:
+    """정책 하나로 트레이스를 재생"""
+
+    def __init__(self, policy: Policy, latency: str, error_latency: float, seed: int = 0, verbose: bool = False):
+        self.policy = policy
+        self.latency = parse_latency(latency)
+        self.error_latency = error_latency
+        self.seed = seed
+        self.verbose = verbose
+
+    def _create_pool(self) -> GeminiKeyPool:
+        policy = self.policy
+        keys = stub_keys(policy.keys)
+
+        def factory(key: str) -> SimulatedGeminiClient:
+            index = keys.index(key)
+            return SimulatedGeminiClient(
+                key, self.latency, error_rate=policy.error_rate, rpm_limit=policy.provider_rpm,
+                seed=self.seed * 1000 + index
+            )
+
+        return GeminiKeyPool(
+            keys, policy.rate_limit,
+            client_factory=factory,
+            tokens_per_minute=policy.tpm,
+            state=LocalKeyPoolState(keys, policy.rate_limit, policy.tpm),
+            max_concurrent_per_key=policy.concurrency,
+            queue_max_size=policy.queue_size,
+            executor=SimulatedExecutor(self.error_latency)
+        )
+
+    async def _request(self, pool: GeminiKeyPool, result: SimulationResult,
+                       priority: int = PRIORITY_LIVE, tokens: int = 0):
+        """AIService.gemini와 같은 규칙으로 요청 하나 처리 (429/5xx는 백오프 후 재시도)"""
+        loop = asyncio.get_running_loop()
+        arrived = loop.time()
+        result.requests += 1
+        max_retries = len(pool.keys)
+        attempt = 0
+        while True:
+            submitted = loop.time()
+            started: List[float] = []
+
+            def call(client):
+                started.append(loop.time())
+                return client.generate_content("")
+
+            try:
+                await pool.submit(call, priority, tokens=tokens)
+            except KeyPoolSaturatedError as e:
+                if priority == PRIORITY_BATCH:
+                    # 배치 항목은 큐가 비워질 때까지 기다렸다가 다시 넣음 (AIService._batch_item)
+                    result.batch_requeued += 1
+                    await asyncio.sleep(e.retry_after)
+                    continue
+                result.rejected += 1
+                return
+            except Exception as e:
+                if started:
+                    result.queue_waits.append(started[0] - submitted)
+                if is_key_failure(e) and attempt + 1 < max_retries:
+                    result.retried += 1
+                    await asyncio.sleep(backoff_delay(
+                        attempt, settings.GEMINI_RETRY_BACKOFF_SECONDS, settings.GEMINI_RETRY_MAX_BACKOFF_SECONDS
+                    ))
+                    attempt += 1
+                    continue
+                result.failed += 1
+                result.errors[classify_error(e)] += 1
+                pool.record_completion(loop.time() - arrived, success=False, error=e)
+                return
+
+            now = loop.time()
+            result.queue_waits.append(started[0] - submitted)
+            result.waits.append(started[0] - arrived)
+            result.latencies.append(now - arrived)
+            result.completed += 1
+            pool.record_completion(now - arrived, success=True)
+            return
+
+    def _run(self, drive: Callable[[GeminiKeyPool, SimulationResult], Any]) -> SimulationResult:
+        clock = VirtualClock()
+        loop = VirtualTimeEventLoop(clock)
+        result = SimulationResult(self.policy)
+        # 재시도 백오프 지터도 재현 가능하도록
+        random.seed(self.seed)
+
+        async def main():
+            pool = self._create_pool()
+            try:
+                await drive(pool, result)
+            finally:
+                await pool.stop_workers()
+            result.throttle_wait = pool.total_throttle_wait
+            result.max_active = pool.executor.max_active
+            clients = [pool.clients.get(key) for key in pool.keys]
+            result.key_calls = [client.calls if client else 0 for client in clients]
+            result.provider_429 = sum(c.over_limit_429 + c.injected_429 for c in clients if c)
+
+        started = time.perf_counter()
+        # 키 풀 초기화/브레이커 로그는 --verbose에서만 출력
+        output = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+        try:
+            with virtual_time(clock), output:
+                loop.run_until_complete(main())
+        finally:
+            loop.close()
+        result.virtual_duration = clock.now
+        result.wall_duration = time.perf_counter() - started
+        return result
+
+    def run_trace(self, arrivals: List[Arrival]) -> SimulationResult:
+        """기록된 도착 시각대로 요청을 넣음 (응답을 기다리지 않는 개방형 재생)"""
+        async def drive(pool: GeminiKeyPool, result: SimulationResult):
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            tasks = []
+            for arrival in arrivals:
+                delay = start + arrival.at - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(self._request(pool, result, arrival.priority, arrival.tokens)))
+            await asyncio.gather(*tasks)
+
+        return self._run(drive)
+
+    def run_cohort(self, candidates: int, requests: int, ramp_up: float, think_time: float,
+                   tokens: int = 0) -> SimulationResult:
+        """합성 응시자 집단 (응답을 받은 뒤 다음 요청을 보내는 폐쇄형 부하)"""
+        async def candidate(pool: GeminiKeyPool, result: SimulationResult, index: int):
+            rng = random.Random(f"{self.seed}-{index}")
+            await asyncio.sleep(rng.uniform(0, ramp_up))
+            for i in range(requests):
+                await self._request(pool, result, tokens=tokens)
+                if think_time > 0 and i + 1 < requests:
+                    await asyncio.sleep(rng.expovariate(1 / think_time))
+
+        async def drive(pool: GeminiKeyPool, result: SimulationResult):
+            await asyncio.gather(*[candidate(pool, result, i) for i in range(candidates)])
+
+        return self._run(drive)
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def fmt_s(seconds: Optional[float]) -> str:
+    return f"{seconds:8.2f}s" if seconds is not None else "        -"
+
+
+def meets_target(result: SimulationResult, target_p99_wait: float, max_loss_rate: float) -> bool:
+    p99 = percentile(result.waits, 0.99) or 0.0
+    return result.loss_rate <= max_loss_rate and p99 <= target_p99_wait
+
+
+def find_keys(base: Policy, run: Callable[[Policy], SimulationResult], max_keys: int,
+              target_p99_wait: float, max_loss_rate: float) -> Tuple[Optional[int], Dict[int, SimulationResult]]:
+    """목표(p99 대기, 유실률)를 만족하는 최소 키 수 - 키 수에 대해 단조라고 보고 이분 탐색"""
+    results: Dict[int, SimulationResult] = {}
+
+    def ok(keys: int) -> bool:
+        results[keys] = run(replace(base, name=f"{base.name}/keys={keys}", keys=keys))
+        return meets_target(results[keys], target_p99_wait, max_loss_rate)
+
+    if not ok(max_keys):
+        return None, results
+    low, high = 1, max_keys
+    while low < high:
+        middle = (low + high) // 2
+        if ok(middle):
+            high = middle
+        else:
+            low = middle + 1
+    return low, results
+
+
+def report(results: List[SimulationResult]):
+    print(f"{'policy':<24} {'requests':>8} {'done':>7} {'503':>6} {'failed':>6} {'429':>6} {'retried':>7}"
+          f" {'wait p50':>9} {'wait p90':>9} {'wait p99':>9} {'wait max':>9} {'lat p99':>9} {'req/min':>8}")
+    for r in results:
+        per_minute = r.completed / r.virtual_duration * 60 if r.virtual_duration else 0.0
+        print(f"{r.policy.name[:24]:<24} {r.requests:>8} {r.completed:>7} {r.rejected:>6} {r.failed:>6}"
+              f" {r.provider_429:>6} {r.retried:>7}"
+              f" {fmt_s(percentile(r.waits, 0.5))} {fmt_s(percentile(r.waits, 0.9))}"
+              f" {fmt_s(percentile(r.waits, 0.99))} {fmt_s(max(r.waits) if r.waits else None)}"
+              f" {fmt_s(percentile(r.latencies, 0.99))} {per_minute:8.1f}")
+    print()
+    for r in results:
+        capacity = r.policy.keys * r.policy.rate_limit
+        calls = r.key_calls or [0]
+        print(f"{r.policy.name}: {r.policy.describe()}")
+        print(f"  capacity {capacity}/min, key calls min {min(calls)} / max {max(calls)},"
+              f" queue wait p99 {fmt_s(percentile(r.queue_waits, 0.99)).strip()},"
+              f" throttle {r.throttle_wait:.1f}s, max in flight {r.max_active}"
+              + (f", batch requeued {r.batch_requeued}" if r.batch_requeued else "")
+              + (f", errors {dict(r.errors)}" if r.errors else ""))
+        print(f"  simulated {r.virtual_duration:.0f}s in {r.wall_duration:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gemini key pool scheduling simulator")
+    parser.add_argument("--trace", default=None, help="기록된 도착 트레이스 (JSONL), 비우면 합성 응시자 부하")
+    parser.add_argument("--trace-scale", type=float, default=1.0, help="트레이스 응시자 수 배율 (예: 200명 기록 → 1000명은 5)")
+    parser.add_argument("--candidates", type=int, default=100, help="합성 부하 응시자 수")
+    parser.add_argument("--requests", type=int, default=10, help="응시자별 AI 요청 수")
+    parser.add_argument("--ramp-up", type=float, default=60.0, help="응시자 시작 시점 분산 구간 (초)")
+    parser.add_argument("--think-time", type=float, default=30.0, help="요청 사이 평균 대기 시간 (초, 지수 분포)")
+    parser.add_argument("--tokens", type=int, default=600, help="요청당 예상 토큰 수 (--tpm 사용 시)")
+    parser.add_argument("--keys", type=int, default=None, help="키 수 (기본: GEMINI_API_KEYS 개수 또는 AI_STUB_KEYS)")
+    parser.add_argument("--rate-limit", type=int, default=settings.GEMINI_RATE_LIMIT_PER_KEY)
+    parser.add_argument("--concurrency", type=int, default=5, help="키당 워커 수")
+    parser.add_argument("--queue-size", type=int, default=settings.GEMINI_QUEUE_MAX_SIZE)
+    parser.add_argument("--provider-rpm", type=int, default=None,
+                        help="프로바이더의 실제 키별 분당 한도 (기본: GEMINI_RATE_LIMIT_PER_KEY, 0이면 없음)")
+    parser.add_argument("--tpm", type=int, default=settings.GEMINI_TOKENS_PER_MINUTE_PER_KEY)
+    parser.add_argument("--error-rate", type=float, default=settings.AI_STUB_429_RATE, help="무작위 429 비율")
+    parser.add_argument("--latency", default=settings.AI_STUB_LATENCY, help="프로바이더 지연 시간 분포 (AI_STUB_LATENCY 형식)")
+    parser.add_argument("--error-latency", type=float, default=0.2, help="429 응답까지 걸리는 시간 (초)")
+    parser.add_argument("--variant", action="append", default=[],
+                        help='비교할 정책 (예: "fast:rate_limit=30,concurrency=3"), 여러 번 지정 가능')
+    parser.add_argument("--find-keys", action="store_true", help="목표를 만족하는 최소 키 수 탐색")
+    parser.add_argument("--max-keys", type=int, default=50)
+    parser.add_argument("--target-p99-wait", type=float, default=5.0, help="대기 시간 p99 목표 (초)")
+    parser.add_argument("--max-loss-rate", type=float, default=0.0, help="허용하는 503/실패 비율")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="키 풀 로그 출력")
+    args = parser.parse_args()
+
+    keys = args.keys
+    if keys is None:
+        configured = [k.strip() for k in settings.GEMINI_API_KEYS.split(",") if k.strip()]
+        keys = len(configured) or settings.AI_STUB_KEYS
+    base = Policy(
+        name="base",
+        keys=keys,
+        rate_limit=args.rate_limit,
+        concurrency=args.concurrency,
+        queue_size=args.queue_size,
+        provider_rpm=args.provider_rpm if args.provider_rpm is not None else settings.GEMINI_RATE_LIMIT_PER_KEY,
+        tpm=args.tpm,
+        error_rate=args.error_rate
+    )
+    policies = [base] + [parse_policy(spec, base) for spec in args.variant]
+
+    if args.trace:
+        arrivals = scale_trace(load_trace(args.trace, args.tokens), args.trace_scale, random.Random(args.seed))
+        span = arrivals[-1].at if arrivals else 0.0
+        workload = f"trace {args.trace} x{args.trace_scale} ({len(arrivals)} requests over {span:.0f}s)"
+    else:
+        arrivals = None
+        workload = (f"{args.candidates} candidates x {args.requests} requests"
+                    f" (ramp-up {args.ramp_up:.0f}s, think time {args.think_time:.0f}s)")
+
+    def run(policy: Policy) -> SimulationResult:
+        simulation = KeyPoolSimulation(policy, args.latency, args.error_latency, args.seed, args.verbose)
+        if arrivals is not None:
+            return simulation.run_trace(arrivals)
+        return simulation.run_cohort(args.candidates, args.requests, args.ramp_up, args.think_time, args.tokens)
+
+    print("=" * 60)
+    print(f"Key Pool Simulation - {workload}")
+    print(f"Provider latency {args.latency}")
+    print("=" * 60)
+
+    if not args.find_keys:
+        report([run(policy) for policy in policies])
+        return
+
+    for policy in policies:
+        needed, results = find_keys(policy, run, args.max_keys, args.target_p99_wait, args.max_loss_rate)
+        report([results[k] for k in sorted(results)])
+        if needed is None:
+            print(f"=> {policy.name}: target (wait p99 <= {args.target_p99_wait}s, loss <= {args.max_loss_rate:.1%})"
+                  f" not met with {args.max_keys} keys")
+        else:
+            print(f"=> {policy.name}: {needed} key(s) needed for wait p99 <= {args.target_p99_wait}s,"
+                  f" loss <= {args.max_loss_rate:.1%}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import os
+
+# 설정 로드에 필요한 값 (테스트는 DB/외부 API에 연결하지 않음)
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/test")
+os.environ.setdefault("AI_STUB_ENABLED", "false")
+os.environ.setdefault("REDIS_URL", "")
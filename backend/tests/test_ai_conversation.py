@@ -0,0 +1,66 @@
+"""
+여러 인스턴스가 같은 대화를 이어갈 때 캐시된 세션이 최신 기록을 반영하는지 확인
+Run with: pytest tests/test_ai_conversation.py
+"""
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import AIUsage
+from app.services.ai_conversation import ConversationStore
+
+KEY = (1, 2, "chat")
+
+
+def _database():
+    engine = create_engine("sqlite://")
+    AIUsage.__table__.create(engine)
+    return sessionmaker(bind=engine)()
+
+
+def _store() -> ConversationStore:
+    return ConversationStore(max_sessions=10, max_turns=10, max_context_tokens=100000, summary_chars=200)
+
+
+def _write_usage(db, prompt: str, response: str):
+    """지연 저장 작업이 사용 기록을 저장한 상태"""
+    db.add(AIUsage(exam_id=KEY[0], question_id=KEY[1], tool_type=KEY[2], prompt=prompt, response=response))
+    db.commit()
+
+
+def _prompts(store: ConversationStore, db):
+    return [m["content"] for m in store.history(db, KEY) if m["role"] == "user"]
+
+
+def test_cached_session_picks_up_turns_from_other_instance():
+    db = _database()
+    instance_a, instance_b = _store(), _store()
+    _write_usage(db, "q1", "a1")
+    assert _prompts(instance_a, db) == ["q1"]
+
+    # 다음 턴은 다른 인스턴스가 처리
+    assert _prompts(instance_b, db) == ["q1"]
+    instance_b.append(KEY, "q2", "a2")
+    _write_usage(db, "q2", "a2")
+
+    assert _prompts(instance_a, db) == ["q1", "q2"]
+    assert instance_a.get_status()["rebuilds"] == 2
+    # 변경이 없으면 다시 복원하지 않음
+    assert _prompts(instance_a, db) == ["q1", "q2"]
+    assert instance_a.get_status()["hits"] == 1
+
+
+def test_unsaved_local_turn_survives_rebuild():
+    db = _database()
+    store = _store()
+    _write_usage(db, "q1", "a1")
+    assert _prompts(store, db) == ["q1"]
+
+    # 로컬 턴이 아직 저장되지 않은 사이 다른 인스턴스의 턴이 먼저 저장됨
+    store.append(KEY, "q2", "a2")
+    _write_usage(db, "q3", "a3")
+    assert _prompts(store, db) == ["q1", "q3", "q2"]
+
+    # 로컬 턴이 저장되면 중복 없이 DB 기록 순서로 복원
+    _write_usage(db, "q2", "a2")
+    assert _prompts(store, db) == ["q1", "q3", "q2"]
+    assert store._sessions[KEY].pending == []
@@ -0,0 +1,59 @@
+"""
+Redis 한도 카운터가 테이블 반영에 실패하면 슬롯을 반환하는지 확인 (fakeredis 사용)
+Run with: pytest tests/test_ai_quota.py
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.services import ai_quota as ai_quota_module
+from app.services.ai_quota import AIQuotaCounter
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+
+class WriteFailingSession:
+    """시험 소유자는 1번 사용자이고, 쓰기 문장은 모두 실패하는 가짜 세션"""
+
+    def query(self, *entities):
+        return self
+
+    def filter(self, *criteria):
+        return self
+
+    def first(self):
+        return SimpleNamespace(user_id=1, used=0)
+
+    def execute(self, statement, params=None):
+        raise ConnectionError("database unavailable")
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_default_backend_is_database(monkeypatch):
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(ai_quota_module, "get_redis", lambda: client)
+
+    assert settings.AI_QUOTA_BACKEND == "database"
+    assert AIQuotaCounter(10).backend == "database"
+
+
+def test_failed_write_through_refunds_redis_slot(monkeypatch):
+    monkeypatch.setattr(settings, "AI_QUOTA_BACKEND", "redis")
+    quota = AIQuotaCounter(10)
+
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        monkeypatch.setattr(ai_quota_module, "get_redis", lambda: client)
+        with pytest.raises(ConnectionError):
+            await quota.reserve(WriteFailingSession(), 1, 7, 3)
+        return await client.get(quota._redis_key(7, 3))
+
+    assert asyncio.run(scenario()) == "0"
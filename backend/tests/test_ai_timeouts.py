@@ -0,0 +1,65 @@
+"""
+프로바이더 호출이 이벤트 루프를 막지 않는지 확인
+Run with: pytest tests/test_ai_timeouts.py
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.ai_service import AIService
+
+
+class SlowCompletions:
+    """응답하지 않는 OpenAI 스텁 (취소되었는지 기록)"""
+
+    def __init__(self):
+        self.cancelled = False
+
+    async def create(self, **kwargs):
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+class FastMessages:
+    """바로 응답하는 Anthropic 스텁"""
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(
+            content=[SimpleNamespace(text="fast answer")],
+            usage=SimpleNamespace(input_tokens=3, output_tokens=2),
+            model="stub-claude"
+        )
+
+
+@pytest.fixture
+def service():
+    service = AIService()
+    service.request_timeout = 0.3
+    service.slow = SlowCompletions()
+    service.openai_client = SimpleNamespace(chat=SimpleNamespace(completions=service.slow))
+    service.anthropic_client = SimpleNamespace(messages=FastMessages())
+    return service
+
+
+def test_slow_provider_does_not_block_other_requests(service):
+    async def scenario():
+        slow = asyncio.create_task(service.chat_gpt("slow question"))
+        await asyncio.sleep(0)
+
+        # 느린 호출이 진행 중이어도 다른 요청은 바로 처리됨
+        fast = await service.claude("fast question")
+        assert fast["response"] == "fast answer"
+        assert fast["tokens_used"] == 5
+        assert not slow.done()
+
+        # 느린 호출은 타임아웃으로 실패하고, 진행 중이던 SDK 요청도 취소됨
+        with pytest.raises(Exception, match="timed out"):
+            await slow
+        assert service.slow.cancelled
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=5))
@@ -0,0 +1,137 @@
+"""
+사용 기록 저장 실패 시 이벤트 루프를 막지 않고 기록을 보관하는지 확인
+Run with: pytest tests/test_ai_usage_writer.py
+"""
+import asyncio
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from app.services.ai_usage_writer import AIUsageWriter
+
+
+class FakeDatabase:
+    """
+    failing이면 모든 실행이 실패하고 (연결 오류), 커밋된 사용 기록 행을 모아두는 가짜 DB
+
+    bad_question_ids의 문항 기록이 포함된 INSERT는 외래 키 위반으로 실패합니다.
+    """
+
+    def __init__(self, failing: bool = True, bad_question_ids=()):
+        self.failing = failing
+        self.bad_question_ids = set(bad_question_ids)
+        self.rows = []
+
+    def session(self):
+        return FakeSession(self)
+
+
+class FakeSession:
+    def __init__(self, database: FakeDatabase):
+        self.database = database
+        self.pending = []
+
+    def execute(self, statement, params=None):
+        if self.database.failing:
+            raise ConnectionError("database unavailable")
+        rows = [p for p in params or [] if "exam_id" in p]
+        if any(row["question_id"] in self.database.bad_question_ids for row in rows):
+            raise IntegrityError("INSERT INTO kpc_ai_usage", rows, Exception("violates foreign key constraint"))
+        self.pending.extend(rows)
+
+    def commit(self):
+        self.database.rows.extend(self.pending)
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+def _record(writer: AIUsageWriter, question_id: int):
+    writer.record(1, question_id, "chat", f"question {question_id}", f"answer {question_id}", 10,
+                  charge_budget=False)
+
+
+async def _wait_for(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_fallback_write_does_not_block_event_loop():
+    database = FakeDatabase()
+    writer = AIUsageWriter(session_factory=database.session, max_attempts=3)
+
+    async def scenario():
+        # 작업이 시작되지 않은 상태 - 재시도 대기(0.1 + 0.2초)는 스레드 풀에서
+        started = time.monotonic()
+        _record(writer, 1)
+        elapsed = time.monotonic() - started
+        await writer.stop()
+        return elapsed
+
+    elapsed = asyncio.run(scenario())
+
+    assert elapsed < 0.05
+    assert writer.get_status()["dead_letters"] == 1
+    assert writer.total_dropped == 0
+
+
+def test_dead_letters_are_bounded():
+    writer = AIUsageWriter(session_factory=FakeDatabase().session, max_attempts=1, max_dead_letters=2)
+    for question_id in range(3):
+        _record(writer, question_id)
+
+    status = writer.get_status()
+    assert status["dead_letters"] == 2
+    assert status["total_dead_lettered"] == 3
+    assert status["total_dropped"] == 1
+
+
+def test_dead_letters_are_written_after_recovery():
+    database = FakeDatabase()
+    writer = AIUsageWriter(session_factory=database.session, flush_interval=0.01, max_attempts=1)
+
+    async def scenario():
+        await writer.start()
+        try:
+            _record(writer, 1)
+            await _wait_for(lambda: writer.get_status()["dead_letters"] == 1)
+            database.failing = False
+            _record(writer, 2)
+            await _wait_for(lambda: writer.total_written == 2)
+        finally:
+            await writer.stop()
+
+    asyncio.run(scenario())
+
+    assert sorted(row["question_id"] for row in database.rows) == [1, 2]
+    assert writer.get_status()["dead_letters"] == 0
+
+
+def test_bad_row_is_dropped_without_holding_back_the_batch():
+    database = FakeDatabase(failing=False, bad_question_ids={999})
+    writer = AIUsageWriter(session_factory=database.session, flush_interval=0.01)
+
+    async def scenario():
+        await writer.start()
+        try:
+            for round_ in range(3):
+                for question_id in range(round_ * 5, round_ * 5 + 5):
+                    _record(writer, question_id)
+                if round_ == 0:
+                    _record(writer, 999)
+                await _wait_for(lambda: writer.total_written == round_ * 5 + 5)
+        finally:
+            await writer.stop()
+
+    asyncio.run(scenario())
+
+    assert sorted(row["question_id"] for row in database.rows) == list(range(15))
+    status = writer.get_status()
+    assert status["total_rejected"] == 1
+    assert status["dead_letters"] == 0
+    assert status["total_failed_batches"] == 0
@@ -0,0 +1,75 @@
+"""
+다른 인스턴스에서 바뀐 시험 상태를 채널이 DB 기준으로 반영하는지 확인
+Run with: pytest tests/test_exam_channel.py
+"""
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Answer, Exam
+from app.models.exam import ExamStatus
+from app.services import exam_channel as exam_channel_module
+from app.services.exam_channel import ExamChannelHub
+from app.services.exam_timer import utcnow
+
+
+def _database(monkeypatch):
+    # 답안 저장/스냅샷 갱신은 스레드 풀에서 실행되므로 연결 하나를 공유
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Exam.__table__.create(engine)
+    Answer.__table__.create(engine)
+    session_factory = sessionmaker(bind=engine, expire_on_commit=False)
+    monkeypatch.setattr(exam_channel_module, "SessionLocal", session_factory)
+    db = session_factory()
+    exam = Exam(user_id=1, status=ExamStatus.IN_PROGRESS, start_time=utcnow(), extension_seconds=0, paused_seconds=0)
+    db.add(exam)
+    db.commit()
+    return db, exam
+
+
+def _submit_elsewhere(db, exam):
+    """다른 인스턴스가 시험을 제출한 상태"""
+    exam.status = ExamStatus.SUBMITTED
+    db.commit()
+
+
+def _drain(conn):
+    messages = []
+    while not conn.queue.empty():
+        messages.append(conn.queue.get_nowait())
+    return messages
+
+
+def test_save_is_rejected_when_exam_was_submitted_elsewhere(monkeypatch):
+    db, exam = _database(monkeypatch)
+    hub = ExamChannelHub()
+    conn = hub.connect(exam, exam.user_id, "websocket")
+    _submit_elsewhere(db, exam)
+
+    # 메모리 스냅샷은 아직 진행 중이지만 DB 상태로 거부
+    message = {"type": "save_answer", "client_msg_id": "m1", "question_id": 1, "answer_data": {"text": "late"}}
+    asyncio.run(hub.handle_client_message(conn, message))
+
+    reply = _drain(conn)[-1]
+    assert reply["type"] == "save_error"
+    assert reply["detail"] == "Exam is not in progress"
+    assert db.query(Answer).count() == 0
+
+
+def test_refresh_picks_up_changes_from_other_instance(monkeypatch):
+    db, exam = _database(monkeypatch)
+    hub = ExamChannelHub()
+    conn = hub.connect(exam, exam.user_id, "websocket")
+    _drain(conn)
+
+    exam.paused_at = utcnow()
+    db.commit()
+    asyncio.run(hub.refresh_exams())
+    assert hub.timer_message(exam.id)["is_paused"] is True
+
+    _submit_elsewhere(db, exam)
+    asyncio.run(hub.refresh_exams())
+    assert hub.exams[exam.id].status == "submitted"
+    assert [m["type"] for m in _drain(conn)] == ["exam_submitted"]
@@ -0,0 +1,211 @@
+"""
+Gemini 키 풀이 요청마다 해당 키 전용 클라이언트를 쓰는지 확인
+Run with: pytest tests/test_gemini_key_pool.py
+"""
+import asyncio
+import threading
+import time
+from collections import Counter, defaultdict
+
+import pytest
+
+from app.services.ai_service import AIService, GeminiKeyPool, KeyExcludedError
+from app.services.ai_stub import StubResponse, stub_keys
+from app.services.circuit_breaker import OPEN
+from app.services.key_pool_state import LocalKeyPoolState
+
+
+class RecordingClient:
+    """자신의 키를 응답에 담고, 키별 동시 실행 수를 기록하는 클라이언트"""
+
+    active = defaultdict(int)
+    max_active = defaultdict(int)
+    lock = threading.Lock()
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def generate_content(self, contents, generation_config=None, stream=False):
+        with self.lock:
+            self.active[self.key] += 1
+            self.max_active[self.key] = max(self.max_active[self.key], self.active[self.key])
+        try:
+            time.sleep(0.02)
+            return StubResponse(f"answer from {self.key}")
+        finally:
+            with self.lock:
+                self.active[self.key] -= 1
+
+
+def test_concurrent_requests_use_their_own_key_client():
+    keys = stub_keys(3)
+    pool = GeminiKeyPool(
+        keys, 6000,
+        client_factory=RecordingClient,
+        state=LocalKeyPoolState(keys, 6000),
+        max_concurrent_per_key=2
+    )
+    service = AIService()
+    service.gemini_key_pool = pool
+
+    async def scenario():
+        try:
+            return await asyncio.gather(*[service.gemini(f"question {i}") for i in range(30)])
+        finally:
+            await pool.stop_workers()
+
+    results = asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+    pool.executor.shutdown()
+
+    # 보고된 키와 실제로 호출된 클라이언트의 키가 같음
+    for result in results:
+        assert result["response"] == f"answer from {keys[result['key_index']]}"
+    used = Counter(result["key_index"] for result in results)
+    assert set(used) == {0, 1, 2}
+    # 키당 동시 요청 수 제한
+    assert all(RecordingClient.max_active[key] <= 2 for key in keys)
+    assert max(RecordingClient.max_active.values()) == 2
+
+
+def test_gemini_client_is_bound_to_its_key():
+    pytest.importorskip("google.generativeai")
+    from app.services.ai_service import create_gemini_client
+
+    first, second = create_gemini_client("key-a"), create_gemini_client("key-b")
+    assert first._client is not None
+    assert first._client is not second._client
+
+
+class FlakyState(LocalKeyPoolState):
+    """처음 한 번 슬롯 예약에 실패하는 상태 저장소 (Redis 장애 등)"""
+
+    def __init__(self, keys, rate_limit_per_minute):
+        super().__init__(keys, rate_limit_per_minute)
+        self.failures = 1
+
+    async def reserve(self, key, tokens=0):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("state backend unavailable")
+        return await super().reserve(key, tokens)
+
+
+def test_worker_survives_state_error():
+    keys = stub_keys(1)
+    pool = GeminiKeyPool(
+        keys, 6000,
+        client_factory=RecordingClient,
+        state=FlakyState(keys, 6000),
+        max_concurrent_per_key=1
+    )
+
+    async def scenario():
+        try:
+            # 오류는 꺼낸 요청에 전달되고
+            with pytest.raises(ConnectionError):
+                await pool.submit(lambda client: client.generate_content("first"))
+            # 하나뿐인 워커가 다음 요청을 계속 처리
+            response, key = await pool.submit(lambda client: client.generate_content("second"))
+            return response, key
+        finally:
+            await pool.stop_workers()
+
+    response, key = asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+    pool.executor.shutdown()
+    assert key == keys[0]
+    assert response.text == f"answer from {keys[0]}"
+
+
+class SlowPrimaryClient(RecordingClient):
+    """주 요청("primary")만 오래 걸리는 클라이언트 (그동안 헤지 예비 요청 실행)"""
+
+    def generate_content(self, contents, generation_config=None, stream=False):
+        if "primary" in str(contents):
+            time.sleep(0.3)
+        return super().generate_content(contents, generation_config, stream)
+
+
+def _run_hedge(pool, backup_count: int):
+    service = AIService()
+    service.gemini_key_pool = pool
+
+    async def scenario():
+        hedge_keys = set()
+        try:
+            primary = asyncio.ensure_future(service.gemini("primary", used_keys=hedge_keys))
+            while not hedge_keys:
+                await asyncio.sleep(0.005)
+            backups = []
+            for i in range(backup_count):
+                try:
+                    backups.append(await service.gemini(f"backup {i}", exclude_keys=hedge_keys))
+                except KeyExcludedError as e:
+                    backups.append(e)
+            return await primary, backups
+        finally:
+            await pool.stop_workers()
+
+    result = asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+    pool.executor.shutdown()
+    return result
+
+
+def test_hedge_backup_avoids_primary_key():
+    keys = stub_keys(2)
+    pool = GeminiKeyPool(
+        keys, 6000,
+        client_factory=SlowPrimaryClient,
+        state=LocalKeyPoolState(keys, 6000),
+        max_concurrent_per_key=3
+    )
+    primary, backups = _run_hedge(pool, 6)
+
+    assert all(backup["key_index"] != primary["key_index"] for backup in backups)
+
+
+def test_hedge_backup_gives_up_when_only_primary_key_is_free():
+    keys = stub_keys(2)
+    pool = GeminiKeyPool(
+        keys, 6000,
+        client_factory=SlowPrimaryClient,
+        state=LocalKeyPoolState(keys, 6000),
+        max_concurrent_per_key=2
+    )
+    # 두 번째 키는 쿨다운 중 - 주 요청은 첫 번째 키로 가고 예비 요청은 보낼 키가 없음
+    breaker = pool.state.breakers[keys[1]]
+    while breaker.state != OPEN:
+        breaker.record_failure(Exception("429 Resource has been exhausted"))
+    primary, backups = _run_hedge(pool, 1)
+
+    assert primary["key_index"] == 0
+    assert isinstance(backups[0], KeyExcludedError)
+
+
+def test_warm_pool_spreads_burst_across_idle_keys():
+    keys = stub_keys(6)
+    # 600 RPM - 키마다 0.1초에 한 번 (같은 키로 몰리면 0.1초 간격으로 밀림)
+    pool = GeminiKeyPool(
+        keys, 600,
+        client_factory=RecordingClient,
+        state=LocalKeyPoolState(keys, 600),
+        max_concurrent_per_key=5
+    )
+
+    async def scenario():
+        try:
+            # 워커가 모두 큐를 기다리는 상태로 만든 뒤 키 수만큼 동시에 요청
+            await pool.submit(lambda client: client.generate_content("warm up"))
+            await asyncio.sleep(0.2)
+            started = time.monotonic()
+            results = await asyncio.gather(*[
+                pool.submit(lambda client: client.generate_content("burst")) for _ in keys
+            ])
+            return results, time.monotonic() - started
+        finally:
+            await pool.stop_workers()
+
+    results, elapsed = asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+    pool.executor.shutdown()
+
+    assert {key for _, key in results} == set(keys)
+    assert elapsed < 0.09
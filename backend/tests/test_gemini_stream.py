@@ -0,0 +1,39 @@
+"""
+Gemini 스트리밍 오류가 키 브레이커에 반영되는지 확인
+Run with: pytest tests/test_gemini_stream.py
+"""
+import asyncio
+
+import pytest
+
+from app.services.ai_service import AIService, GeminiKeyPool
+from app.services.ai_stub import StubGeminiClient, parse_latency, stub_keys
+from app.services.circuit_breaker import OPEN
+from app.services.key_pool_state import LocalKeyPoolState
+
+
+def test_stream_429_trips_key_breaker():
+    keys = stub_keys(1)
+    pool = GeminiKeyPool(
+        keys, 600,
+        client_factory=lambda key: StubGeminiClient(key, parse_latency("fixed:0.01"), error_rate=1.0, seed=0),
+        state=LocalKeyPoolState(keys, 600)
+    )
+    service = AIService()
+    service.gemini_key_pool = pool
+    breaker = pool.state.breakers[keys[0]]
+
+    async def scenario():
+        try:
+            for _ in range(breaker.failure_threshold):
+                with pytest.raises(Exception, match="429"):
+                    async for _ in service.gemini_stream("question"):
+                        pass
+        finally:
+            await pool.stop_workers()
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+    pool.executor.shutdown()
+
+    assert breaker.total_failures == breaker.failure_threshold
+    assert breaker.state == OPEN
@@ -0,0 +1,68 @@
+"""
+키별 분당 한도가 어떤 60초 구간에서도 지켜지는지 확인
+Run with: pytest tests/test_key_pool_state.py
+"""
+import asyncio
+import random
+
+from app.services import key_pool_state
+from app.services.key_pool_state import LocalKeyPoolState
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _fake_clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(key_pool_state.time, "monotonic", clock)
+    return clock
+
+
+def _max_in_window(sends, window: float = 60.0) -> float:
+    """(t - 60, t] 구간별 사용량 중 최댓값"""
+    return max(
+        sum(amount for at, amount in sends if t - window + 1e-6 < at <= t)
+        for t, _ in sends
+    )
+
+
+def _run_greedy(clock: FakeClock, state, key: str, duration: float, tokens=lambda: 0):
+    """워커처럼 예약 → 대기 시간만큼 기다린 뒤 전송을 반복하고, 가끔 쉬어 버킷이 다시 차게 함"""
+    rng = random.Random(0)
+    sends = []
+
+    async def scenario():
+        start = clock.now
+        while clock.now - start < duration:
+            amount = tokens()
+            clock.now += await state.reserve(key, amount)
+            sends.append((clock.now, amount))
+            if rng.random() < 0.05:
+                clock.now += rng.uniform(0, 90)
+
+    asyncio.run(scenario())
+    return sends
+
+
+def test_requests_never_exceed_rpm_in_any_minute(monkeypatch):
+    clock = _fake_clock(monkeypatch)
+    state = LocalKeyPoolState(["k1"], 15)
+    sends = _run_greedy(clock, state, "k1", 600)
+
+    assert _max_in_window([(at, 1) for at, _ in sends]) <= 15
+    # 한도 근처까지는 사용 (간격이 60/RPM초)
+    assert len(sends) >= 15 * 5
+
+
+def test_tokens_never_exceed_tpm_in_any_minute(monkeypatch):
+    clock = _fake_clock(monkeypatch)
+    state = LocalKeyPoolState(["k1"], 6000, tokens_per_minute=60000)
+    rng = random.Random(1)
+    sends = _run_greedy(clock, state, "k1", 600, tokens=lambda: rng.randint(200, 3000))
+
+    assert _max_in_window(sends) <= 60000
@@ -0,0 +1,68 @@
+"""
+Redis 공유 버킷(Lua)이 인스턴스 간에 분당 한도를 지키는지 확인 (fakeredis 사용)
+Run with: pytest tests/test_key_pool_state_redis.py
+"""
+import asyncio
+import random
+
+import pytest
+
+from app.services import key_pool_state
+from app.services.key_pool_state import RedisKeyPoolState
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _max_in_window(sends, window: float = 60.0) -> float:
+    """(t - 60, t] 구간별 사용량 중 최댓값"""
+    return max(
+        sum(amount for at, amount in sends if t - window + 1e-3 < at <= t)
+        for t, _ in sends
+    )
+
+
+def _run_instances(monkeypatch, rate_limit: int, tokens_per_minute: int, duration: float, tokens=lambda: 0):
+    """같은 Redis를 쓰는 두 인스턴스가 번갈아 예약 → 대기 후 전송 (Redis TIME도 가짜 시계 사용)"""
+    clock = FakeClock()
+    monkeypatch.setattr(key_pool_state.time, "time", clock)
+    rng = random.Random(0)
+    sends = []
+
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        monkeypatch.setattr(key_pool_state, "get_redis", lambda: client)
+        instances = [RedisKeyPoolState(["k1"], rate_limit, tokens_per_minute) for _ in range(2)]
+        start = clock.now
+        while clock.now - start < duration:
+            amount = tokens()
+            clock.now += await rng.choice(instances).reserve("k1", amount)
+            sends.append((clock.now, amount))
+            if rng.random() < 0.05:
+                clock.now += rng.uniform(0, 90)
+        assert all(state.fallback_calls == 0 for state in instances)
+
+    asyncio.run(scenario())
+    return sends
+
+
+def test_shared_requests_never_exceed_rpm_in_any_minute(monkeypatch):
+    sends = _run_instances(monkeypatch, 15, 0, 600)
+
+    assert _max_in_window([(at, 1) for at, _ in sends]) <= 15
+    assert len(sends) >= 15 * 5
+
+
+def test_shared_tokens_never_exceed_tpm_in_any_minute(monkeypatch):
+    rng = random.Random(1)
+    sends = _run_instances(monkeypatch, 6000, 60000, 600, tokens=lambda: rng.randint(200, 3000))
+
+    assert _max_in_window(sends) <= 60000
@@ -284,13 +284,16 @@ export const useExamStore = create<ExamState>((set, get) => ({
     }));
   },
 
-  // 서버와 타이머 동기화 (주기적으로 호출)
+  // 서버와 타이머 동기화 (주기적으로 호출) - 남은 시간은 서버 계산값을 따름
   syncTimer: async () => {
     const { examId, timeRemaining } = get();
     if (!examId) return;
-    
+
     try {
-      await apiClient.patch(`/exams/${examId}/timer`, { timer_remaining: timeRemaining });
+      const response = await apiClient.patch(`/exams/${examId}/timer`, { timer_remaining: timeRemaining });
+      if (!response.data.in_sync) {
+        set({ timeRemaining: response.data.timer_remaining });
+      }
     } catch (error) {
       console.error('Failed to sync timer:', error);
     }